@@ -0,0 +1,168 @@
+"""Check that a client syncing through /api/changes/ ends up with the database.
+
+Seeds a fresh database, mirrors every directory table by paging through the
+feed from the beginning, then applies updates, inserts and deletes (raw SQL
+included) and catches up from the saved cursor. After each sync the mirror is
+compared with the tables. One write is held in a transaction that started
+before the others and commits after a sync has gone past them, to check that
+the feed doesn't skip late commits. Prints what each sync cost and exits
+non-zero on any mismatch. Run with ``python -m benchmarks.change_feed``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+from sqlalchemy import text
+
+from benchmarks.hot_paths import recreate_database, seed
+from src.api.main import get_app
+from src.common.settings import get_settings
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.models.models import CHANGE_FEED_KEYS
+
+API_KEY = "some_valid_api_key_213hj123hMEga_confidential"
+
+
+def get_row_key(table: str, row: dict) -> tuple:
+    return tuple(row[column] for column in CHANGE_FEED_KEYS[table])
+
+
+async def sync(http: httpx.AsyncClient, mirror: dict, cursor: str | None, limit: int):
+    pages = items = size = 0
+    started = time.perf_counter()
+    while True:
+        params = {"api_key": API_KEY, "limit": limit}
+        if cursor is not None:
+            params["cursor"] = cursor
+        response = await http.get("/api/changes/", params=params)
+        response.raise_for_status()
+        page = response.json()
+        pages += 1
+        items += len(page["items"])
+        size += len(response.content)
+        for item in page["items"]:
+            rows = mirror.setdefault(item["table"], {})
+            key = get_row_key(item["table"], item["row"])
+            if item["deleted"]:
+                rows.pop(key, None)
+            else:
+                rows[key] = item["row"]
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+    stats = {
+        "pages": pages,
+        "items": items,
+        "bytes": size,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    return cursor, stats
+
+
+async def get_mismatches(client: AsyncPostgresClient, mirror: dict) -> dict:
+    mismatches = {}
+    async with client.engine.connect() as conn:
+        for table in CHANGE_FEED_KEYS:
+            result = await conn.execute(text(f"SELECT to_jsonb(t) FROM {table} AS t"))
+            # Round-trip through JSON so timestamps compare as the feed sends them.
+            actual = {
+                get_row_key(table, row): row
+                for row in json.loads(json.dumps([row for (row,) in result]))
+            }
+            expected = mirror.get(table, {})
+            missing = actual.keys() - expected.keys()
+            extra = expected.keys() - actual.keys()
+            stale = [key for key in actual.keys() & expected.keys() if actual[key] != expected[key]]
+            if missing or extra or stale:
+                mismatches[table] = {
+                    "missing": len(missing), "extra": len(extra), "stale": len(stale)
+                }
+    return mismatches
+
+
+async def mutate(client: AsyncPostgresClient, count: int) -> None:
+    async with client.engine.begin() as conn:
+        await conn.execute(
+            text("UPDATE organizations SET name = name || ' v2' WHERE id % :n = 0"),
+            {"n": max(1, 1000 // count)},
+        )
+        await conn.execute(text("UPDATE buildings SET address = address || ' 2' WHERE id % 50 = 0"))
+        await conn.execute(text("DELETE FROM phones WHERE id % 40 = 0"))
+        await conn.execute(text("DELETE FROM organization_activity WHERE organization_id % 30 = 0"))
+        await conn.execute(
+            text(
+                "INSERT INTO organization_activity (organization_id, activity_id) "
+                "SELECT id, (SELECT min(id) FROM activities) FROM organizations "
+                "WHERE id % 30 = 0 ON CONFLICT DO NOTHING"
+            )
+        )
+        await conn.execute(
+            text(
+                "DELETE FROM organizations WHERE id IN ("
+                "SELECT id FROM organizations WHERE id % 97 = 0 "
+                "AND NOT EXISTS (SELECT 1 FROM phones WHERE organization_id = organizations.id))"
+            )
+        )
+
+
+async def run(size: int, database: str, limit: int, seed_value: int) -> int:
+    await recreate_database(database)
+    settings = get_settings().model_copy(update={"postgres_db": database})
+    client = AsyncPostgresClient(settings=settings)
+    await seed(client, size, seed_value)
+
+    # The seeded database has no Alembic history.
+    os.environ["POSTGRES_DB"] = database
+    os.environ["SCHEMA_STARTUP_MODE"] = "skip"
+    get_settings.cache_clear()
+    app = get_app()
+    failed = False
+    mirror: dict = {}
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://app") as http:
+                cursor, stats = await sync(http, mirror, None, limit)
+                mismatches = await get_mismatches(client, mirror)
+                print(json.dumps({"sync": "full", **stats, "mismatches": mismatches}))
+                failed |= bool(mismatches)
+
+                # Starts before the other writes and commits after they are synced.
+                late = await client.engine.connect()
+                await late.begin()
+                await late.execute(text("SELECT 1"))
+                await asyncio.sleep(0.01)
+                await mutate(client, size // 100)
+                await late.execute(
+                    text("UPDATE buildings SET address = address || ' late' WHERE id = 1")
+                )
+                cursor, stats = await sync(http, mirror, cursor, limit)
+                print(json.dumps({"sync": "while a writer is open", **stats}))
+                await late.commit()
+                await late.close()
+
+                cursor, stats = await sync(http, mirror, cursor, limit)
+                mismatches = await get_mismatches(client, mirror)
+                print(json.dumps({"sync": "delta", **stats, "mismatches": mismatches}))
+                failed |= bool(mismatches)
+
+                cursor, stats = await sync(http, mirror, cursor, limit)
+                print(json.dumps({"sync": "idle", **stats}))
+                failed |= stats["items"] != 0
+    finally:
+        await client.dispose()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--database", default="restapi_changes")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.size, args.database, args.limit, args.seed)))
@@ -0,0 +1,118 @@
+"""Burst of identical service calls with and without single-flight coalescing.
+
+Seeds a scratch database like ``benchmarks.hot_paths`` and fires ``--burst``
+concurrent copies of the same radius search and activity tree request at an
+``OrganizationService`` without a response cache, once plainly and once with
+a ``SingleFlight``. Each case reports wall time for the whole burst and the
+SQL statements sent. Run with ``python -m benchmarks.coalescing``.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import event
+
+from benchmarks.hot_paths import (
+    CITY_CENTER,
+    PAGE_LIMIT,
+    RADIUS_KM,
+    QueryCounter,
+    get_params,
+    recreate_database,
+    seed,
+)
+from src.common.distance import DistancePrecision
+from src.common.settings import get_settings
+from src.domain.schemas.activity import ActivityQuerySchema
+from src.domain.schemas.pagination import PaginationQuerySchema
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.repos.organization_repo import OrganizationRepository
+from src.infra.spatial.building_index import BuildingSpatialIndex
+from src.logic.repo_services.organization_service import OrganizationService
+from src.logic.repo_services.single_flight import SingleFlight
+
+
+async def run(size: int, burst: int, database: str, seed_value: int) -> list[dict]:
+    await recreate_database(database)
+    settings = get_settings().model_copy(update={"postgres_db": database})
+    client = AsyncPostgresClient(settings=settings)
+    counter = QueryCounter()
+    try:
+        await seed(client, size, seed_value)
+        building_index = BuildingSpatialIndex()
+        async with client.create_session() as session:
+            await building_index.load(session)
+        params = await get_params(client, building_index, seed_value)
+        pagination = PaginationQuerySchema(limit=PAGE_LIMIT, cursor=None)
+        root_activity = ActivityQuerySchema(
+            name=params["root_activity"], is_parent=None, id=None
+        )
+        latitude, longitude = CITY_CENTER
+
+        event.listen(client.engine.sync_engine, "before_cursor_execute", counter)
+        results = []
+        for mode in ("plain", "single_flight"):
+            for name in ("get_organizations_in_radius", "get_organizations_by_activity_tree"):
+                single_flight = SingleFlight() if mode == "single_flight" else None
+                service = OrganizationService(
+                    repository=OrganizationRepository(),
+                    async_client=client,
+                    building_index=building_index,
+                    distance_precision=DistancePrecision.ELLIPSOIDAL,
+                    single_flight=single_flight,
+                )
+                if name == "get_organizations_in_radius":
+                    call = lambda: service.get_organizations_in_radius(
+                        latitude, longitude, RADIUS_KM, pagination
+                    )
+                else:
+                    call = lambda: service.get_organizations_by_activity_tree(
+                        root_activity, pagination
+                    )
+                counter.count = 0
+                started = time.perf_counter()
+                await asyncio.gather(*(call() for _ in range(burst)))
+                elapsed = time.perf_counter() - started
+                result = {
+                    "organizations": size,
+                    "mode": mode,
+                    "name": name,
+                    "burst": burst,
+                    "wall_ms": round(elapsed * 1000, 1),
+                    "queries": counter.count,
+                }
+                if single_flight is not None:
+                    stats = single_flight.stats.values()
+                    result |= {
+                        "loads": sum(stat.calls for stat in stats),
+                        "coalesced": sum(stat.coalesced for stat in stats),
+                    }
+                results.append(result)
+                print(json.dumps(result))
+        return results
+    finally:
+        await client.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--database",
+        default=f"{get_settings().postgres_db}_bench",
+        help="Scratch database, dropped and recreated",
+    )
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.size, args.burst, args.database, args.seed))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
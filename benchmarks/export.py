@@ -0,0 +1,128 @@
+"""Check that the bulk export stays under a fixed memory ceiling.
+
+Fills a fresh database with ``--size`` organizations, each with a building,
+two phones and two activities, generated in SQL so that millions of rows
+take minutes rather than hours. Then runs ``python -m src.infra.export`` once
+per format in a new process, and reports its peak RSS, speed and output
+size. The exit status is non-zero when an export misses rows or its peak RSS
+is over ``--max-rss-mb``. Run with ``python -m benchmarks.export``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from benchmarks.hot_paths import recreate_database
+from src.common.settings import get_settings
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.models.base import BaseSQLModel
+
+FILL_STATEMENTS = (
+    """
+    INSERT INTO activities (id, name, parent_id, created_at, updated_at)
+    SELECT i, 'Activity ' || i, NULL, now(), now() FROM generate_series(1, 100) AS i
+    """,
+    """
+    INSERT INTO buildings (id, address, latitude, longitude, created_at, updated_at)
+    SELECT i, 'Street ' || i || ', "Block" ' || (i % 7), 55 + random(), 37 + random(), now(), now()
+    FROM generate_series(1, greatest(:size / 10, 1)) AS i
+    """,
+    """
+    INSERT INTO organizations (id, name, building_id, created_at, updated_at)
+    SELECT i, 'Organization ' || i, 1 + i % greatest(:size / 10, 1), now(), now()
+    FROM generate_series(1, :size) AS i
+    """,
+    """
+    INSERT INTO phones (number, organization_id, created_at, updated_at)
+    SELECT '8-' || i || '-' || j, i, now(), now()
+    FROM generate_series(1, :size) AS i, generate_series(1, 2) AS j
+    """,
+    """
+    INSERT INTO organization_activity (organization_id, activity_id)
+    SELECT i, 1 + (i * j) % 100 FROM generate_series(1, :size) AS i, generate_series(1, 2) AS j
+    ON CONFLICT DO NOTHING
+    """,
+)
+
+
+async def fill(database: str, size: int) -> None:
+    await recreate_database(database)
+    settings = get_settings().model_copy(update={"postgres_db": database})
+    client = AsyncPostgresClient(settings=settings)
+    try:
+        async with client.engine.begin() as conn:
+            await conn.run_sync(BaseSQLModel.metadata.create_all)
+            for statement in FILL_STATEMENTS:
+                await conn.execute(text(statement), {"size": size})
+        engine = client.engine.execution_options(isolation_level="AUTOCOMMIT")
+        async with engine.connect() as conn:
+            await conn.execute(text("VACUUM ANALYZE"))
+    finally:
+        await client.dispose()
+
+
+def run_export(database: str, file_format: str, path: str, chunk_size: int) -> dict:
+    env = {**os.environ, "POSTGRES_DB": database}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.infra.export", path, "--format", file_format,
+         "--chunk-size", str(chunk_size)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    stderr = process.stderr.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    stats = dict(
+        item.split("=", 1)
+        for line in stderr.splitlines() if line.startswith("rows=")
+        for item in line.split()
+    )
+    return {
+        "format": file_format,
+        "exit_status": os.waitstatus_to_exitcode(status),
+        "rows": int(stats.get("rows", 0)),
+        "bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+        "seconds": round(elapsed, 2),
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+    }
+
+
+def main(args) -> int:
+    if not args.skip_fill:
+        started = time.perf_counter()
+        asyncio.run(fill(args.database, args.size))
+        print(json.dumps({"filled": args.size, "seconds": round(time.perf_counter() - started, 1)}))
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        for file_format in args.formats:
+            path = os.path.join(directory, f"directory.{file_format}")
+            result = run_export(args.database, file_format, path, args.chunk_size)
+            os.remove(path)
+            print(json.dumps(result))
+            failed |= (
+                result["exit_status"] != 0
+                or result["rows"] != args.size
+                or result["peak_rss_mb"] > args.max_rss_mb
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--database", default="restapi_export")
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet", "arrow"])
+    parser.add_argument("--chunk-size", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--max-rss-mb", type=float, default=300)
+    parser.add_argument("--skip-fill", action="store_true", help="Reuse the database as it is")
+    sys.exit(main(parser.parse_args()))
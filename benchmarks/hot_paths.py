@@ -0,0 +1,467 @@
+"""Time repository, service and converter hot paths against Postgres.
+
+Every dataset size is seeded into a scratch database (``<POSTGRES_DB>_bench``
+by default, dropped and recreated for each size) with the bulk ingestion
+pipeline, so the data only depends on ``--seed``. Each case reports wall
+time and SQL statements per call. Run with ``python -m benchmarks.hot_paths``
+and pass ``--output`` / ``--compare`` to track results across commits.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Awaitable, Callable, Iterator
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.orm import selectinload
+
+from src.common.converters.model_converters import (
+    convert_to_organization_entity,
+    convert_to_organization_entity_from_dict,
+)
+from src.common.distance import DistancePrecision
+from src.common.settings import get_settings
+from src.domain.entities.activities import ActivityEntity
+from src.domain.entities.buildings import BuildingEntity
+from src.domain.entities.composer import OrganizationComposerEntity
+from src.domain.entities.organizations import OrganizationEntity
+from src.domain.entities.phones import PhoneEntity
+from src.domain.schemas.activity import ActivityQuerySchema
+from src.domain.schemas.organization import OrganizationQuerySchema
+from src.domain.schemas.pagination import PaginationQuerySchema
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.ingestion.pipeline import BulkIngestionPipeline
+from src.infra.models.models import BaseSQLModel, Organization
+from src.infra.repos.organization_repo import OrganizationRepository
+from src.infra.spatial.building_index import BuildingSpatialIndex
+from src.logic.repo_services.organization_service import OrganizationService
+
+CITY_CENTER = (55.7558, 37.6173)
+ACTIVITY_ROOTS = 5
+ACTIVITY_BRANCHING = 3
+PAGE_LIMIT = 100
+RADIUS_KM = 2.0
+
+
+@dataclass(eq=False)
+class QueryCounter:
+    count: int = 0
+
+    def __call__(self, *args) -> None:
+        self.count += 1
+
+
+def get_activity_paths() -> list[tuple[str, ...]]:
+    paths = []
+    for root in range(1, ACTIVITY_ROOTS + 1):
+        paths.append((f"Activity {root}",))
+        for child in range(1, ACTIVITY_BRANCHING + 1):
+            child_path = (f"Activity {root}", f"Activity {root}.{child}")
+            paths.append(child_path)
+            for leaf in range(1, ACTIVITY_BRANCHING + 1):
+                paths.append((*child_path, f"Activity {root}.{child}.{leaf}"))
+    return paths
+
+
+def generate_organizations(size: int, seed: int) -> Iterator[OrganizationComposerEntity]:
+    rng = random.Random(seed)
+    activity_paths = get_activity_paths()
+    buildings = [
+        BuildingEntity(
+            address=f"Building {number}",
+            latitude=Decimal(str(round(rng.gauss(CITY_CENTER[0], 0.1), 6))),
+            longitude=Decimal(str(round(rng.gauss(CITY_CENTER[1], 0.15), 6))),
+        )
+        for number in range(1, max(size // 4, 1) + 1)
+    ]
+    for number in range(1, size + 1):
+        activities = []
+        for path in rng.sample(activity_paths, rng.randint(1, 2)):
+            activity = None
+            for name in path:
+                activity = ActivityEntity(name=name, parent=activity)
+            activities.append(activity)
+        yield OrganizationComposerEntity(
+            activity_entities_list=activities,
+            organization_entity=OrganizationEntity(name=f"Organization {number}"),
+            building_entity=rng.choice(buildings),
+            phones_entities_list=[
+                PhoneEntity(number=f"8-{number:03d}-{phone}") for phone in range(2)
+            ],
+        )
+
+
+async def recreate_database(name: str) -> None:
+    settings = get_settings().model_copy(update={"postgres_db": "postgres"})
+    client = AsyncPostgresClient(settings=settings)
+    try:
+        engine = client.engine.execution_options(isolation_level="AUTOCOMMIT")
+        async with engine.connect() as conn:
+            await conn.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+            await conn.execute(text(f'CREATE DATABASE "{name}"'))
+    finally:
+        await client.dispose()
+
+
+async def seed(client: AsyncPostgresClient, size: int, seed_value: int) -> None:
+    async with client.engine.begin() as conn:
+        await conn.run_sync(BaseSQLModel.metadata.create_all)
+    await BulkIngestionPipeline(async_client=client).ingest(
+        generate_organizations(size, seed_value)
+    )
+    async with client.engine.connect() as conn:
+        await conn.execute(text("ANALYZE"))
+
+
+def summarize(timings: list[float], queries: int) -> dict:
+    timings = sorted(timings)
+    return {
+        "calls": len(timings),
+        "median_ms": round(statistics.median(timings), 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        "mean_ms": round(statistics.mean(timings), 4),
+        "queries_per_call": round(queries / len(timings), 2),
+    }
+
+
+async def measure(
+    call: Callable[[], Awaitable], counter: QueryCounter, repeat: int
+) -> dict:
+    await call()
+    timings = []
+    counter.count = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings, counter.count)
+
+
+def measure_sync(call: Callable[[], object], repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings, 0)
+
+
+def get_repository_cases(
+    client: AsyncPostgresClient, params: dict
+) -> dict[str, Callable[[], Awaitable]]:
+    repository = OrganizationRepository()
+
+    def in_session(method: str, **kwargs) -> Callable[[], Awaitable]:
+        async def call():
+            async with client.create_session() as session:
+                return await getattr(repository, method)(session=session, **kwargs)
+
+        return call
+
+    latitude, longitude = CITY_CENTER
+    return {
+        "get_organization_by_entity": in_session(
+            "get_organization_by_entity", data={"name": params["organization"]}
+        ),
+        "get_organizations_from_building_id": in_session(
+            "get_organizations_from_building_id",
+            building_id=params["building_id"],
+            limit=PAGE_LIMIT,
+        ),
+        "get_organizations_by_activity": in_session(
+            "get_organizations_by_activity",
+            data={"name": params["activity"]},
+            limit=PAGE_LIMIT,
+        ),
+        "get_organizations_by_activity_tree": in_session(
+            "get_organizations_by_activity_tree",
+            data={"name": params["root_activity"]},
+            limit=PAGE_LIMIT,
+        ),
+        "get_organizations_in_radius[haversine]": in_session(
+            "get_organizations_in_radius",
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=RADIUS_KM,
+            limit=PAGE_LIMIT,
+        ),
+        "get_organizations_in_radius[ellipsoidal]": in_session(
+            "get_organizations_in_radius",
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=RADIUS_KM,
+            limit=PAGE_LIMIT,
+            precision=DistancePrecision.ELLIPSOIDAL,
+        ),
+        "get_organizations_by_building_distances": in_session(
+            "get_organizations_by_building_distances",
+            building_ids=params["building_ids"],
+            distances=params["distances"],
+            limit=PAGE_LIMIT,
+        ),
+        "get_organizations_by_ids_or_names": in_session(
+            "get_organizations_by_ids_or_names",
+            ids=params["organization_ids"],
+            names=[params["organization"]],
+        ),
+        "get_organizations_by_ranks": in_session(
+            "get_organizations_by_ranks",
+            organization_ids=params["organization_ids"],
+            scores=[1.0] * len(params["organization_ids"]),
+        ),
+    }
+
+
+def get_service_cases(
+    client: AsyncPostgresClient, building_index: BuildingSpatialIndex, params: dict
+) -> dict[str, Callable[[], Awaitable]]:
+    service = OrganizationService(
+        repository=OrganizationRepository(),
+        async_client=client,
+        distance_precision=DistancePrecision.ELLIPSOIDAL,
+    )
+    indexed_service = OrganizationService(
+        repository=OrganizationRepository(),
+        async_client=client,
+        building_index=building_index,
+        distance_precision=DistancePrecision.ELLIPSOIDAL,
+    )
+    json_service = OrganizationService(
+        repository=OrganizationRepository(),
+        async_client=client,
+        distance_precision=DistancePrecision.ELLIPSOIDAL,
+        json_projection=True,
+    )
+    pagination = PaginationQuerySchema(limit=PAGE_LIMIT, cursor=None)
+    activity = ActivityQuerySchema(name=params["activity"], is_parent=None, id=None)
+    root_activity = ActivityQuerySchema(
+        name=params["root_activity"], is_parent=None, id=None
+    )
+    latitude, longitude = CITY_CENTER
+
+    async def consume(stream) -> None:
+        async for _ in stream:
+            pass
+
+    return {
+        "get_organization_by_entity": lambda: service.get_organization_by_entity(
+            OrganizationQuerySchema(name=params["organization"], id=None)
+        ),
+        "get_organizations_from_building_id": lambda: (
+            service.get_organizations_from_building_id(params["building_id"], pagination)
+        ),
+        "get_organizations_by_activity": lambda: service.get_organizations_by_activity(
+            activity, pagination
+        ),
+        "get_organizations_by_activity_tree": lambda: (
+            service.get_organizations_by_activity_tree(root_activity, pagination)
+        ),
+        "get_organizations_in_radius[sql]": lambda: service.get_organizations_in_radius(
+            latitude, longitude, RADIUS_KM, pagination
+        ),
+        "get_organizations_in_radius[index]": lambda: (
+            indexed_service.get_organizations_in_radius(
+                latitude, longitude, RADIUS_KM, pagination
+            )
+        ),
+        "stream_organizations_by_activity_tree": lambda: consume(
+            service.stream_organizations_by_activity_tree(root_activity)
+        ),
+        "get_organizations_by_activity_tree[json]": lambda: (
+            json_service.get_organizations_by_activity_tree(root_activity, pagination)
+        ),
+        "get_organizations_in_radius[json]": lambda: (
+            json_service.get_organizations_in_radius(
+                latitude, longitude, RADIUS_KM, pagination
+            )
+        ),
+        "stream_organizations_by_activity_tree[json]": lambda: consume(
+            json_service.stream_organizations_by_activity_tree(root_activity)
+        ),
+    }
+
+
+def get_organization_dict(organization: Organization) -> dict:
+    return {
+        "organization_name": organization.name,
+        "phone_numbers": [phone.number for phone in organization.phones],
+        "building_address": organization.building.address,
+        "building_longitude": organization.building.longitude,
+        "building_latitude": organization.building.latitude,
+        "activity_name": organization.activities[0].name,
+    }
+
+
+async def get_converter_cases(
+    client: AsyncPostgresClient,
+) -> dict[str, Callable[[], object]]:
+    async with client.create_session() as session:
+        result = await session.execute(
+            select(Organization)
+            .options(
+                selectinload(Organization.phones),
+                selectinload(Organization.building),
+                selectinload(Organization.activities),
+            )
+            .order_by(Organization.id)
+            .limit(PAGE_LIMIT)
+        )
+        organizations = result.scalars().all()
+    dicts = [get_organization_dict(organization) for organization in organizations]
+
+    return {
+        f"convert_to_organization_entity[x{len(organizations)}]": lambda: [
+            convert_to_organization_entity(organization) for organization in organizations
+        ],
+        f"convert_to_organization_entity_from_dict[x{len(dicts)}]": lambda: [
+            convert_to_organization_entity_from_dict(item) for item in dicts
+        ],
+    }
+
+
+async def get_params(
+    client: AsyncPostgresClient, building_index: BuildingSpatialIndex, seed_value: int
+) -> dict:
+    rng = random.Random(seed_value + 1)
+    async with client.create_session() as session:
+        organizations = await session.scalar(select(func.max(Organization.id)))
+        building_id = await session.scalar(
+            select(Organization.building_id).where(
+                Organization.id == rng.randint(1, organizations)
+            )
+        )
+    building_ids, distances = building_index.query(
+        *CITY_CENTER, RADIUS_KM, DistancePrecision.ELLIPSOIDAL
+    )
+    return {
+        "organization": f"Organization {rng.randint(1, organizations)}",
+        "building_id": building_id,
+        "activity": "Activity 1.1.1",
+        "root_activity": "Activity 1",
+        "building_ids": building_ids.tolist(),
+        "distances": distances.tolist(),
+        "organization_ids": rng.sample(range(1, organizations + 1), 10),
+    }
+
+
+async def run_size(size: int, database: str, repeat: int, seed_value: int) -> list[dict]:
+    await recreate_database(database)
+    settings = get_settings().model_copy(update={"postgres_db": database})
+    client = AsyncPostgresClient(settings=settings)
+    counter = QueryCounter()
+    try:
+        started = time.perf_counter()
+        await seed(client, size, seed_value)
+        print(f"seeded {size} organizations in {time.perf_counter() - started:.1f}s")
+
+        building_index = BuildingSpatialIndex()
+        async with client.create_session() as session:
+            await building_index.load(session)
+        params = await get_params(client, building_index, seed_value)
+
+        event.listen(client.engine.sync_engine, "before_cursor_execute", counter)
+        results = []
+        for group, cases in (
+            ("repository", get_repository_cases(client, params)),
+            ("service", get_service_cases(client, building_index, params)),
+        ):
+            for name, call in cases.items():
+                results.append(
+                    {"organizations": size, "group": group, "name": name}
+                    | await measure(call, counter, repeat)
+                )
+                print(json.dumps(results[-1]))
+        for name, call in (await get_converter_cases(client)).items():
+            results.append(
+                {"organizations": size, "group": "converter", "name": name}
+                | measure_sync(call, repeat)
+            )
+            print(json.dumps(results[-1]))
+        return results
+    finally:
+        await client.dispose()
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    with open(baseline_path) as file:
+        baseline = {
+            (item["organizations"], item["group"], item["name"]): item
+            for item in json.load(file)["results"]
+        }
+    for item in results:
+        previous = baseline.get((item["organizations"], item["group"], item["name"]))
+        if previous is None:
+            continue
+        ratio = item["median_ms"] / previous["median_ms"] if previous["median_ms"] else 0
+        print(
+            f"{item['organizations']:>8} {item['group']:<10} {item['name']:<50} "
+            f"{previous['median_ms']:>10.3f} -> {item['median_ms']:>10.3f} ms "
+            f"({ratio:.2f}x) queries {previous['queries_per_call']} -> "
+            f"{item['queries_per_call']}"
+        )
+
+
+async def run(sizes: list[int], database: str, repeat: int, seed_value: int) -> list[dict]:
+    results = []
+    for size in sizes:
+        results.extend(await run_size(size, database, repeat, seed_value))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--database",
+        default=f"{get_settings().postgres_db}_bench",
+        help="Scratch database, dropped and recreated for every size",
+    )
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Print the change against a previous --output file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sizes, args.database, args.repeat, args.seed))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "meta": {
+                        "commit": get_commit(),
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                        "python": platform.python_version(),
+                        "sizes": args.sizes,
+                        "repeat": args.repeat,
+                        "seed": args.seed,
+                    },
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
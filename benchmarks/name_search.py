@@ -0,0 +1,109 @@
+"""Latency of ``OrganizationNameIndex.search`` on synthetic organization names.
+
+Names are built from a random syllable vocabulary, so no database is needed.
+Queries are derived from indexed names: short prefixes, a full word plus the
+start of the next one, a word from the middle of a name, and a whole name
+with one typo. Run with ``python -m benchmarks.name_search``.
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from src.infra.search.name_index import OrganizationNameIndex
+
+SYLLABLES = [
+    "ab", "al", "an", "ar", "ba", "be", "bo", "ca", "co", "da", "de", "el",
+    "en", "fa", "fi", "ga", "go", "ha", "in", "ka", "ko", "la", "le", "li",
+    "lo", "ma", "me", "mi", "mo", "na", "ne", "no", "or", "pa", "pe", "ra",
+    "re", "ri", "ro", "sa", "se", "so", "ta", "te", "ti", "to", "va", "ve",
+]
+SUFFIXES = ["", "", "", " LLC", " Inc", " Group", " & Sons", " Holdings"]
+
+
+def generate_names(size: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    words = list(
+        {
+            "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).capitalize()
+            for _ in range(size // 20 + 100)
+        }
+    )
+    return [
+        " ".join(rng.choices(words, k=rng.randint(1, 3))) + rng.choice(SUFFIXES)
+        for _ in range(size)
+    ]
+
+
+def add_typo(rng: random.Random, name: str) -> str:
+    position = rng.randrange(len(name))
+    return name[:position] + rng.choice("aeioulnrst") + name[position + 1 :]
+
+
+def get_queries(names: list[str], count: int, seed: int) -> dict[str, list[str]]:
+    rng = random.Random(seed)
+    sample = rng.sample(names, count)
+    queries = {"prefix": [], "word_and_prefix": [], "inner_word": [], "typo": []}
+    for name in sample:
+        words = name.split()
+        queries["prefix"].append(name[: rng.randint(1, 4)])
+        if len(words) > 1:
+            queries["word_and_prefix"].append(f"{words[0]} {words[1][:2]}")
+            queries["inner_word"].append(words[-1])
+        queries["typo"].append(add_typo(rng, name))
+    return queries
+
+
+def percentile_ms(timings: list[float], percentile: float) -> float:
+    return round(float(np.percentile(timings, percentile)) * 1000, 3)
+
+
+def run(size: int, count: int, limit: int, seed: int) -> list[dict]:
+    names = generate_names(size, seed)
+    index = OrganizationNameIndex()
+    started = time.perf_counter()
+    index.build(np.arange(1, size + 1), names)
+    print(f"built index of {size} names in {time.perf_counter() - started:.1f}s")
+
+    results = []
+    for kind, queries in get_queries(names, count, seed).items():
+        timings, found = [], 0
+        for query in queries:
+            started = time.perf_counter()
+            matches = index.search(query, limit)
+            timings.append(time.perf_counter() - started)
+            found += bool(matches)
+        results.append(
+            {
+                "organizations": size,
+                "query": kind,
+                "queries": len(queries),
+                "found_share": round(found / len(queries), 3),
+                "p50_ms": percentile_ms(timings, 50),
+                "p99_ms": percentile_ms(timings, 99),
+                "max_ms": round(max(timings) * 1000, 3),
+            }
+        )
+        print(json.dumps(results[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.size, args.queries, args.limit, args.seed)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Check that every endpoint stays within its SQL statement budget.
+
+Seeds a scratch database like ``benchmarks.hot_paths``, points the app at it
+and calls each endpoint in process under ``detect_queries``, with a budget on
+the total number of statements and on repeats of one statement shape. Any
+violation is reported with the statements grouped by shape and the exit
+status is non-zero, so the script can gate CI. Set the usual environment
+(e.g. ``SPATIAL_INDEX_ENABLED``, ``JSON_PROJECTION_ENABLED``) to check other
+configurations. Run with ``python -m benchmarks.query_budgets``.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+import httpx
+
+from benchmarks.hot_paths import CITY_CENTER, RADIUS_KM, get_params, recreate_database, seed
+from src.api.main import get_app
+from src.common.settings import get_settings
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.db.query_budget import detect_queries
+from src.infra.spatial.building_index import BuildingSpatialIndex
+
+API_KEY = "some_valid_api_key_213hj123hMEga_confidential"
+# Organization GET endpoints read the directory version for their ETag first.
+VERSION_CHECK = 1
+
+
+def get_cases(params: dict) -> list[tuple[str, str, dict, int]]:
+    """``(method, path, params or body, statement budget)`` per endpoint."""
+    latitude, longitude = CITY_CENTER
+    return [
+        ("GET", "/api/organizations/", {"name": params["organization"]}, 4 + VERSION_CHECK),
+        (
+            "POST",
+            "/api/organizations/batch/",
+            {"ids": params["organization_ids"], "names": [params["organization"]]},
+            4,
+        ),
+        ("GET", "/api/organizations/search/", {"q": params["organization"][:6]}, 5 + VERSION_CHECK),
+        ("GET", "/api/organizations/activities/", {"name": params["activity"]}, 4 + VERSION_CHECK),
+        (
+            "GET",
+            "/api/organizations/activities/",
+            {"name": params["root_activity"], "is_parent": True},
+            4 + VERSION_CHECK,
+        ),
+        ("GET", "/api/organizations/buildings/", {"id": params["building_id"]}, 4 + VERSION_CHECK),
+        (
+            "GET",
+            "/api/organizations/buildings/",
+            {"latitude": latitude, "longitude": longitude, "radius_km": RADIUS_KM},
+            4 + VERSION_CHECK,
+        ),
+        ("GET", "/api/activities/tree/", {}, 1),
+    ]
+
+
+async def run(size: int, database: str, seed_value: int, max_repeats: int) -> list[dict]:
+    await recreate_database(database)
+    settings = get_settings().model_copy(update={"postgres_db": database})
+    client = AsyncPostgresClient(settings=settings)
+    try:
+        await seed(client, size, seed_value)
+        building_index = BuildingSpatialIndex()
+        async with client.create_session() as session:
+            await building_index.load(session)
+        params = await get_params(client, building_index, seed_value)
+    finally:
+        await client.dispose()
+
+    # The app builds its own client from the settings. The seeded database has
+    # no Alembic history, so the startup schema check is skipped.
+    os.environ["POSTGRES_DB"] = database
+    os.environ["SCHEMA_STARTUP_MODE"] = "skip"
+    get_settings.cache_clear()
+    app = get_app()
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as http:
+            for method, path, payload, max_statements in get_cases(params):
+                with detect_queries(
+                    max_statements=max_statements,
+                    max_repeats=max_repeats,
+                    raise_on_violation=False,
+                    label=f"{method} {path}",
+                ) as budget:
+                    if method == "POST":
+                        response = await http.post(
+                            path, params={"api_key": API_KEY}, json=payload
+                        )
+                    else:
+                        response = await http.get(
+                            path, params={"api_key": API_KEY} | payload
+                        )
+                violations = budget.get_violations()
+                results.append(
+                    {
+                        "method": method,
+                        "path": path,
+                        "params": payload,
+                        "status": response.status_code,
+                        "statements": budget.statements,
+                        "budget": max_statements,
+                        "violations": violations,
+                    }
+                )
+                status = "FAIL" if violations or response.status_code != 200 else "ok"
+                print(
+                    f"{status:<4} {method:<4} {path:<35} "
+                    f"{budget.statements}/{max_statements} statements"
+                )
+                if violations:
+                    print(budget.get_report())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--max-repeats",
+        type=int,
+        default=1,
+        help="Most runs of one statement shape per request",
+    )
+    parser.add_argument(
+        "--database",
+        default=f"{get_settings().postgres_db}_bench",
+        help="Scratch database, dropped and recreated",
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.size, args.database, args.seed, args.max_repeats))
+    failures = [
+        result for result in results if result["violations"] or result["status"] != 200
+    ]
+    print(f"{len(results)} endpoints checked, {len(failures)} over budget or failing")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
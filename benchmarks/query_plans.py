@@ -0,0 +1,191 @@
+"""Check that repository queries use indexes on the large tables.
+
+Seeds a scratch database like ``benchmarks.hot_paths``, runs every repository
+read once while recording the statements it sends (selectin loads included),
+then ``EXPLAIN``s each of them with the same parameters. A sequential scan on
+a table with at least ``--min-rows`` rows is reported as a failure and the
+exit status is non-zero, so the script can gate CI. Run with
+``python -m benchmarks.query_plans``.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import event, text
+
+from benchmarks.hot_paths import (
+    CITY_CENTER,
+    PAGE_LIMIT,
+    RADIUS_KM,
+    get_params,
+    get_repository_cases,
+    recreate_database,
+    seed,
+)
+from src.common.distance import DistancePrecision
+from src.common.settings import get_settings
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.repos.activity_repo import ActivityRepository
+from src.infra.repos.organization_repo import OrganizationRepository
+from src.infra.spatial.building_index import BuildingSpatialIndex
+
+
+@dataclass(eq=False)
+class StatementRecorder:
+    statements: list[tuple[str, Any]] = field(default_factory=list)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("EXPLAIN"):
+            self.statements.append((statement, parameters))
+
+
+def get_json_cases(client: AsyncPostgresClient, params: dict) -> dict:
+    repository = OrganizationRepository()
+    activity_repository = ActivityRepository()
+    latitude, longitude = CITY_CENTER
+
+    def in_session(target, method: str, **kwargs):
+        async def call():
+            async with client.create_session() as session:
+                return await getattr(target, method)(session=session, **kwargs)
+
+        return call
+
+    return {
+        "get_organization_by_entity[json]": in_session(
+            repository,
+            "get_organization_by_entity",
+            data={"name": params["organization"]},
+            as_json=True,
+        ),
+        "get_organizations_from_building_id[json]": in_session(
+            repository,
+            "get_organizations_from_building_id",
+            building_id=params["building_id"],
+            limit=PAGE_LIMIT,
+            as_json=True,
+        ),
+        "get_organizations_by_activity[json]": in_session(
+            repository,
+            "get_organizations_by_activity",
+            data={"name": params["activity"]},
+            limit=PAGE_LIMIT,
+            as_json=True,
+        ),
+        "get_organizations_in_radius[json]": in_session(
+            repository,
+            "get_organizations_in_radius",
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=RADIUS_KM,
+            limit=PAGE_LIMIT,
+            precision=DistancePrecision.ELLIPSOIDAL,
+            as_json=True,
+        ),
+        "get_organizations_by_ranks[json]": in_session(
+            repository,
+            "get_organizations_by_ranks",
+            organization_ids=params["organization_ids"],
+            scores=[1.0] * len(params["organization_ids"]),
+            as_json=True,
+        ),
+        "get_activity_tree": in_session(
+            activity_repository, "get_activity_tree", data={}, max_depth=3
+        ),
+    }
+
+
+def find_seq_scans(plan: dict, large_tables: set[str]) -> list[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in large_tables:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(find_seq_scans(child, large_tables))
+    return found
+
+
+async def get_large_tables(client: AsyncPostgresClient, min_rows: int) -> set[str]:
+    async with client.engine.connect() as conn:
+        result = await conn.execute(
+            text(
+                "SELECT relname FROM pg_class "
+                "WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace "
+                "AND reltuples >= :min_rows"
+            ),
+            {"min_rows": min_rows},
+        )
+        return set(result.scalars().all())
+
+
+async def run(size: int, database: str, seed_value: int, min_rows: int) -> list[dict]:
+    await recreate_database(database)
+    settings = get_settings().model_copy(update={"postgres_db": database})
+    client = AsyncPostgresClient(settings=settings)
+    recorder = StatementRecorder()
+    try:
+        await seed(client, size, seed_value)
+        large_tables = await get_large_tables(client, min_rows)
+        print(f"large tables: {', '.join(sorted(large_tables))}")
+
+        building_index = BuildingSpatialIndex()
+        async with client.create_session() as session:
+            await building_index.load(session)
+        params = await get_params(client, building_index, seed_value)
+        cases = get_repository_cases(client, params) | get_json_cases(client, params)
+
+        event.listen(client.engine.sync_engine, "before_cursor_execute", recorder)
+        results = []
+        for name, call in cases.items():
+            recorder.statements.clear()
+            await call()
+            statements = list(recorder.statements)
+            async with client.engine.connect() as conn:
+                for statement, parameters in statements:
+                    result = await conn.exec_driver_sql(
+                        "EXPLAIN (FORMAT JSON) " + statement, parameters
+                    )
+                    explained = result.scalar()
+                    # The asyncpg dialect may already decode the json column.
+                    if isinstance(explained, str):
+                        explained = json.loads(explained)
+                    plan = explained[0]["Plan"]
+                    seq_scans = find_seq_scans(plan, large_tables)
+                    results.append(
+                        {
+                            "case": name,
+                            "statement": " ".join(statement.split())[:120],
+                            "seq_scans": seq_scans,
+                        }
+                    )
+                    status = "FAIL" if seq_scans else "ok"
+                    print(f"{status:<4} {name:<45} {results[-1]['statement'][:70]}")
+                    if seq_scans:
+                        print(f"     seq scan on {', '.join(seq_scans)}")
+        return results
+    finally:
+        await client.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-rows", type=int, default=10_000)
+    parser.add_argument(
+        "--database",
+        default=f"{get_settings().postgres_db}_bench",
+        help="Scratch database, dropped and recreated",
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.size, args.database, args.seed, args.min_rows))
+    failures = [result for result in results if result["seq_scans"]]
+    print(f"{len(results)} statements checked, {len(failures)} with sequential scans")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
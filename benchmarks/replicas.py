@@ -0,0 +1,77 @@
+"""Check how reads are spread over the primary and the configured replicas.
+
+Runs bursts of organization lookups through ``OrganizationService`` with each
+routing strategy and counts the statements every server received, next to
+each replica's health and lag. Point ``POSTGRES_REPLICA_URLS`` at one or more
+local instances (a streaming replica from ``pg_basebackup -R`` or just a
+second server with the same data) and run ``python -m benchmarks.replicas``;
+stopping a replica between runs shows reads falling back to the primary.
+"""
+import argparse
+import asyncio
+import json
+
+from sqlalchemy import event, func, select
+
+from benchmarks.hot_paths import QueryCounter
+from src.common.settings import get_settings
+from src.domain.schemas.organization import OrganizationQuerySchema
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.models.models import Organization
+from src.infra.repos.organization_repo import OrganizationRepository
+from src.logic.repo_services.organization_service import OrganizationService
+
+
+async def run(routing: str, burst: int, rounds: int) -> dict:
+    settings = get_settings().model_copy(update={"postgres_replica_routing": routing})
+    client = AsyncPostgresClient(settings=settings)
+    counters = {"primary": QueryCounter()}
+    event.listen(client.engine.sync_engine, "before_cursor_execute", counters["primary"])
+    for replica in client.replicas.replicas:
+        counters[replica.name] = QueryCounter()
+        event.listen(replica.engine.sync_engine, "before_cursor_execute", counters[replica.name])
+    try:
+        await client.replicas.check_all()
+        async with client.create_session() as session:
+            organizations = await session.scalar(select(func.max(Organization.id)))
+        for counter in counters.values():
+            counter.count = 0
+        service = OrganizationService(
+            repository=OrganizationRepository(), async_client=client
+        )
+        for round_number in range(rounds):
+            await asyncio.gather(
+                *(
+                    service.get_organization_by_entity(
+                        OrganizationQuerySchema(
+                            id=(round_number * burst + i) % organizations + 1, name=None
+                        )
+                    )
+                    for i in range(burst)
+                )
+            )
+        return {
+            "routing": routing,
+            "replicas": {
+                replica.name: {"healthy": replica.healthy, "lag_seconds": replica.lag_seconds}
+                for replica in client.replicas.replicas
+            },
+            "statements": {name: counter.count for name, counter in counters.items()},
+        }
+    finally:
+        await client.dispose()
+
+
+async def main(burst: int, rounds: int) -> None:
+    if not get_settings().postgres_replica_urls:
+        raise SystemExit("POSTGRES_REPLICA_URLS is empty")
+    for routing in ("round_robin", "least_connections"):
+        print(json.dumps(await run(routing, burst, rounds)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.burst, args.rounds))
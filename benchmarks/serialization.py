@@ -0,0 +1,112 @@
+"""Compare the schema and fast (dict + orjson) paths for list responses.
+
+The schema path mirrors what FastAPI does for the list endpoints: build the
+page of Pydantic models, run it through ``jsonable_encoder`` and render a
+``JSONResponse``. The fast path builds plain dicts and renders an
+``ORJSONResponse``. Organizations are transient ORM objects, so no database
+is needed. Run with ``python -m benchmarks.serialization``.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from src.infra.models.models import Activity, Building, Organization, Phone
+from src.logic.repo_services.organization_service import (
+    build_page_by_distance,
+    build_page_by_id,
+)
+
+
+def generate_organizations(size: int, seed: int) -> list[tuple[Organization, float]]:
+    rng = random.Random(seed)
+    rows = []
+    for number in range(1, size + 1):
+        organization = Organization(
+            id=number,
+            name=f"Organization {number}",
+            building=Building(
+                address=f"Street {rng.randint(1, 500)}, {rng.randint(1, 200)}",
+                latitude=rng.uniform(55.5, 56.0),
+                longitude=rng.uniform(37.3, 37.9),
+            ),
+            phones=[Phone(number=f"8-800-{number:06d}-{phone}") for phone in range(2)],
+            activities=[Activity(name=f"Activity {rng.randint(1, 50)}") for _ in range(2)],
+        )
+        rows.append((organization, rng.uniform(0, 5)))
+    rows.sort(key=lambda row: row[1])
+    return rows
+
+
+def render_schema_page(page) -> bytes:
+    return JSONResponse(jsonable_encoder(page)).body
+
+
+def render_fast_page(page) -> bytes:
+    return ORJSONResponse(page).body
+
+
+def time_calls(func, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run(sizes: list[int], repeat: int, seed: int) -> list[dict]:
+    results = []
+    for size in sizes:
+        rows = generate_organizations(size, seed)
+        organizations = [organization for organization, _ in rows]
+        cases = {
+            "by_id": (
+                lambda: render_schema_page(build_page_by_id(organizations, size)),
+                lambda: render_fast_page(
+                    build_page_by_id(organizations, size, as_dict=True)
+                ),
+            ),
+            "by_distance": (
+                lambda: render_schema_page(build_page_by_distance(rows, size)),
+                lambda: render_fast_page(build_page_by_distance(rows, size, as_dict=True)),
+            ),
+        }
+        for name, (schema_path, fast_path) in cases.items():
+            if schema_path() != fast_path():
+                raise AssertionError(f"{name}: fast path changed the response body")
+            schema_us = statistics.median(time_calls(schema_path, repeat)) * 1e6 / size
+            fast_us = statistics.median(time_calls(fast_path, repeat)) * 1e6 / size
+            results.append(
+                {
+                    "organizations": size,
+                    "page": name,
+                    "schema_us_per_organization": round(schema_us, 2),
+                    "fast_us_per_organization": round(fast_us, 2),
+                    "speedup": round(schema_us / fast_us, 2),
+                }
+            )
+            print(json.dumps(results[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 5_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, args.seed)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare the in-process building index with the bbox + geodesic path.
+
+The bounding box of the baseline is evaluated with NumPy as a stand-in for
+the Postgres range filter, so only the per-row ``geodesic`` cost is timed
+on top of it. Run with ``python -m benchmarks.spatial_index``.
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+from src.common.distance import get_bounding_box
+from src.infra.spatial.building_index import BuildingSpatialIndex
+
+CITY_CENTER = (55.7558, 37.6173)
+
+
+def generate_buildings(size: int, seed: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    latitudes = rng.normal(CITY_CENTER[0], 0.15, size).clip(-90, 90)
+    longitudes = rng.normal(CITY_CENTER[1], 0.25, size).clip(-180, 180)
+    return np.arange(1, size + 1, dtype=np.int64), latitudes, longitudes
+
+
+def bbox_geodesic_query(
+    ids: np.ndarray,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+) -> np.ndarray:
+    min_lat, max_lat, lon_ranges = get_bounding_box(latitude, longitude, radius_km)
+    mask = (latitudes >= min_lat) & (latitudes <= max_lat)
+    if lon_ranges is not None:
+        lon_mask = np.zeros_like(mask)
+        for min_lon, max_lon in lon_ranges:
+            lon_mask |= (longitudes >= min_lon) & (longitudes <= max_lon)
+        mask &= lon_mask
+    target_point = (latitude, longitude)
+    return np.array(
+        [
+            building_id
+            for building_id, building_lat, building_lon in zip(
+                ids[mask].tolist(), latitudes[mask].tolist(), longitudes[mask].tolist()
+            )
+            if geodesic(target_point, (building_lat, building_lon)).km <= radius_km
+        ],
+        dtype=np.int64,
+    )
+
+
+def time_calls(func, queries) -> list[float]:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        func(*query)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return timings
+
+
+def run(sizes: list[int], radii: list[float], queries_count: int, seed: int) -> list[dict]:
+    results = []
+    for size in sizes:
+        ids, latitudes, longitudes = generate_buildings(size, seed)
+        started = time.perf_counter()
+        index = BuildingSpatialIndex()
+        index.build(ids, latitudes, longitudes)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        rng = np.random.default_rng(seed + 1)
+        for radius_km in radii:
+            queries = [
+                (
+                    float(rng.normal(CITY_CENTER[0], 0.1)),
+                    float(rng.normal(CITY_CENTER[1], 0.15)),
+                    radius_km,
+                )
+                for _ in range(queries_count)
+            ]
+            index_us = time_calls(index.query, queries)
+            baseline_us = time_calls(
+                lambda lat, lon, radius: bbox_geodesic_query(
+                    ids, latitudes, longitudes, lat, lon, radius
+                ),
+                queries,
+            )
+            matches = statistics.mean(len(index.query(*query)[0]) for query in queries)
+            results.append(
+                {
+                    "buildings": size,
+                    "radius_km": radius_km,
+                    "index_build_ms": round(build_ms, 1),
+                    "mean_matches": round(matches, 1),
+                    "index_median_us": round(statistics.median(index_us), 1),
+                    "bbox_geodesic_median_us": round(statistics.median(baseline_us), 1),
+                }
+            )
+            print(json.dumps(results[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--radii", type=float, nargs="+", default=[0.5, 1, 5])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.radii, args.queries, args.seed)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Measure app startup in fresh processes and check it against a budget.
+
+Every run starts a new interpreter that imports the app, runs its lifespan
+against the configured database and waits for ``/ready``. It reports the
+interpreter and import time, the time until the lifespan yields (schema check
+included) and until warm-up finishes, plus the app's own phase timings. The
+exit status is non-zero when the median time from spawning the process to
+ready is over ``--budget`` seconds. Run with ``python -m benchmarks.startup``;
+the database must be at the Alembic head unless ``SCHEMA_STARTUP_MODE`` says
+otherwise.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+STAGES = ("import", "lifespan", "ready", "spawn_to_ready")
+
+
+async def measure_child() -> dict:
+    started = time.perf_counter()
+    from src.api.main import get_app
+
+    imported = time.perf_counter()
+    app = get_app()
+    async with app.router.lifespan_context(app):
+        started_up = time.perf_counter()
+        while not app.state.ready:
+            await asyncio.sleep(0.001)
+        ready = time.perf_counter()
+        return {
+            "import": imported - started,
+            "lifespan": started_up - imported,
+            "ready": ready - imported,
+            # Wall clock, to compare with the parent's spawn time.
+            "ready_at": time.time(),
+            "phases": app.state.startup_timings,
+        }
+
+
+def run_once() -> dict:
+    spawned = time.time()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["spawn_to_ready"] = result.pop("ready_at") - spawned
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=3.0, help="Seconds to ready")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(measure_child())
+        print(json.dumps(result), flush=True)
+        return
+
+    results = []
+    for _ in range(args.runs):
+        results.append(run_once())
+        print(json.dumps(results[-1]))
+    summary = {
+        stage: round(statistics.median(result[stage] for result in results), 3)
+        for stage in STAGES
+    }
+    print(json.dumps({"median": summary, "budget": args.budget}))
+    sys.exit(1 if summary["spawn_to_ready"] > args.budget else 0)
+
+
+if __name__ == "__main__":
+    main()
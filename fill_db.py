@@ -1,7 +1,8 @@
+import argparse
 import asyncio
+from typing import Iterator
 
 from faker import Faker
-from sqlalchemy.exc import SQLAlchemyError
 
 from src.domain.entities.activities import ActivityEntity
 from src.domain.entities.buildings import BuildingEntity
@@ -9,13 +10,8 @@ from src.domain.entities.composer import OrganizationComposerEntity
 from src.domain.entities.organizations import OrganizationEntity
 from src.domain.entities.phones import PhoneEntity
 from src.infra.db.db import AsyncPostgresClient
-from src.infra.models.models import (
-    Organization,
-    Building,
-    Phone,
-    Activity,
-    BaseSQLModel,
-)
+from src.infra.ingestion.pipeline import BulkIngestionPipeline
+from src.infra.models.models import BaseSQLModel
 
 
 fake = Faker()
@@ -28,61 +24,39 @@ async def create_tables():
         await conn.run_sync(BaseSQLModel.metadata.create_all)
 
 
-async def generate_data(entity: OrganizationComposerEntity):
-    async with client_session.create_session() as session:
-        try:
-            organization = Organization(
-                name=entity.organization_entity.name,
-            )
-            organization.building = Building(**entity.building_entity.to_dict())
-            for phone_entity in entity.phones_entities_list:
-                organization.phones.append(Phone(number=phone_entity.number))
-
-            parent_activity = Activity(name=entity.activity_entities_list[0].name)
-            child_activity = Activity(
-                name=entity.activity_entities_list[-1].name, parent=[parent_activity]
-            )
-            organization.activities.append(child_activity)
-
-            session.add(organization)
-            await session.commit()
-        except SQLAlchemyError as e:
-            await session.rollback()
-            raise e
-
-
-async def bulk_generate(organizations_number: int):
-    tasks = []
-
+def generate_data(organizations_number: int) -> Iterator[OrganizationComposerEntity]:
     for _ in range(organizations_number):
-        tasks.append(
-            generate_data(
-                OrganizationComposerEntity(
-                    activity_entities_list=[
-                        ActivityEntity(name=fake.job()),
-                        ActivityEntity(name=fake.job()),
-                    ],
-                    organization_entity=OrganizationEntity(name=fake.name()),
-                    building_entity=BuildingEntity(
-                        address=fake.address(),
-                        latitude=fake.latitude(),
-                        longitude=fake.longitude(),
-                    ),
-                    phones_entities_list=[
-                        PhoneEntity(number=fake.phone_number()),
-                        PhoneEntity(number=fake.phone_number()),
-                    ],
-                )
-            )
+        yield OrganizationComposerEntity(
+            activity_entities_list=[
+                ActivityEntity(
+                    name=fake.job(), parent=ActivityEntity(name=fake.job())
+                ),
+            ],
+            organization_entity=OrganizationEntity(name=fake.name()),
+            building_entity=BuildingEntity(
+                address=fake.address(),
+                latitude=fake.latitude(),
+                longitude=fake.longitude(),
+            ),
+            phones_entities_list=[
+                PhoneEntity(number=fake.phone_number()),
+                PhoneEntity(number=fake.phone_number()),
+            ],
         )
 
-    return await asyncio.gather(*tasks)
+
+async def bulk_generate(organizations_number: int):
+    pipeline = BulkIngestionPipeline(async_client=client_session)
+    return await pipeline.ingest(generate_data(organizations_number))
 
 
-async def main():
+async def main(organizations_number: int):
     await create_tables()
-    await bulk_generate(50)
+    await bulk_generate(organizations_number)
+    await client_session.dispose()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("count", type=int, nargs="?", default=50)
+    asyncio.run(main(parser.parse_args().count))
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fastapi import Request, Depends, Query, HTTPException
+
+from src.common.distance import DistancePrecision
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.export.pipeline import DirectoryExporter
+from src.infra.repos.activity_repo import ActivityRepository
+from src.infra.repos.change_repo import ChangeRepository
+from src.infra.repos.organization_repo import OrganizationRepository
+from src.logic.repo_services.activity_service import ActivityService
+from src.logic.repo_services.cache import ResponseCache
+from src.logic.repo_services.change_service import ChangeService
+from src.logic.repo_services.organization_service import OrganizationService
+from src.logic.repo_services.single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    from src.infra.search.name_index import OrganizationNameIndex
+    from src.infra.spatial.building_index import BuildingSpatialIndex
+
+
+API_KEYS = ["some_valid_api_key_213hj123hMEga_confidential"]
+
+
+def get_api_key(api_key: str = Query(..., description="API key required")):
+    if api_key not in API_KEYS:
+        raise HTTPException(status_code=403, detail="Invalid API key")
+
+    return api_key
+
+
+def get_async_client(request: Request) -> AsyncPostgresClient:
+    return request.app.state.async_client
+
+
+def get_building_index(request: Request) -> BuildingSpatialIndex | None:
+    return request.app.state.building_index
+
+
+def get_name_index(request: Request) -> OrganizationNameIndex | None:
+    return request.app.state.name_index
+
+
+def get_response_cache(request: Request) -> ResponseCache | None:
+    return request.app.state.response_cache
+
+
+def get_single_flight(request: Request) -> SingleFlight | None:
+    return request.app.state.single_flight
+
+
+def get_organization_service(
+    async_client: AsyncPostgresClient = Depends(get_async_client),
+    building_index: BuildingSpatialIndex | None = Depends(get_building_index),
+    name_index: OrganizationNameIndex | None = Depends(get_name_index),
+    cache: ResponseCache | None = Depends(get_response_cache),
+    single_flight: SingleFlight | None = Depends(get_single_flight),
+) -> OrganizationService:
+    return OrganizationService(
+        repository=OrganizationRepository(),
+        async_client=async_client,
+        building_index=building_index,
+        name_index=name_index,
+        distance_precision=DistancePrecision(async_client.settings.distance_precision),
+        cache=cache,
+        single_flight=single_flight,
+        stream_chunk_size=async_client.settings.stream_chunk_size,
+        fast_serialization=async_client.settings.fast_serialization_enabled,
+        json_projection=async_client.settings.json_projection_enabled,
+    )
+
+
+def get_activity_service(
+    async_client: AsyncPostgresClient = Depends(get_async_client),
+    cache: ResponseCache | None = Depends(get_response_cache),
+    single_flight: SingleFlight | None = Depends(get_single_flight),
+) -> ActivityService:
+    return ActivityService(
+        repository=ActivityRepository(),
+        async_client=async_client,
+        cache=cache,
+        single_flight=single_flight,
+    )
+
+
+def get_change_service(
+    async_client: AsyncPostgresClient = Depends(get_async_client),
+) -> ChangeService:
+    return ChangeService(repository=ChangeRepository(), async_client=async_client)
+
+
+def get_directory_exporter(
+    async_client: AsyncPostgresClient = Depends(get_async_client),
+) -> DirectoryExporter:
+    return DirectoryExporter(
+        async_client=async_client,
+        chunk_size=async_client.settings.export_chunk_size,
+        max_pending_chunks=async_client.settings.export_max_pending_chunks,
+    )
@@ -0,0 +1,43 @@
+from fastapi import Depends, HTTPException, Request, Response
+
+from src.api.dependencies import get_organization_service
+from src.logic.repo_services.organization_service import OrganizationService
+
+
+def make_etag(version: str) -> str:
+    return f'"{version}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names ``etag``."""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in header.split(",")
+    )
+
+
+async def check_directory_version(
+    request: Request,
+    response: Response,
+    service: OrganizationService = Depends(get_organization_service),
+) -> dict[str, str]:
+    """Answers a matching If-None-Match with 304 before the endpoint loads
+    anything, and returns the validator headers for the full response.
+
+    The ETag is the directory version rather than a hash of the body, so it
+    holds for every representation of the same data.
+    """
+    if not service.async_client.settings.conditional_requests_enabled:
+        return {}
+    etag = make_etag(await service.get_directory_version())
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if is_not_modified(request, etag):
+        raise HTTPException(status_code=304, headers=headers)
+    # Applied by FastAPI when the endpoint returns a model; responses built
+    # by the endpoint get them passed explicitly.
+    response.headers.update(headers)
+    return headers
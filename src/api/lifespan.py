@@ -1,8 +1,213 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncGenerator
+
+from fastapi import FastAPI
+
+from src.domain.schemas.activity import ActivityTreeQuerySchema
+from src.infra.cache.backends import InMemoryCacheBackend
 from src.infra.db.db import AsyncPostgresClient
+from src.infra.db.notifications import run_listener
+from src.infra.db.schema import verify_schema
 from src.infra.models.base import Base
+from src.infra.models.models import DIRECTORY_CHANGES_CHANNEL
+from src.infra.repos.activity_repo import ActivityRepository
+from src.logic.repo_services.activity_service import ActivityService
+from src.logic.repo_services.cache import (
+    ResponseCache,
+    ORGANIZATIONS_NAMESPACE,
+    ACTIVITIES_NAMESPACE,
+    BUILDINGS_NAMESPACE,
+)
+from src.logic.repo_services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Same as the defaults of GET /api/activities/tree/, so priming fills the
+# cache entry that endpoint reads.
+FULL_ACTIVITY_TREE = ActivityTreeQuerySchema(id=None, name=None, max_depth=3)
 
 
-async def run_migrations():
-    client: AsyncPostgresClient = AsyncPostgresClient()
+async def run_migrations(client: AsyncPostgresClient):
     async with client.engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+
+async def prepare_schema(client: AsyncPostgresClient) -> None:
+    mode = client.settings.schema_startup_mode
+    if mode == "verify":
+        await verify_schema(client)
+    elif mode == "create_all":
+        await run_migrations(client)
+
+
+async def load_building_index(client: AsyncPostgresClient):
+    # The indexes pull in numpy, so they are only imported once enabled.
+    from src.infra.spatial.building_index import BuildingSpatialIndex
+
+    building_index = BuildingSpatialIndex(
+        cell_size_deg=client.settings.spatial_index_cell_size_deg
+    )
+    async with client.create_session() as session:
+        await building_index.load(session)
+    return building_index
+
+
+async def load_name_index(client: AsyncPostgresClient):
+    from src.infra.search.name_index import OrganizationNameIndex
+
+    name_index = OrganizationNameIndex(
+        similarity_threshold=client.settings.search_similarity_threshold
+    )
+    async with client.create_session() as session:
+        await name_index.load(session)
+    return name_index
+
+
+def create_response_cache(client: AsyncPostgresClient) -> ResponseCache:
+    settings = client.settings
+    return ResponseCache(
+        backend=InMemoryCacheBackend(max_entries=settings.cache_max_entries),
+        ttls={
+            ORGANIZATIONS_NAMESPACE: settings.cache_ttl_organizations,
+            ACTIVITIES_NAMESPACE: settings.cache_ttl_activities,
+            BUILDINGS_NAMESPACE: settings.cache_ttl_buildings,
+        },
+    )
+
+
+async def open_connections(client: AsyncPostgresClient, count: int) -> None:
+    """Fills the pool so the first requests don't pay for connecting."""
+    connections = await asyncio.gather(
+        *(client.engine.connect().start() for _ in range(count))
+    )
+    for connection in connections:
+        await connection.close()
+
+
+async def warm_up(
+    app: FastAPI, client: AsyncPostgresClient, background_tasks: list[asyncio.Task]
+) -> None:
+    """Loads everything requests benefit from, then reports the app ready.
+
+    Requests are served meanwhile: without the indexes they fall back to SQL.
+    """
+    settings = client.settings
+    timings = app.state.startup_timings
+    started = time.perf_counter()
+    await open_connections(
+        client, min(settings.startup_warm_connections, settings.postgres_pool_size)
+    )
+    timings["connections"] = time.perf_counter() - started
+
+    if settings.spatial_index_enabled:
+        phase_started = time.perf_counter()
+        app.state.building_index = await load_building_index(client)
+        timings["building_index"] = time.perf_counter() - phase_started
+        background_tasks.append(
+            asyncio.create_task(
+                app.state.building_index.run_refresh_loop(
+                    client, settings.spatial_index_refresh_interval
+                )
+            )
+        )
+    if settings.search_index_enabled:
+        phase_started = time.perf_counter()
+        app.state.name_index = await load_name_index(client)
+        timings["name_index"] = time.perf_counter() - phase_started
+        background_tasks.append(
+            asyncio.create_task(
+                app.state.name_index.run_refresh_loop(
+                    client, settings.search_index_refresh_interval
+                )
+            )
+        )
+    if app.state.response_cache is not None:
+        phase_started = time.perf_counter()
+        service = ActivityService(
+            repository=ActivityRepository(),
+            async_client=client,
+            cache=app.state.response_cache,
+        )
+        await service.get_activity_tree(tree_schema=FULL_ACTIVITY_TREE)
+        timings["cache"] = time.perf_counter() - phase_started
+
+    timings["warm_up"] = time.perf_counter() - started
+    timings["total"] = time.perf_counter() - app.state.startup_started
+    app.state.ready = True
+    if timings["total"] > settings.startup_budget_seconds:
+        logger.warning(
+            "Startup took %.2fs, over the %.2fs budget: %s",
+            timings["total"],
+            settings.startup_budget_seconds,
+            ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in timings.items()),
+        )
+    else:
+        logger.info("Ready in %.2fs", timings["total"])
+
+
+async def run_warm_up(
+    app: FastAPI, client: AsyncPostgresClient, background_tasks: list[asyncio.Task]
+) -> None:
+    try:
+        await warm_up(app, client, background_tasks)
+    except Exception:
+        # Readiness stays false, so the orchestrator restarts the process.
+        logger.exception("Warm-up failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    app.state.startup_started = time.perf_counter()
+    app.state.startup_timings = {}
+    app.state.ready = False
+    client = AsyncPostgresClient()
+    app.state.async_client = client
+    app.state.building_index = None
+    app.state.name_index = None
+    app.state.response_cache = None
+    app.state.single_flight = None
+    background_tasks: list[asyncio.Task] = []
+    try:
+        await prepare_schema(client)
+        app.state.startup_timings["schema"] = (
+            time.perf_counter() - app.state.startup_started
+        )
+        if client.replicas:
+            background_tasks.append(
+                asyncio.create_task(
+                    client.replicas.run_health_checks(
+                        client.settings.postgres_replica_check_interval
+                    )
+                )
+            )
+        if client.settings.single_flight_enabled:
+            app.state.single_flight = SingleFlight(
+                timeout=client.settings.single_flight_timeout
+            )
+        if client.settings.cache_enabled:
+            cache = create_response_cache(client)
+            app.state.response_cache = cache
+            # Every response embeds rows from all directory tables, so any
+            # write drops the whole cache, as does losing the listener.
+            background_tasks.append(
+                asyncio.create_task(
+                    run_listener(
+                        client,
+                        DIRECTORY_CHANGES_CHANNEL,
+                        lambda payload: cache.invalidate(),
+                    )
+                )
+            )
+        background_tasks.append(
+            asyncio.create_task(run_warm_up(app, client, background_tasks))
+        )
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        await client.dispose()
@@ -1,21 +1,64 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from src.api.lifespan import run_migrations
+from src.api.lifespan import lifespan
+from src.api.metrics import MetricsMiddleware, render_metrics
+from src.api.query_budget import QueryBudgetMiddleware
+from src.api.rate_limit import RateLimitMiddleware, get_rate_limit_options
+from src.api.routers.activity_router import router as activity_router
+from src.api.routers.change_router import router as change_router
+from src.api.routers.export_router import router as export_router
 from src.api.routers.organization_router import router as organization_router
+from src.common.metrics import CONTENT_TYPE
+from src.common.settings import get_settings
+from src.logic.repo_services.single_flight import SingleFlightTimeoutError
 
 
 def get_app():
     app = FastAPI(
         title="API",
+        lifespan=lifespan,
     )
     app.include_router(organization_router)
+    app.include_router(activity_router)
+    app.include_router(change_router)
+    app.include_router(export_router)
 
-    @app.on_event("startup")
-    async def on_startup():
-        await run_migrations()
+    @app.exception_handler(SingleFlightTimeoutError)
+    async def single_flight_timeout(
+        request: Request, exc: SingleFlightTimeoutError
+    ) -> JSONResponse:
+        return JSONResponse(status_code=504, content={"detail": str(exc)})
 
     @app.get("/")
     async def healthcheck() -> dict[str, bool]:
         return {"Success": True}
 
+    @app.get("/ready", responses={503: {"description": "Still warming up"}})
+    async def readiness(request: Request) -> dict[str, bool]:
+        if not request.app.state.ready:
+            return JSONResponse(status_code=503, content={"ready": False})
+        return {"ready": True}
+
+    settings = get_settings()
+    if settings.query_budget_enabled:
+        app.add_middleware(
+            QueryBudgetMiddleware,
+            max_statements=settings.query_budget_max_statements,
+            max_repeats=settings.query_budget_max_repeats,
+            raise_on_violation=settings.query_budget_raise,
+        )
+
+    if settings.rate_limit_enabled or settings.load_shedding_enabled:
+        app.add_middleware(RateLimitMiddleware, **get_rate_limit_options(settings))
+
+    if settings.metrics_enabled:
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics(request: Request) -> PlainTextResponse:
+            return PlainTextResponse(
+                render_metrics(request.app.state), media_type=CONTENT_TYPE
+            )
+
     return app
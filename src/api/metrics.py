@@ -0,0 +1,189 @@
+import time
+from dataclasses import dataclass
+from typing import Iterator
+
+from starlette.datastructures import State
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.common.metrics import REGISTRY, render_family
+from src.infra.db.metrics import track_queries
+
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 20, 50, 100)
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time to handle a request, streamed bodies included",
+    ("method", "route", "status"),
+)
+REQUEST_STATEMENTS = REGISTRY.histogram(
+    "http_request_db_statements",
+    "SQL statements sent while handling a request",
+    ("route",),
+    buckets=STATEMENT_COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = REGISTRY.histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL statements while handling a request",
+    ("route",),
+)
+
+
+def get_route_path(scope: Scope) -> str:
+    # The router stores the matched route in the scope; using its template
+    # keeps one series per endpoint instead of one per URL.
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+@dataclass(eq=False)
+class MetricsMiddleware:
+    app: ASGIApp
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = get_route_path(scope)
+                REQUEST_SECONDS.observe(
+                    time.perf_counter() - started, scope["method"], route, str(status)
+                )
+                REQUEST_STATEMENTS.observe(stats.statements, route)
+                REQUEST_DB_SECONDS.observe(stats.seconds, route)
+
+
+def collect_pool_metrics(state: State) -> Iterator[str]:
+    client = state.async_client
+    pool = client.engine.pool
+    capacity = pool.size() + client.settings.postgres_max_overflow
+    checked_out = pool.checkedout()
+    yield from render_family(
+        "db_pool_size", "gauge", "Connections kept open by the pool", [({}, pool.size())]
+    )
+    yield from render_family(
+        "db_pool_capacity",
+        "gauge",
+        "Most connections the pool hands out, overflow included",
+        [({}, capacity)],
+    )
+    yield from render_family(
+        "db_pool_checked_out",
+        "gauge",
+        "Connections currently in use",
+        [({}, checked_out)],
+    )
+    yield from render_family(
+        "db_pool_saturation",
+        "gauge",
+        "Share of the pool capacity currently in use",
+        [({}, checked_out / capacity if capacity else 0.0)],
+    )
+
+
+def collect_replica_metrics(state: State) -> Iterator[str]:
+    replicas = state.async_client.replicas.replicas
+    if not replicas:
+        return
+    yield from render_family(
+        "db_replica_healthy",
+        "gauge",
+        "Whether a replica is in rotation for reads",
+        [({"replica": replica.name}, int(replica.healthy)) for replica in replicas],
+    )
+    yield from render_family(
+        "db_replica_lag_seconds",
+        "gauge",
+        "Replication lag seen by the last health check",
+        [
+            ({"replica": replica.name}, replica.lag_seconds)
+            for replica in replicas
+            if replica.lag_seconds is not None
+        ],
+    )
+    yield from render_family(
+        "db_replica_sessions",
+        "gauge",
+        "Sessions currently open on a replica",
+        [({"replica": replica.name}, replica.sessions) for replica in replicas],
+    )
+
+
+def collect_cache_metrics(state: State) -> Iterator[str]:
+    cache = state.response_cache
+    if cache is None:
+        return
+    stats = list(cache.stats.items())
+    yield from render_family(
+        "cache_hits_total",
+        "counter",
+        "Response cache lookups that found a value",
+        [({"namespace": namespace}, stat.hits) for namespace, stat in stats],
+    )
+    yield from render_family(
+        "cache_misses_total",
+        "counter",
+        "Response cache lookups that had to load the value",
+        [({"namespace": namespace}, stat.misses) for namespace, stat in stats],
+    )
+
+
+def collect_single_flight_metrics(state: State) -> Iterator[str]:
+    single_flight = state.single_flight
+    if single_flight is None:
+        return
+    stats = list(single_flight.stats.items())
+    for name, documentation in (
+        ("calls", "Loads started by single-flight"),
+        ("coalesced", "Callers that joined a load already in flight"),
+        ("timeouts", "Callers that gave up waiting for a load"),
+        ("cancellations", "Callers cancelled while waiting for a load"),
+    ):
+        yield from render_family(
+            f"single_flight_{name}_total",
+            "counter",
+            documentation,
+            [({"namespace": namespace}, getattr(stat, name)) for namespace, stat in stats],
+        )
+    yield from render_family(
+        "single_flight_in_flight",
+        "gauge",
+        "Loads currently in flight",
+        [({}, len(single_flight))],
+    )
+
+
+def collect_startup_metrics(state: State) -> Iterator[str]:
+    yield from render_family(
+        "app_ready", "gauge", "Whether warm-up has finished", [({}, int(state.ready))]
+    )
+    yield from render_family(
+        "app_startup_phase_seconds",
+        "gauge",
+        "Time spent in each startup phase",
+        [({"phase": phase}, seconds) for phase, seconds in state.startup_timings.items()],
+    )
+
+
+def render_metrics(state: State) -> str:
+    lines = [
+        *REGISTRY.render(),
+        *collect_startup_metrics(state),
+        *collect_pool_metrics(state),
+        *collect_replica_metrics(state),
+        *collect_cache_metrics(state),
+        *collect_single_flight_metrics(state),
+    ]
+    return "\n".join(lines) + "\n"
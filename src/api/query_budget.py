@@ -0,0 +1,40 @@
+from dataclasses import dataclass
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.api.metrics import get_route_path
+from src.infra.db.query_budget import detect_queries
+
+# Streams run the same statements once per chunk by design.
+STREAM_MEDIA_TYPES = (b"application/x-ndjson",)
+
+
+@dataclass(eq=False)
+class QueryBudgetMiddleware:
+    """Applies ``detect_queries`` to every request, for development runs."""
+
+    app: ASGIApp
+    max_statements: int | None = None
+    max_repeats: int | None = None
+    raise_on_violation: bool = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with detect_queries(
+            max_statements=self.max_statements,
+            max_repeats=self.max_repeats,
+            raise_on_violation=self.raise_on_violation,
+            label=f"{scope['method']} {scope['path']}",
+        ) as budget:
+
+            async def send_checked(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                    budget.paused = content_type.startswith(STREAM_MEDIA_TYPES)
+                await send(message)
+
+            await self.app(scope, receive, send_checked)
+            budget.label = f"{scope['method']} {get_route_path(scope)}"
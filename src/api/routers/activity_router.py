@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, Request, Response
+
+from src.api.dependencies import get_activity_service, get_api_key
+from src.api.etag import make_etag, is_not_modified
+from src.common.converters.query_converters import get_activity_tree_query_params
+from src.domain.schemas.activity import ActivityTreeQuerySchema, ActivityTreeVersionSchema
+from src.logic.repo_services.activity_service import ActivityService
+
+router = APIRouter(prefix="/api", tags=["api"])
+
+
+@router.get(
+    "/activities/tree/",
+    description="Returns the activity tree truncated to max_depth levels",
+    responses={304: {"description": "Tree matches the If-None-Match version"}},
+)
+async def get(
+        request: Request,
+        response: Response,
+        api_key: str = Depends(get_api_key),
+        schema: ActivityTreeQuerySchema = Depends(get_activity_tree_query_params),
+        service: ActivityService = Depends(get_activity_service),
+) -> ActivityTreeVersionSchema:
+    result = await service.get_activity_tree(tree_schema=schema)
+    etag = make_etag(result.version)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return result
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
+
+from src.api.dependencies import get_change_service, get_api_key
+from src.common.converters.query_converters import get_change_feed_query_params
+from src.domain.schemas.change import ChangeFeedQuerySchema, ChangeFeedSchema
+from src.domain.schemas.pagination import InvalidCursorError
+from src.logic.repo_services.change_service import ChangeService
+
+router = APIRouter(prefix="/api", tags=["api"])
+
+
+@router.get(
+    "/changes/",
+    description="Returns rows of the directory tables changed since a time or cursor, with tombstones for deleted rows",
+)
+async def get(
+        api_key: str = Depends(get_api_key),
+        schema: ChangeFeedQuerySchema = Depends(get_change_feed_query_params),
+        service: ChangeService = Depends(get_change_service),
+) -> ChangeFeedSchema:
+    try:
+        result = await service.get_changes(change_schema=schema)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(result, media_type="application/json")
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from src.api.dependencies import get_directory_exporter, get_api_key
+from src.infra.export.pipeline import (
+    EXPORT_MEDIA_TYPES,
+    DirectoryExporter,
+    ExportFormat,
+    ExportFormatUnavailableError,
+    check_export_format,
+)
+
+router = APIRouter(prefix="/api", tags=["api"])
+
+
+@router.get(
+    "/export/",
+    description="Streams the whole directory, one row per organization with its building, phones and activities",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}}},
+)
+async def get(
+        api_key: str = Depends(get_api_key),
+        format: ExportFormat = Query("csv", description="csv, parquet or arrow (an Arrow IPC stream)"),
+        exporter: DirectoryExporter = Depends(get_directory_exporter),
+):
+    # Checked before the response starts: once streaming, errors can only
+    # cut it short.
+    try:
+        check_export_format(format)
+    except ExportFormatUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return StreamingResponse(
+        exporter.export(format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="directory.{format}"'},
+    )
@@ -1,78 +1,159 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import StreamingResponse, ORJSONResponse, Response
 
+from src.api.dependencies import get_organization_service, get_api_key
+from src.api.etag import check_directory_version
+from src.common.metrics import SERIALIZATION_SECONDS
 from src.common.converters.query_converters import (
     get_organization_query_params,
+    get_organization_search_query_params,
     get_activity_query_params,
     get_building_query_params,
+    get_pagination_query_params,
 )
 from src.domain.schemas.activity import ActivityQuerySchema
 from src.domain.schemas.building import BuildingQuerySchema
 from src.domain.schemas.organization import (
     OrganizationQuerySchema,
+    OrganizationBatchQuerySchema,
+    OrganizationBatchSchema,
     FullOutOrganizationSchema,
+    OrganizationSearchQuerySchema,
+    OrganizationSearchResultSchema,
 )
-from src.infra.db.db import AsyncPostgresClient
-from src.infra.repos.organization_repo import OrganizationRepository
+from src.domain.schemas.pagination import PaginationQuerySchema, InvalidCursorError
 from src.logic.repo_services.organization_service import OrganizationService
 
 router = APIRouter(prefix="/api", tags=["api"])
 
 
-def get_api_key(api_key: str = Query(..., description="API key required")):
-    valid_api_keys = ["some_valid_api_key_213hj123hMEga_confidential"]
+class NDJSONResponse(StreamingResponse):
+    media_type = "application/x-ndjson"
 
-    if api_key not in valid_api_keys:
-        raise HTTPException(status_code=403, detail="Invalid API key")
 
-    return api_key
+def render(result, headers: dict[str, str] | None = None):
+    # Fast serialization returns plain dicts and the JSON projection returns
+    # ready bytes; both skip FastAPI's own encoding.
+    if isinstance(result, dict):
+        with SERIALIZATION_SECONDS.time("orjson"):
+            return ORJSONResponse(result, headers=headers)
+    if isinstance(result, bytes):
+        return Response(result, media_type="application/json", headers=headers)
+    return result
+
 
 
 
-@router.get("/organizations/", description="Returns organizations")
+@router.get("/organizations/", description="Returns organizations", responses={304: {"description": "Directory matches the If-None-Match version"}})
 async def get(
     api_key: str = Depends(get_api_key),
+    headers: dict[str, str] = Depends(check_directory_version),
     schema: OrganizationQuerySchema = Depends(get_organization_query_params),
+    service: OrganizationService = Depends(get_organization_service),
 ) -> FullOutOrganizationSchema | None:
-    service = OrganizationService(
-        repository=OrganizationRepository(), async_client=AsyncPostgresClient()
-    )
     result = await service.get_organization_by_entity(organization_entity=schema)
     if not result:
         return None
-    return result
+    return render(result, headers)
+
+
+@router.post("/organizations/batch/", description="Returns organizations by many ids and/or names at once")
+async def post(
+        schema: OrganizationBatchQuerySchema,
+        api_key: str = Depends(get_api_key),
+        service: OrganizationService = Depends(get_organization_service),
+) -> OrganizationBatchSchema:
+    return render(await service.get_organizations_batch(batch_schema=schema))
+
+
+@router.get("/organizations/search/", description="Returns organizations ranked by how well their name matches, tolerating typos", responses={304: {"description": "Directory matches the If-None-Match version"}})
+async def get(
+        api_key: str = Depends(get_api_key),
+        headers: dict[str, str] = Depends(check_directory_version),
+        schema: OrganizationSearchQuerySchema = Depends(get_organization_search_query_params),
+        service: OrganizationService = Depends(get_organization_service),
+) -> OrganizationSearchResultSchema:
+    return render(await service.search_organizations(search_schema=schema), headers)
 
 
-@router.get("/organizations/activities/", description="Returns organizations by activity they belong")
+@router.get("/organizations/activities/", description="Returns organizations by activity they belong", responses={304: {"description": "Directory matches the If-None-Match version"}})
 async def get(
         api_key: str = Depends(get_api_key),
-        schema: ActivityQuerySchema = Depends(get_activity_query_params)):
-    service = OrganizationService(
-        repository=OrganizationRepository(), async_client=AsyncPostgresClient()
-    )
-    if schema.is_parent:
-        result = await service.get_organizations_by_activity_tree(
-            activity_schema=schema
+        headers: dict[str, str] = Depends(check_directory_version),
+        schema: ActivityQuerySchema = Depends(get_activity_query_params),
+        pagination: PaginationQuerySchema = Depends(get_pagination_query_params),
+        stream: bool = Query(False, description="Stream every match as NDJSON instead of a page"),
+        service: OrganizationService = Depends(get_organization_service)):
+    if stream:
+        if schema.is_parent:
+            return NDJSONResponse(
+                service.stream_organizations_by_activity_tree(activity_schema=schema),
+                headers=headers,
+            )
+        return NDJSONResponse(
+            service.stream_organizations_by_activity(activity_schema=schema),
+            headers=headers,
         )
-        return result
-    result = await service.get_organizations_by_activity(activity_schema=schema)
-    if not result:
-        return None
-    return result
+    try:
+        if schema.is_parent:
+            return render(
+                await service.get_organizations_by_activity_tree(
+                    activity_schema=schema, pagination=pagination
+                ),
+                headers,
+            )
+        return render(
+            await service.get_organizations_by_activity(
+                activity_schema=schema, pagination=pagination
+            ),
+            headers,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/organizations/buildings/", description="Returns organizations by building they belong")
+@router.get("/organizations/buildings/", description="Returns organizations by building they belong", responses={304: {"description": "Directory matches the If-None-Match version"}})
 async def get(
         api_key: str = Depends(get_api_key),
-        schema: BuildingQuerySchema = Depends(get_building_query_params)):
-    service = OrganizationService(
-        repository=OrganizationRepository(), async_client=AsyncPostgresClient()
-    )
-    if schema.id:
-        result = await service.get_organizations_from_building_id(building_id=schema.id)
-        return result
-    result = await service.get_organizations_in_radius(
-        latitude=schema.latitude, longitude=schema.longitude, radius_km=schema.radius_km
-    )
-    if not result:
-        return None
-    return result
+        headers: dict[str, str] = Depends(check_directory_version),
+        schema: BuildingQuerySchema = Depends(get_building_query_params),
+        pagination: PaginationQuerySchema = Depends(get_pagination_query_params),
+        stream: bool = Query(False, description="Stream every match as NDJSON instead of a page"),
+        service: OrganizationService = Depends(get_organization_service)):
+    if not schema.id and (schema.latitude is None or schema.longitude is None):
+        raise HTTPException(
+            status_code=400, detail="Either id or latitude and longitude are required"
+        )
+    if stream:
+        if schema.id:
+            return NDJSONResponse(
+                service.stream_organizations_from_building_id(building_id=schema.id),
+                headers=headers,
+            )
+        return NDJSONResponse(
+            service.stream_organizations_in_radius(
+                latitude=schema.latitude,
+                longitude=schema.longitude,
+                radius_km=schema.radius_km,
+            ),
+            headers=headers,
+        )
+    try:
+        if schema.id:
+            return render(
+                await service.get_organizations_from_building_id(
+                    building_id=schema.id, pagination=pagination
+                ),
+                headers,
+            )
+        return render(
+            await service.get_organizations_in_radius(
+                latitude=schema.latitude,
+                longitude=schema.longitude,
+                radius_km=schema.radius_km,
+                pagination=pagination,
+            ),
+            headers,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,28 +1,76 @@
-from src.domain.schemas.activity import ActivitySchema
+from itertools import groupby
+
+from sqlalchemy import Row
+
+from src.domain.schemas.activity import ActivitySchema, ActivityTreeSchema
 from src.domain.schemas.building import BuildingSchema
 from src.domain.schemas.organization import (
     FullOutOrganizationSchema,
     OrganizationSchema,
+    OrganizationDistanceSchema,
+    OrganizationSearchSchema,
 )
 from src.domain.schemas.phone import PhoneSchema
 from src.infra.models.models import Organization
 
 
-def convert_to_organization_entity(model: Organization) -> FullOutOrganizationSchema:
-    return FullOutOrganizationSchema(
-        organization=OrganizationSchema(name=model.name),
-        phones=[PhoneSchema(number=phone.number) for phone in model.phones],
-        building=BuildingSchema(
+def _get_organization_fields(model: Organization) -> dict:
+    return {
+        "organization": OrganizationSchema(name=model.name),
+        "phones": [PhoneSchema(number=phone.number) for phone in model.phones],
+        "building": BuildingSchema(
             address=model.building.address,
             longitude=model.building.longitude,
             latitude=model.building.latitude,
         ),
-        activities=[
+        "activities": [
             ActivitySchema(name=activity.name) for activity in model.activities
         ],
+    }
+
+
+def convert_to_organization_entity(model: Organization) -> FullOutOrganizationSchema:
+    return FullOutOrganizationSchema(**_get_organization_fields(model))
+
+
+def convert_to_organization_distance_entity(
+    model: Organization, distance_km: float
+) -> OrganizationDistanceSchema:
+    return OrganizationDistanceSchema(
+        **_get_organization_fields(model), distance_km=distance_km
     )
 
 
+def convert_to_organization_search_entity(
+    model: Organization, score: float
+) -> OrganizationSearchSchema:
+    return OrganizationSearchSchema(**_get_organization_fields(model), score=score)
+
+
+def convert_to_organization_dict(model: Organization) -> dict:
+    """Same JSON shape as ``FullOutOrganizationSchema``, without the models."""
+    return {
+        "organization": {"name": model.name},
+        "phones": [{"number": phone.number} for phone in model.phones],
+        "building": {
+            "address": model.building.address,
+            "latitude": model.building.latitude,
+            "longitude": model.building.longitude,
+        },
+        "activities": [{"name": activity.name} for activity in model.activities],
+    }
+
+
+def convert_to_organization_distance_dict(
+    model: Organization, distance_km: float
+) -> dict:
+    return convert_to_organization_dict(model) | {"distance_km": distance_km}
+
+
+def convert_to_organization_search_dict(model: Organization, score: float) -> dict:
+    return convert_to_organization_dict(model) | {"score": score}
+
+
 def convert_to_organization_entity_from_dict(
     model: Organization,
 ) -> FullOutOrganizationSchema:
@@ -58,3 +106,18 @@ def convert_to_organization_entity_from_dict(
 
 def convert_to_activity_entity(model: ActivitySchema) -> ActivitySchema:
     return ActivitySchema(name=model.name)
+
+
+def convert_to_activity_trees(rows: list[Row]) -> list[ActivityTreeSchema]:
+    """Assembles rows from ``ActivityRepository.get_activity_tree`` into trees."""
+    trees = []
+    for _, root_rows in groupby(rows, key=lambda row: row.root_id):
+        nodes = {}
+        for row in root_rows:
+            node = {"id": row.id, "name": row.name, "children": []}
+            nodes[row.id] = node
+            if row.depth == 0:
+                trees.append(node)
+            else:
+                nodes[row.parent_id]["children"].append(node)
+    return [ActivityTreeSchema.model_validate(tree) for tree in trees]
@@ -1,8 +1,15 @@
+from datetime import datetime
+
 from fastapi import Query
 
-from src.domain.schemas.activity import ActivityQuerySchema
+from src.domain.schemas.activity import ActivityQuerySchema, ActivityTreeQuerySchema
 from src.domain.schemas.building import BuildingQuerySchema
-from src.domain.schemas.organization import OrganizationQuerySchema
+from src.domain.schemas.change import ChangeFeedQuerySchema
+from src.domain.schemas.organization import (
+    OrganizationQuerySchema,
+    OrganizationSearchQuerySchema,
+)
+from src.domain.schemas.pagination import PaginationQuerySchema
 
 
 def get_organization_query_params(
@@ -12,6 +19,13 @@ def get_organization_query_params(
     return OrganizationQuerySchema(name=name, id=id)
 
 
+def get_organization_search_query_params(
+        q: str = Query(..., min_length=1, max_length=100, example="Micrsoft", description="Part of the organization name, typos allowed"),
+        limit: int = Query(10, ge=1, le=50, description="Number of matches"),
+) -> OrganizationSearchQuerySchema:
+    return OrganizationSearchQuerySchema(q=q, limit=limit)
+
+
 def get_building_query_params(
         id: int | None = Query(default=None, description="Building id"),
         longitude: float | None = Query(default=None, example=23.123, description="longitude"),
@@ -33,3 +47,26 @@ def get_activity_query_params(
         name: str | None = Query(None, example="Cleaning", description="activity name"),
 ) -> ActivityQuerySchema:
     return ActivityQuerySchema(name=name, id=id, is_parent=is_parent)
+
+
+def get_activity_tree_query_params(
+        id: int | None = Query(None, example=123, description="Root activity id"),
+        name: str | None = Query(None, example="Food", description="Root activity name"),
+        max_depth: int = Query(3, ge=1, le=3, description="Levels to return, counting the root"),
+) -> ActivityTreeQuerySchema:
+    return ActivityTreeQuerySchema(id=id, name=name, max_depth=max_depth)
+
+
+def get_pagination_query_params(
+        limit: int = Query(100, ge=1, le=1000, description="Page size"),
+        cursor: str | None = Query(None, description="next_cursor of the previous page"),
+) -> PaginationQuerySchema:
+    return PaginationQuerySchema(limit=limit, cursor=cursor)
+
+
+def get_change_feed_query_params(
+        since: datetime | None = Query(None, example="2026-10-18T00:00:00Z", description="Start from changes made at or after this time; from the beginning if omitted"),
+        cursor: str | None = Query(None, description="next_cursor of the previous page, takes precedence over since"),
+        limit: int = Query(500, ge=1, le=5000, description="Page size"),
+) -> ChangeFeedQuerySchema:
+    return ChangeFeedQuerySchema(since=since, cursor=cursor, limit=limit)
@@ -0,0 +1,124 @@
+"""Vectorized distances between one point and a batch of coordinates.
+
+``DistancePrecision.HAVERSINE`` uses a sphere with the mean Earth radius and
+stays within 0.57% of ``geopy.distance.geodesic``. ``DistancePrecision.ELLIPSOIDAL``
+applies the Andoyer-Lambert correction on WGS-84 and stays within 0.001% of
+it (a few centimetres at city scale), except for near-antipodal points.
+
+numpy is imported by the vectorized functions themselves, so SQL-only callers
+such as the repositories don't pay for importing it.
+"""
+from __future__ import annotations
+
+import math
+from enum import Enum
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# Shortest degree of latitude on WGS-84, so bounding boxes never cut off
+# points that are inside the radius under either precision.
+KM_PER_DEGREE = 110.574
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+
+
+class DistancePrecision(str, Enum):
+    HAVERSINE = "haversine"
+    ELLIPSOIDAL = "ellipsoidal"
+
+    @property
+    def relative_tolerance(self) -> float:
+        if self is DistancePrecision.HAVERSINE:
+            return 0.0057
+        return 0.00001
+
+
+def get_bounding_box(
+    latitude: float, longitude: float, radius_km: float
+) -> tuple[float, float, list[tuple[float, float]] | None]:
+    """Returns latitude bounds and longitude ranges, ``None`` meaning all of them.
+
+    The longitude span is widest at the latitude where the search circle
+    touches its meridians, hence ``asin(sin(r) / cos(lat))``. Ranges are split
+    when they cross the antimeridian.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE
+    min_lat = max(latitude - delta_lat, -90.0)
+    max_lat = min(latitude + delta_lat, 90.0)
+    ratio = math.sin(math.radians(delta_lat)) / math.cos(math.radians(latitude))
+    if min_lat <= -90 or max_lat >= 90 or delta_lat >= 90 or ratio >= 1:
+        return min_lat, max_lat, None
+
+    delta_lon = math.degrees(math.asin(ratio))
+    min_lon = longitude - delta_lon
+    max_lon = longitude + delta_lon
+    if min_lon < -180:
+        return min_lat, max_lat, [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return min_lat, max_lat, [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return min_lat, max_lat, [(min_lon, max_lon)]
+
+
+def _central_angle(
+    lat_rad: float, lon_rad: float, latitudes: np.ndarray, longitudes: np.ndarray
+) -> np.ndarray:
+    import numpy as np
+
+    haversine = (
+        np.sin((latitudes - lat_rad) / 2) ** 2
+        + math.cos(lat_rad)
+        * np.cos(latitudes)
+        * np.sin((longitudes - lon_rad) / 2) ** 2
+    )
+    return 2 * np.arcsin(np.sqrt(np.minimum(haversine, 1.0)))
+
+
+def haversine_km(
+    latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray
+) -> np.ndarray:
+    import numpy as np
+
+    return EARTH_RADIUS_KM * _central_angle(
+        math.radians(latitude),
+        math.radians(longitude),
+        np.radians(latitudes),
+        np.radians(longitudes),
+    )
+
+
+def ellipsoidal_km(
+    latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray
+) -> np.ndarray:
+    import numpy as np
+
+    reduced_lat = math.atan((1 - WGS84_F) * math.tan(math.radians(latitude)))
+    reduced_lats = np.arctan((1 - WGS84_F) * np.tan(np.radians(latitudes)))
+    sigma = _central_angle(
+        reduced_lat, math.radians(longitude), reduced_lats, np.radians(longitudes)
+    )
+    p = (reduced_lat + reduced_lats) / 2
+    q = (reduced_lats - reduced_lat) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (sigma - np.sin(sigma)) * (np.sin(p) * np.cos(q) / np.cos(sigma / 2)) ** 2
+        y = (sigma + np.sin(sigma)) * (np.cos(p) * np.sin(q) / np.sin(sigma / 2)) ** 2
+        distances = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+    return np.where(sigma > 0, distances, 0.0)
+
+
+def distances_km(
+    latitude: float,
+    longitude: float,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    precision: DistancePrecision = DistancePrecision.HAVERSINE,
+) -> np.ndarray:
+    import numpy as np
+
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    if precision is DistancePrecision.ELLIPSOIDAL:
+        return ellipsoidal_km(latitude, longitude, latitudes, longitudes)
+    return haversine_km(latitude, longitude, latitudes, longitudes)
@@ -0,0 +1,121 @@
+"""Histograms rendered in the Prometheus text exposition format.
+
+Metrics are process wide and registered on ``REGISTRY`` when their module is
+imported, like the ``prometheus_client`` defaults. Observing a value is a dict
+lookup, a bisect and two additions, cheap enough for per-statement use; the
+cumulative bucket counts are only computed when metrics are scraped.
+"""
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape_label_value(str(value))}"' for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def render_family(
+    name: str,
+    kind: str,
+    documentation: str,
+    samples: Iterable[tuple[dict[str, str], float]],
+) -> Iterator[str]:
+    """Renders values read at scrape time, e.g. counters kept elsewhere."""
+    yield f"# HELP {name} {documentation}"
+    yield f"# TYPE {name} {kind}"
+    for labels, value in samples:
+        yield f"{name}{format_labels(labels)} {format_value(value)}"
+
+
+@dataclass(eq=False)
+class Histogram:
+    name: str
+    documentation: str
+    label_names: tuple[str, ...] = ()
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+
+    def __post_init__(self):
+        # Per label values: a count for every bucket and for +Inf, then the sum.
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, series in list(self._series.items()):
+            labels = dict(zip(self.label_names, label_values))
+            count = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), series):
+                count += bucket_count
+                bucket_labels = format_labels(labels | {"le": format_value(bound)})
+                yield f"{self.name}_bucket{bucket_labels} {count}"
+            yield f"{self.name}_sum{format_labels(labels)} {format_value(series[-1])}"
+            yield f"{self.name}_count{format_labels(labels)} {count}"
+
+
+@dataclass(eq=False)
+class MetricsRegistry:
+    metrics: list[Histogram] = field(default_factory=list)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        histogram = Histogram(name, documentation, label_names, buckets)
+        self.metrics.append(histogram)
+        return histogram
+
+    def render(self) -> Iterator[str]:
+        for metric in self.metrics:
+            yield from metric.render()
+
+
+REGISTRY = MetricsRegistry()
+
+SERIALIZATION_SECONDS = REGISTRY.histogram(
+    "serialization_duration_seconds",
+    "Time spent turning query results into response bodies",
+    ("step",),
+)
@@ -0,0 +1,30 @@
+"""Name normalization and trigrams for organization search.
+
+Trigrams follow ``pg_trgm``: every word is padded with two spaces in front and
+one behind, so the similarity of two words (shared distinct trigrams over all
+distinct trigrams) matches ``similarity()`` in Postgres for ASCII words.
+"""
+import re
+from dataclasses import dataclass
+
+WORD_RE = re.compile(r"\w+")
+
+
+@dataclass(eq=False)
+class SearchMatch:
+    id: int
+    score: float
+
+
+def normalize_name(text: str) -> str:
+    """Case-folds and keeps only the words, joined by single spaces."""
+    return " ".join(WORD_RE.findall(text.casefold()))
+
+
+def get_trigrams(normalized: str) -> set[str]:
+    trigrams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        trigrams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
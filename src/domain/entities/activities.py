@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 from src.domain.entities.base import BaseEntity
 
@@ -6,6 +7,12 @@ from src.domain.entities.base import BaseEntity
 @dataclass(eq=False)
 class ActivityEntity(BaseEntity):
     name: str
+    parent: Optional["ActivityEntity"] = None
+
+    def get_path(self) -> tuple[str, ...]:
+        if self.parent is None:
+            return (self.name,)
+        return (*self.parent.get_path(), self.name)
 
     def to_dict(self):
         return {"name": self.name}
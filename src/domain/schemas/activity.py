@@ -30,3 +30,30 @@ class ActivityQuerySchema(BaseModel):
             }.items()
             if value is not None
         }
+
+
+class ActivityTreeQuerySchema(BaseModel):
+    id: int | None
+    name: str | None
+    max_depth: int
+
+    def to_dict_without_none_values(self):
+        return {
+            key: value
+            for key, value in {
+                "id": self.id,
+                "name": self.name,
+            }.items()
+            if value is not None
+        }
+
+
+class ActivityTreeSchema(BaseModel):
+    id: int
+    name: str
+    children: list["ActivityTreeSchema"]
+
+
+class ActivityTreeVersionSchema(BaseModel):
+    version: str
+    items: list[ActivityTreeSchema]
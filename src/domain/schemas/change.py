@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class ChangeFeedQuerySchema(BaseModel):
+    since: datetime | None
+    cursor: str | None
+    limit: int
+
+
+class ChangeSchema(BaseModel):
+    table: str
+    deleted: bool
+    changed_at: datetime
+    # The whole row, or only its primary key for a deletion.
+    row: dict[str, Any]
+
+
+class ChangeFeedSchema(BaseModel):
+    items: list[ChangeSchema]
+    next_cursor: str | None
+    has_more: bool
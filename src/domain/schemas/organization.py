@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 from src.domain.schemas.activity import ActivitySchema
 from src.domain.schemas.building import BuildingSchema
@@ -24,8 +24,51 @@ class OrganizationQuerySchema(BaseModel):
         }
 
 
+MAX_BATCH_SIZE = 500
+
+
+class OrganizationBatchQuerySchema(BaseModel):
+    ids: list[int] = Field(default_factory=list, max_length=MAX_BATCH_SIZE)
+    names: list[str] = Field(default_factory=list, max_length=MAX_BATCH_SIZE)
+
+    @model_validator(mode="after")
+    def check_not_empty(self):
+        if not self.ids and not self.names:
+            raise ValueError("Either ids or names are required")
+        return self
+
+    def get_unique_ids(self) -> list[int]:
+        return list(dict.fromkeys(self.ids))
+
+    def get_unique_names(self) -> list[str]:
+        return list(dict.fromkeys(self.names))
+
+
 class FullOutOrganizationSchema(BaseModel):
     organization: OrganizationSchema
     phones: list[PhoneSchema]
     building: BuildingSchema
     activities: list[ActivitySchema]
+
+
+class OrganizationDistanceSchema(FullOutOrganizationSchema):
+    distance_km: float
+
+
+class OrganizationSearchQuerySchema(BaseModel):
+    q: str
+    limit: int
+
+
+class OrganizationSearchSchema(FullOutOrganizationSchema):
+    score: float
+
+
+class OrganizationSearchResultSchema(BaseModel):
+    items: list[OrganizationSearchSchema]
+
+
+class OrganizationBatchSchema(BaseModel):
+    items: dict[int, FullOutOrganizationSchema]
+    missing_ids: list[int]
+    missing_names: list[str]
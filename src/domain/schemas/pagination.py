@@ -0,0 +1,45 @@
+import base64
+import binascii
+import json
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel
+
+ItemT = TypeVar("ItemT")
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class PaginationQuerySchema(BaseModel):
+    limit: int
+    cursor: str | None
+
+
+class PageSchema(BaseModel, Generic[ItemT]):
+    items: list[ItemT]
+    next_cursor: str | None
+
+
+def encode_cursor(*values: int | float) -> str:
+    payload = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> tuple[int | float, ...]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+    if (
+        not isinstance(values, list)
+        or len(values) != size
+        or not all(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for value in values
+        )
+    ):
+        raise InvalidCursorError("Invalid cursor")
+    return tuple(values)
@@ -0,0 +1,115 @@
+"""Activity closure table
+
+Revision ID: 1206ddf558d1
+Revises: 9fbea3ec0163
+Create Date: 2026-10-18 20:40:12.417530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1206ddf558d1'
+down_revision: Union[str, None] = '9fbea3ec0163'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('activity_closure',
+                    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+                    sa.Column('descendant_id', sa.Integer(), nullable=False),
+                    sa.Column('depth', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['ancestor_id'], ['activities.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['descendant_id'], ['activities.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+                    )
+    op.create_index(op.f('ix_activity_closure_descendant_id'), 'activity_closure', ['descendant_id'], unique=False)
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION activity_closure_insert() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, NEW.id, depth + 1
+            FROM activity_closure
+            WHERE descendant_id = NEW.parent_id
+            UNION ALL
+            SELECT NEW.id, NEW.id, 0;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION activity_closure_move() RETURNS trigger AS $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM activity_closure
+                WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+            ) THEN
+                RAISE EXCEPTION 'activity cannot be moved under its own descendant';
+            END IF;
+
+            DELETE FROM activity_closure AS link
+            USING activity_closure AS subtree
+            WHERE subtree.ancestor_id = NEW.id
+              AND link.descendant_id = subtree.descendant_id
+              AND link.ancestor_id NOT IN (
+                  SELECT descendant_id FROM activity_closure WHERE ancestor_id = NEW.id
+              );
+
+            INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+            SELECT supertree.ancestor_id, subtree.descendant_id,
+                   supertree.depth + subtree.depth + 1
+            FROM activity_closure AS supertree
+            CROSS JOIN activity_closure AS subtree
+            WHERE supertree.descendant_id = NEW.parent_id
+              AND subtree.ancestor_id = NEW.id;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER activity_closure_insert
+        AFTER INSERT ON activities
+        FOR EACH ROW EXECUTE FUNCTION activity_closure_insert()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER activity_closure_move
+        AFTER UPDATE OF parent_id ON activities
+        FOR EACH ROW
+        WHEN (OLD.parent_id IS DISTINCT FROM NEW.parent_id)
+        EXECUTE FUNCTION activity_closure_move()
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE paths AS (
+            SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth
+            FROM activities
+            UNION ALL
+            SELECT paths.ancestor_id, activities.id, paths.depth + 1
+            FROM paths
+            INNER JOIN activities ON activities.parent_id = paths.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM paths
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS activity_closure_move ON activities")
+    op.execute("DROP TRIGGER IF EXISTS activity_closure_insert ON activities")
+    op.execute("DROP FUNCTION IF EXISTS activity_closure_move()")
+    op.execute("DROP FUNCTION IF EXISTS activity_closure_insert()")
+    op.drop_index(op.f('ix_activity_closure_descendant_id'), table_name='activity_closure')
+    op.drop_table('activity_closure')
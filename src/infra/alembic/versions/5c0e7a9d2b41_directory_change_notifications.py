@@ -0,0 +1,53 @@
+"""Directory change notifications
+
+Revision ID: 5c0e7a9d2b41
+Revises: 1206ddf558d1
+Create Date: 2026-10-18 21:05:37.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c0e7a9d2b41'
+down_revision: Union[str, None] = '1206ddf558d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = (
+    "organizations",
+    "buildings",
+    "phones",
+    "activities",
+    "organization_activity",
+)
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_directory_changes() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('directory_changes', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table in TABLES:
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER {table}_notify_directory_changes
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_directory_changes()
+            """
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_directory_changes ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_directory_changes()")
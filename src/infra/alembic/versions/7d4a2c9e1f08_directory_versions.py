@@ -0,0 +1,61 @@
+"""Directory versions
+
+Revision ID: 7d4a2c9e1f08
+Revises: 3f9c1d7e5a62
+Create Date: 2026-10-19 09:12:44.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4a2c9e1f08'
+down_revision: Union[str, None] = '3f9c1d7e5a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = (
+    "organizations",
+    "buildings",
+    "phones",
+    "activities",
+    "organization_activity",
+)
+
+
+def upgrade() -> None:
+    op.create_table('directory_versions',
+                    sa.Column('table_name', sa.String(), nullable=False),
+                    sa.Column('version', sa.BigInteger(), nullable=False),
+                    sa.PrimaryKeyConstraint('table_name')
+                    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_directory_version() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO directory_versions (table_name, version)
+            VALUES (TG_TABLE_NAME, txid_current())
+            ON CONFLICT (table_name) DO UPDATE SET version = EXCLUDED.version;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table in TABLES:
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER {table}_bump_directory_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_directory_version()
+            """
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_bump_directory_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS bump_directory_version()")
+    op.drop_table('directory_versions')
@@ -0,0 +1,104 @@
+"""Change feed
+
+Revision ID: b6f1d3a8c254
+Revises: 7d4a2c9e1f08
+Create Date: 2026-10-19 11:37:20.604153
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6f1d3a8c254'
+down_revision: Union[str, None] = '7d4a2c9e1f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+KEYS = {
+    "organizations": ("id",),
+    "buildings": ("id",),
+    "phones": ("id",),
+    "activities": ("id",),
+    "organization_activity": ("organization_id", "activity_id"),
+}
+UPDATED_TABLES = ("organizations", "buildings", "phones", "activities")
+
+
+def upgrade() -> None:
+    op.create_table('directory_tombstones',
+                    sa.Column('id', sa.BigInteger(), nullable=False),
+                    sa.Column('table_name', sa.String(), nullable=False),
+                    sa.Column('row_key', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+                    sa.Column('deleted_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index('ix_directory_tombstones_deleted_at_id', 'directory_tombstones', ['deleted_at', 'id'], unique=False)
+    op.add_column('organization_activity', sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+    op.create_index('ix_organization_activity_created_at', 'organization_activity', ['created_at', 'organization_id', 'activity_id'], unique=False)
+    for table in UPDATED_TABLES:
+        op.create_index(f'ix_{table}_updated_at_id', table, ['updated_at', 'id'], unique=False)
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := now();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION record_tombstone() RETURNS trigger AS $$
+        DECLARE
+            old_row jsonb := to_jsonb(OLD);
+            row_key jsonb := '{}';
+            key_column text;
+        BEGIN
+            FOREACH key_column IN ARRAY TG_ARGV LOOP
+                row_key := row_key || jsonb_build_object(key_column, old_row -> key_column);
+            END LOOP;
+            INSERT INTO directory_tombstones (table_name, row_key)
+            VALUES (TG_TABLE_NAME, row_key);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table in UPDATED_TABLES:
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER {table}_touch_updated_at
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION touch_updated_at()
+            """
+        )
+    for table, key in KEYS.items():
+        arguments = ", ".join(f"'{column}'" for column in key)
+        op.execute(
+            f"""
+            CREATE OR REPLACE TRIGGER {table}_record_tombstone
+            AFTER DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION record_tombstone({arguments})
+            """
+        )
+
+
+def downgrade() -> None:
+    for table in KEYS:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_record_tombstone ON {table}")
+    for table in UPDATED_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_touch_updated_at ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS record_tombstone()")
+    op.execute("DROP FUNCTION IF EXISTS touch_updated_at()")
+    for table in UPDATED_TABLES:
+        op.drop_index(f'ix_{table}_updated_at_id', table_name=table)
+    op.drop_index('ix_organization_activity_created_at', table_name='organization_activity')
+    op.drop_column('organization_activity', 'created_at')
+    op.drop_index('ix_directory_tombstones_deleted_at_id', table_name='directory_tombstones')
+    op.drop_table('directory_tombstones')
@@ -0,0 +1,69 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+MISSING = object()
+
+
+class CacheBackend(ABC):
+    """Async key/value store used by ``ResponseCache``.
+
+    Values are Python objects; an out-of-process backend such as Redis is
+    expected to serialize them itself and to honour ``ttl`` natively.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        """Returns the stored value or ``MISSING``."""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str) -> int: ...
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+
+@dataclass(eq=False)
+class InMemoryCacheBackend(CacheBackend):
+    max_entries: int = 1024
+    evictions: int = field(default=0, init=False)
+    expirations: int = field(default=0, init=False)
+
+    def __post_init__(self):
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete_prefix(self, prefix: str) -> int:
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    async def clear(self) -> None:
+        self._entries.clear()
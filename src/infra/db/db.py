@@ -1,22 +1,102 @@
 from contextlib import asynccontextmanager
-from dataclasses import dataclass
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import URL, make_url
+from sqlalchemy.ext.asyncio import (
+    create_async_engine,
+    async_sessionmaker,
+    AsyncEngine,
+    AsyncSession,
+)
 
-from src.common.settings import get_settings
+from src.common.settings import get_settings, ProjectSettings
+from src.infra.db.metrics import TimedQueuePool, instrument_engine
+from src.infra.db.replicas import Replica, ReplicaSet
+
+
+def get_replica_url(url: str) -> URL:
+    replica_url = make_url(url)
+    if replica_url.drivername == "postgresql":
+        replica_url = replica_url.set(drivername="postgresql+asyncpg")
+    return replica_url
 
 
 @dataclass(eq=False)
 class AsyncPostgresClient:
+    settings: ProjectSettings = field(default_factory=get_settings)
+
     def __post_init__(self):
-        self.engine = create_async_engine(get_settings().get_sql_url)
+        self.engine = self.create_engine(self.settings.get_sql_url)
         self.session_factory = async_sessionmaker(bind=self.engine, class_=AsyncSession)
+        replicas = []
+        for url in self.settings.postgres_replica_urls:
+            replica_url = get_replica_url(url)
+            engine = self.create_engine(replica_url)
+            replicas.append(
+                Replica(
+                    name=f"{replica_url.host}:{replica_url.port or 5432}/{replica_url.database}",
+                    engine=engine,
+                    session_factory=async_sessionmaker(bind=engine, class_=AsyncSession),
+                )
+            )
+        self.replicas = ReplicaSet(
+            replicas=replicas,
+            routing=self.settings.postgres_replica_routing,
+            max_lag_seconds=self.settings.postgres_replica_max_lag,
+            check_timeout=self.settings.postgres_replica_check_timeout,
+        )
+        # Reads in one request stay on one replica while it is healthy, so
+        # they see the data at one point in replication, e.g. the version an
+        # ETag is computed from and the rows it stands for.
+        self._pinned_replica: ContextVar[Replica | None] = ContextVar(
+            f"pinned_replica_{id(self)}", default=None
+        )
+
+    def create_engine(self, url: str | URL) -> AsyncEngine:
+        engine = create_async_engine(
+            url,
+            pool_size=self.settings.postgres_pool_size,
+            max_overflow=self.settings.postgres_max_overflow,
+            pool_timeout=self.settings.postgres_pool_timeout,
+            pool_recycle=self.settings.postgres_pool_recycle,
+            pool_pre_ping=self.settings.postgres_pool_pre_ping,
+            poolclass=TimedQueuePool,
+        )
+        if self.settings.metrics_enabled:
+            instrument_engine(engine)
+        return engine
 
     @asynccontextmanager
-    async def create_session(self) -> AsyncGenerator[AsyncSession, None]:
-        async with self.session_factory() as session:
-            try:
-                yield session
-            finally:
-                await session.close()
+    async def create_session(
+        self, read_only: bool = False
+    ) -> AsyncGenerator[AsyncSession, None]:
+        """Opens a session on the primary, or on a healthy replica if ``read_only``."""
+        replica = None
+        if read_only and self.replicas:
+            replica = self._pinned_replica.get()
+            if replica is None or not replica.healthy:
+                replica = self.replicas.choose()
+                self._pinned_replica.set(replica)
+        if replica is None:
+            async with self.session_factory() as session:
+                try:
+                    yield session
+                finally:
+                    await session.close()
+            return
+
+        replica.sessions += 1
+        try:
+            async with replica.session_factory() as session:
+                try:
+                    yield session
+                finally:
+                    await session.close()
+        finally:
+            replica.sessions -= 1
+
+    async def dispose(self) -> None:
+        await self.engine.dispose()
+        await self.replicas.dispose()
@@ -0,0 +1,48 @@
+"""Watermarks over ``updated_at`` that don't skip late commits.
+
+``updated_at`` and the other timestamps are the writing transaction's
+``now()``, its start time rather than its commit time. A change that commits
+after a read can therefore carry a timestamp older than the newest one that
+read returned. It can't land before the horizon though, the start of the
+oldest transaction still open, so that is as far as a watermark may advance.
+"""
+from datetime import datetime
+
+from sqlalchemy import ColumnElement, Row, Select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Only sessions of the app's own role are visible without
+# ``pg_read_all_stats``. Replicas don't see the primary's transactions, so
+# this has to run on the primary.
+HORIZON_QUERY = text(
+    """
+    SELECT LEAST(now(), min(xact_start))::timestamp
+    FROM pg_stat_activity
+    WHERE datname = current_database()
+      AND backend_type = 'client backend'
+      AND pid <> pg_backend_pid()
+    """
+)
+
+
+async def get_horizon(session: AsyncSession) -> datetime:
+    return await session.scalar(HORIZON_QUERY)
+
+
+async def select_changed_since(
+    session: AsyncSession,
+    statement: Select,
+    updated_at: ColumnElement,
+    watermark: datetime | None,
+) -> tuple[list[Row], datetime]:
+    """Rows of ``statement`` updated at or after ``watermark``, all of them
+    when it is None, and the watermark to pass next time.
+
+    The horizon is read first: a transaction that commits in between is then
+    either visible to the select or still holding the horizon back.
+    """
+    horizon = await get_horizon(session)
+    if watermark is not None:
+        statement = statement.where(updated_at >= watermark)
+    result = await session.execute(statement)
+    return result.all(), horizon
@@ -0,0 +1,100 @@
+"""SQL statement and connection pool metrics for ``AsyncPostgresClient``.
+
+Statements are timed with engine events. Inside ``track_queries`` they are
+also added up per task, which is how the API accounts SQL to each request.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.common.metrics import REGISTRY
+
+STATEMENT_SECONDS = REGISTRY.histogram(
+    "db_statement_duration_seconds",
+    "Time from sending an SQL statement to having its result",
+)
+POOL_CHECKOUT_SECONDS = REGISTRY.histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time to get a connection from the pool, waiting for a free one included",
+)
+
+
+@dataclass(eq=False)
+class QueryStats:
+    statements: int = 0
+    seconds: float = 0.0
+
+
+current_query_stats: ContextVar[QueryStats | None] = ContextVar(
+    "current_query_stats", default=None
+)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Counts the statements the current task sends until the block exits."""
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+
+@dataclass(eq=False)
+class DecayingAverage:
+    """Moving average of samples that also halves every ``half_life`` seconds
+    without new ones, so it recovers even when nothing is observed."""
+
+    half_life: float = 1.0
+    weight: float = 0.2
+    value: float = 0.0
+    updated: float = 0.0
+
+    def get(self, now: float) -> float:
+        return self.value * 0.5 ** ((now - self.updated) / self.half_life)
+
+    def observe(self, sample: float, now: float) -> None:
+        self.value = self.get(now) * (1 - self.weight) + sample * self.weight
+        self.updated = now
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recent_checkout_seconds = DecayingAverage()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            finished = time.perf_counter()
+            POOL_CHECKOUT_SECONDS.observe(finished - started)
+            self.recent_checkout_seconds.observe(finished - started, finished)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_started = time.perf_counter()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.metrics_started
+    STATEMENT_SECONDS.observe(elapsed)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.seconds += elapsed
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
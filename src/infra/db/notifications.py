@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from src.infra.db.db import AsyncPostgresClient
+
+logger = logging.getLogger(__name__)
+
+
+async def listen_until_closed(
+    client: AsyncPostgresClient,
+    channel: str,
+    callback: Callable[[str | None], Awaitable[None]],
+) -> None:
+    """Listens on one connection and returns once it is closed."""
+    pending: set[asyncio.Task] = set()
+    closed = asyncio.Event()
+
+    def on_notification(connection, pid, notification_channel, payload):
+        task = asyncio.create_task(callback(payload))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    def on_termination(connection):
+        closed.set()
+
+    async with client.engine.connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        await driver_connection.add_listener(channel, on_notification)
+        driver_connection.add_termination_listener(on_termination)
+        try:
+            # Anything sent before LISTEN took effect was missed.
+            await callback(None)
+            await closed.wait()
+        finally:
+            if driver_connection.is_closed():
+                # Keeps the pool from resetting a dead connection.
+                await connection.invalidate()
+            else:
+                driver_connection.remove_termination_listener(on_termination)
+                await driver_connection.remove_listener(channel, on_notification)
+
+
+async def run_listener(
+    client: AsyncPostgresClient,
+    channel: str,
+    callback: Callable[[str | None], Awaitable[None]],
+    retry_delay: float = 1.0,
+    max_retry_delay: float = 30.0,
+) -> None:
+    """Calls ``callback`` with the payload of every notification on
+    ``channel`` until cancelled.
+
+    Notifications sent while no connection listens are lost, so ``callback``
+    is also called with None when the connection closes and again once a new
+    one listens. Reconnects back off exponentially up to ``max_retry_delay``.
+    """
+    delay = retry_delay
+    while True:
+        try:
+            await listen_until_closed(client, channel, callback)
+            logger.warning("Listener connection for %s was closed", channel)
+            delay = retry_delay
+        except Exception:
+            logger.exception("Listening on %s failed", channel)
+        try:
+            await callback(None)
+        except Exception:
+            logger.exception("Notification callback for %s failed", channel)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_retry_delay)
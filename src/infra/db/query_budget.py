@@ -0,0 +1,135 @@
+"""Statement budgets to catch N+1 query patterns in development and tests.
+
+``detect_queries`` counts the statements the current task sends, grouped by
+their shape (the SQL with literals and bind parameters blanked out), and
+reports when more statements than ``max_statements`` are sent or one shape
+runs more than ``max_repeats`` times::
+
+    with detect_queries(max_statements=4, max_repeats=1):
+        await service.get_organizations_by_activity(activity, pagination)
+
+By default a violation raises ``QueryBudgetExceededError`` from the statement
+that broke the budget, so the traceback points at the code issuing it. With
+``raise_on_violation=False`` the report is logged as a warning when the block
+exits. Blocks can be nested; every active budget sees every statement.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+PARAMETER_RE = re.compile(r"\$\d+(?:::\w+(?:\[\])?)?|%\(\w+\)s|\?|\b\d+(?:\.\d+)?\b")
+PARAMETER_LIST_RE = re.compile(r"\(\?(?:, \?)*\)")
+SPACE_RE = re.compile(r"\s+")
+
+
+class QueryBudgetExceededError(AssertionError):
+    pass
+
+
+def normalize_statement(statement: str) -> str:
+    """Blanks out literals and parameters so repeats of one query group together."""
+    statement = STRING_RE.sub("?", statement)
+    statement = SPACE_RE.sub(" ", statement).strip()
+    statement = PARAMETER_RE.sub("?", statement)
+    # Expanded IN lists differ in length between calls.
+    return PARAMETER_LIST_RE.sub("(...)", statement)
+
+
+@dataclass(eq=False)
+class QueryBudget:
+    max_statements: int | None = None
+    max_repeats: int | None = None
+    raise_on_violation: bool = True
+    label: str = "block"
+    # Paused budgets ignore statements, e.g. while a response is streamed.
+    paused: bool = False
+    statements: int = 0
+    shapes: Counter[str] = field(default_factory=Counter)
+
+    def record(self, statement: str) -> None:
+        if self.paused:
+            return
+        shape = normalize_statement(statement)
+        self.statements += 1
+        self.shapes[shape] += 1
+        if not self.raise_on_violation:
+            return
+        if self.max_statements is not None and self.statements > self.max_statements:
+            raise QueryBudgetExceededError(self.get_report())
+        if self.max_repeats is not None and self.shapes[shape] > self.max_repeats:
+            raise QueryBudgetExceededError(self.get_report())
+
+    def get_violations(self) -> list[str]:
+        violations = []
+        if self.max_statements is not None and self.statements > self.max_statements:
+            violations.append(
+                f"{self.statements} statements, budget is {self.max_statements}"
+            )
+        if self.max_repeats is not None:
+            for shape, count in self.shapes.most_common():
+                if count <= self.max_repeats:
+                    break
+                violations.append(
+                    f"{count} runs of one statement, budget is {self.max_repeats}: "
+                    f"{shape[:200]}"
+                )
+        return violations
+
+    def get_report(self) -> str:
+        lines = [f"Query budget exceeded in {self.label}:"]
+        lines.extend(f"  {violation}" for violation in self.get_violations())
+        lines.append("Statements by shape:")
+        lines.extend(
+            f"  {count:>4} x {shape[:200]}" for shape, count in self.shapes.most_common(10)
+        )
+        return "\n".join(lines)
+
+
+active_budgets: ContextVar[tuple[QueryBudget, ...]] = ContextVar(
+    "active_budgets", default=()
+)
+
+
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    for budget in active_budgets.get():
+        budget.record(statement)
+
+
+def install_listener() -> None:
+    # Listening on the Engine class covers every engine, async ones included,
+    # and costs nothing until a budget is first used.
+    if not event.contains(Engine, "before_cursor_execute", record_statement):
+        event.listen(Engine, "before_cursor_execute", record_statement)
+
+
+@contextmanager
+def detect_queries(
+    max_statements: int | None = None,
+    max_repeats: int | None = None,
+    raise_on_violation: bool = True,
+    label: str = "block",
+) -> Iterator[QueryBudget]:
+    install_listener()
+    budget = QueryBudget(
+        max_statements=max_statements,
+        max_repeats=max_repeats,
+        raise_on_violation=raise_on_violation,
+        label=label,
+    )
+    token = active_budgets.set((*active_budgets.get(), budget))
+    try:
+        yield budget
+    finally:
+        active_budgets.reset(token)
+    if not raise_on_violation and budget.get_violations():
+        logger.warning(budget.get_report())
@@ -0,0 +1,135 @@
+"""Routing of read-only sessions to replicas.
+
+Replicas are chosen round-robin or by the fewest sessions open on them, and
+only among those that passed the last health check: reachable, streaming
+from the primary, and no more than ``max_lag_seconds`` behind it when a limit
+is set. With no healthy replica, reads go to the primary.
+"""
+import asyncio
+import itertools
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Literal
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+ReplicaRouting = Literal["round_robin", "least_connections"]
+
+# Seconds behind the primary. A server that is not in recovery is a primary
+# that can't lag. A replica that isn't streaming from the primary can't tell
+# how far behind it is, so its lag is taken as unbounded; one that streams
+# and has replayed everything it received is up to date however old its last
+# transaction is. With WAL pending but nothing replayed since the replica
+# started, the lag is unknown and taken as unbounded too.
+#
+# Without pg_read_all_stats the receiver's status reads as NULL, and only a
+# running receiver process can be checked for.
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver
+            WHERE coalesce(status, 'streaming') = 'streaming'
+        ) THEN 'Infinity'
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(
+            extract(epoch FROM now() - pg_last_xact_replay_timestamp())::float8,
+            'Infinity'
+        )
+    END
+    """
+)
+
+
+@dataclass(eq=False)
+class Replica:
+    name: str
+    engine: AsyncEngine
+    session_factory: async_sessionmaker
+    # Out of rotation until the first health check passes.
+    healthy: bool = False
+    lag_seconds: float | None = None
+    sessions: int = 0
+
+    def __post_init__(self):
+        event.listen(self.engine.sync_engine, "handle_error", self._on_error)
+
+    def _on_error(self, context) -> None:
+        # Don't wait for the next check to stop routing to a replica that
+        # dropped its connections.
+        if context.is_disconnect and self.healthy:
+            logger.warning("Replica %s disconnected, taking it out of rotation", self.name)
+            self.healthy = False
+
+
+@dataclass(eq=False)
+class ReplicaSet:
+    replicas: list[Replica] = field(default_factory=list)
+    routing: ReplicaRouting = "round_robin"
+    max_lag_seconds: float | None = None
+    check_timeout: float = 2
+
+    def __post_init__(self):
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    def choose(self) -> Replica | None:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        offset = next(self._counter) % len(healthy)
+        if self.routing == "least_connections":
+            # Rotating first spreads ties instead of always picking the first.
+            rotated = healthy[offset:] + healthy[:offset]
+            return min(rotated, key=lambda replica: replica.sessions)
+        return healthy[offset]
+
+    async def _measure_lag(self, replica: Replica) -> float:
+        async with replica.engine.connect() as conn:
+            return float(await conn.scalar(LAG_QUERY))
+
+    async def check(self, replica: Replica) -> None:
+        try:
+            lag = await asyncio.wait_for(self._measure_lag(replica), self.check_timeout)
+        except (SQLAlchemyError, OSError, asyncio.TimeoutError) as e:
+            if replica.healthy:
+                logger.warning("Replica %s failed its health check: %r", replica.name, e)
+            replica.healthy = False
+            replica.lag_seconds = None
+            return
+        # An unknown lag is never acceptable, limit or not.
+        healthy = not math.isinf(lag) and (
+            self.max_lag_seconds is None or lag <= self.max_lag_seconds
+        )
+        if replica.healthy and not healthy:
+            if math.isinf(lag):
+                logger.warning("Replica %s is not streaming, its lag is unknown", replica.name)
+            else:
+                logger.warning("Replica %s is %.1fs behind, over the limit", replica.name, lag)
+        elif healthy and not replica.healthy:
+            logger.info("Replica %s is back in rotation", replica.name)
+        replica.healthy = healthy
+        replica.lag_seconds = lag
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def run_health_checks(self, interval_seconds: float) -> None:
+        while True:
+            try:
+                await self.check_all()
+            except Exception:
+                logger.exception("Replica health check failed")
+            await asyncio.sleep(interval_seconds)
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
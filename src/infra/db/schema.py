@@ -0,0 +1,66 @@
+"""Startup check that the database schema is at the Alembic head.
+
+Importing Alembic takes about half a second, more than the rest of the app's
+startup, so the head is worked out from the migration files directly: their
+``revision`` and ``down_revision`` assignments are read with ``ast``.
+"""
+import ast
+from pathlib import Path
+
+from sqlalchemy import text
+
+from src.infra.db.db import AsyncPostgresClient
+
+VERSIONS_DIR = Path(__file__).resolve().parents[1] / "alembic" / "versions"
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+def read_revision(path: Path) -> tuple[str | None, tuple[str, ...]]:
+    values = {}
+    for node in ast.parse(path.read_text(encoding="utf-8")).body:
+        if isinstance(node, ast.AnnAssign):
+            target = node.target
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+        else:
+            continue
+        if isinstance(target, ast.Name) and target.id in ("revision", "down_revision"):
+            values[target.id] = ast.literal_eval(node.value)
+    down_revision = values.get("down_revision") or ()
+    if isinstance(down_revision, str):
+        down_revision = (down_revision,)
+    return values.get("revision"), tuple(down_revision)
+
+
+def get_head_revisions(versions_dir: Path = VERSIONS_DIR) -> set[str]:
+    revisions, parents = set(), set()
+    for path in versions_dir.glob("*.py"):
+        revision, down_revisions = read_revision(path)
+        if revision is not None:
+            revisions.add(revision)
+            parents.update(down_revisions)
+    return revisions - parents
+
+
+async def get_current_revisions(client: AsyncPostgresClient) -> set[str]:
+    async with client.engine.connect() as conn:
+        if not await conn.scalar(text("SELECT to_regclass('alembic_version') IS NOT NULL")):
+            return set()
+        result = await conn.scalars(text("SELECT version_num FROM alembic_version"))
+        return set(result.all())
+
+
+async def verify_schema(client: AsyncPostgresClient) -> None:
+    """Raises ``SchemaVersionError`` unless the database is at the Alembic head."""
+    heads = get_head_revisions()
+    current = await get_current_revisions(client)
+    if current != heads:
+        raise SchemaVersionError(
+            "Database schema is at {}, expected Alembic head {}; "
+            "run `alembic upgrade head`".format(
+                ", ".join(sorted(current)) or "no revision", ", ".join(sorted(heads))
+            )
+        )
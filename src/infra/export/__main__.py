@@ -0,0 +1,62 @@
+"""Export the directory as CSV, Parquet or Arrow, one row per organization.
+
+Usage: python -m src.infra.export directory.parquet [--format parquet] [--chunk-size 8388608]
+
+Pass ``-`` as the path to write to stdout.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+from typing import get_args
+
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.export.pipeline import DirectoryExporter, ExportFormat
+
+FORMATS = get_args(ExportFormat)
+
+
+async def main(
+    path: Path,
+    file_format: ExportFormat,
+    chunk_size: int | None,
+    max_pending_chunks: int | None,
+):
+    client = AsyncPostgresClient()
+    exporter = DirectoryExporter(
+        async_client=client,
+        chunk_size=chunk_size or client.settings.export_chunk_size,
+        max_pending_chunks=max_pending_chunks or client.settings.export_max_pending_chunks,
+    )
+    output = sys.stdout.buffer if str(path) == "-" else open(path, "wb")
+    try:
+        async for chunk in exporter.export(file_format):
+            await asyncio.to_thread(output.write, chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        await client.dispose()
+    stats = exporter.stats
+    print(
+        f"rows={stats.rows} bytes={stats.bytes} "
+        f"elapsed={stats.elapsed:.2f}s rate={stats.rows_per_second:.0f}/s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=FORMATS, default=None)
+    parser.add_argument("--chunk-size", type=int, default=None, help="Defaults to EXPORT_CHUNK_SIZE")
+    parser.add_argument(
+        "--max-pending-chunks", type=int, default=None, help="Defaults to EXPORT_MAX_PENDING_CHUNKS"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    file_format = args.format or args.path.suffix.lstrip(".").lower()
+    if file_format not in FORMATS:
+        parser.error(f"cannot infer format from {args.path}, pass --format")
+    asyncio.run(main(args.path, file_format, args.chunk_size, args.max_pending_chunks))
@@ -0,0 +1,285 @@
+"""Export of the whole directory with ``COPY ... TO STDOUT``.
+
+Each row is one organization with its building, phones and activities.
+CSV is forwarded as Postgres writes it. Parquet and Arrow are built from the
+same CSV in blocks of ``chunk_size`` bytes, one row group or record batch
+per block. Chunks pass through a bounded queue, and asyncpg stops reading
+from the socket while the consumer is behind, so memory stays within a few
+blocks however many rows there are.
+
+pyarrow comes with the ``export`` extra. It is only imported for Parquet and
+Arrow, and is not required for CSV.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterator, Literal
+
+from asyncpg import Connection
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.infra.db.db import AsyncPostgresClient
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+ExportFormat = Literal["csv", "parquet", "arrow"]
+
+EXPORT_MEDIA_TYPES: dict[str, str] = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Phones and activities are JSON arrays, so values containing separators
+# survive the round trip. Both are aggregated off their organization_id
+# indexes and merge-joined in id order, so the plan streams without hashing
+# or sorting whole tables.
+EXPORT_QUERY = """
+SELECT
+    o.id AS organization_id,
+    o.name AS organization_name,
+    b.id AS building_id,
+    b.address,
+    b.latitude,
+    b.longitude,
+    coalesce(p.phones, '[]') AS phones,
+    coalesce(a.activity_ids, '[]') AS activity_ids,
+    coalesce(a.activity_names, '[]') AS activity_names,
+    o.updated_at
+FROM organizations o
+LEFT JOIN buildings b ON b.id = o.building_id
+LEFT JOIN (
+    SELECT organization_id, json_agg(number ORDER BY id) AS phones
+    FROM phones
+    GROUP BY organization_id
+) p ON p.organization_id = o.id
+LEFT JOIN (
+    SELECT
+        organization_activity.organization_id,
+        json_agg(activities.id ORDER BY activities.id) AS activity_ids,
+        json_agg(activities.name ORDER BY activities.id) AS activity_names
+    FROM organization_activity
+    JOIN activities ON activities.id = organization_activity.activity_id
+    GROUP BY organization_activity.organization_id
+) a ON a.organization_id = o.id
+ORDER BY o.id
+"""
+
+
+class ExportFormatUnavailableError(RuntimeError):
+    pass
+
+
+def get_arrow_schema() -> pa.Schema:
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("organization_id", pa.int64()),
+            ("organization_name", pa.string()),
+            ("building_id", pa.int64()),
+            ("address", pa.string()),
+            ("latitude", pa.float64()),
+            ("longitude", pa.float64()),
+            ("phones", pa.string()),
+            ("activity_ids", pa.string()),
+            ("activity_names", pa.string()),
+            ("updated_at", pa.timestamp("us")),
+        ]
+    )
+
+
+def check_export_format(file_format: ExportFormat) -> None:
+    if file_format == "csv":
+        return
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ExportFormatUnavailableError(
+            f"Export to {file_format} needs pyarrow, installed with the export extra "
+            "(poetry install --extras export)"
+        ) from e
+
+
+def find_record_boundary(data: bytes) -> int:
+    """Length of the longest prefix of CSV ``data`` made of whole records.
+
+    A newline ends a record unless it is inside quotes, i.e. preceded by an
+    odd number of quote characters: escaped quotes come in pairs.
+    """
+    end = data.rfind(b"\n")
+    while end != -1 and data.count(b'"', 0, end) % 2:
+        end = data.rfind(b"\n", 0, end)
+    return end + 1
+
+
+class ChunkSink:
+    """Write-only file for pyarrow writers that hands out what was written.
+
+    Tracks the position itself, since Parquet footers store offsets into
+    the whole file.
+    """
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def open_arrow_writer(sink: ChunkSink, schema: pa.Schema, file_format: ExportFormat):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if file_format == "parquet":
+        return pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    return pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+
+
+def write_csv_block(writer, block: memoryview, schema: pa.Schema) -> None:
+    import pyarrow as pa
+    from pyarrow import csv
+
+    if not block:
+        return
+    table = csv.read_csv(
+        pa.py_buffer(block),
+        read_options=csv.ReadOptions(column_names=schema.names),
+        parse_options=csv.ParseOptions(newlines_in_values=True),
+        # COPY writes NULL as an empty field and an empty string as "".
+        convert_options=csv.ConvertOptions(
+            column_types=schema,
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+    writer.write_table(table)
+
+
+@dataclass(eq=False)
+class ExportStats:
+    rows: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass(eq=False)
+class DirectoryExporter:
+    """Streams the directory without loading it: rows never become Python
+    objects, only chunks of COPY output do.
+
+    Reads go to a replica when one is healthy.
+    """
+
+    async_client: AsyncPostgresClient
+    chunk_size: int = 8 * 1024 * 1024
+    max_pending_chunks: int = 4
+    stats: ExportStats = field(default_factory=ExportStats)
+
+    async def export(self, file_format: ExportFormat) -> AsyncIterator[bytes]:
+        check_export_format(file_format)
+        started = time.perf_counter()
+        if file_format == "csv":
+            chunks = self.copy_csv(header=True)
+        else:
+            chunks = self.convert_csv(self.copy_csv(header=False), file_format)
+        async for chunk in chunks:
+            self.stats.bytes += len(chunk)
+            yield chunk
+        self.stats.elapsed = time.perf_counter() - started
+
+    async def copy_csv(self, header: bool) -> AsyncIterator[bytes]:
+        queue: asyncio.Queue[bytearray | Exception | None] = asyncio.Queue(
+            maxsize=self.max_pending_chunks
+        )
+        copy = asyncio.create_task(self._copy(queue, header))
+        try:
+            while (chunk := await queue.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                # asyncpg hands out bytearrays, which responses don't take.
+                yield bytes(chunk)
+        finally:
+            # Stops the COPY and releases the connection if the consumer
+            # went away early.
+            copy.cancel()
+            with suppress(asyncio.CancelledError):
+                await copy
+
+    async def _copy(
+        self, queue: asyncio.Queue[bytearray | Exception | None], header: bool
+    ) -> None:
+        try:
+            async with self.async_client.create_session(read_only=True) as session:
+                try:
+                    conn = await session.connection()
+                    raw_connection = await conn.get_raw_connection()
+                    connection: Connection = raw_connection.driver_connection
+                    status = await connection.copy_from_query(
+                        EXPORT_QUERY, output=queue.put, format="csv", header=header
+                    )
+                except SQLAlchemyError as e:
+                    await session.rollback()
+                    raise e
+        except Exception as e:
+            await queue.put(e)
+            return
+        self.stats.rows = int(status.split()[-1])
+        await queue.put(None)
+
+    async def convert_csv(
+        self, chunks: AsyncIterator[bytes], file_format: ExportFormat
+    ) -> AsyncIterator[bytes]:
+        schema = get_arrow_schema()
+        sink = ChunkSink()
+        writer = open_arrow_writer(sink, schema, file_format)
+        pending: list[bytes] = []
+        size = 0
+        async for chunk in chunks:
+            pending.append(chunk)
+            size += len(chunk)
+            if size < self.chunk_size:
+                continue
+            data = b"".join(pending)
+            end = find_record_boundary(data)
+            pending = [data[end:]]
+            size = len(pending[0])
+            # Parsing and encoding release the GIL, so requests are served
+            # meanwhile.
+            await asyncio.to_thread(write_csv_block, writer, memoryview(data)[:end], schema)
+            yield sink.drain()
+        await asyncio.to_thread(write_csv_block, writer, memoryview(b"".join(pending)), schema)
+        writer.close()
+        yield sink.drain()
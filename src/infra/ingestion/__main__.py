@@ -0,0 +1,47 @@
+"""Bulk-load organizations from a CSV or JSONL file.
+
+Usage: python -m src.infra.ingestion data.jsonl [--format jsonl] [--batch-size 5000]
+"""
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.ingestion.pipeline import BulkIngestionPipeline
+from src.infra.ingestion.readers import READERS
+
+
+async def main(path: Path, file_format: str, batch_size: int, max_pending_batches: int):
+    client = AsyncPostgresClient()
+    pipeline = BulkIngestionPipeline(
+        async_client=client,
+        batch_size=batch_size,
+        max_pending_batches=max_pending_batches,
+    )
+    try:
+        stats = await pipeline.ingest(READERS[file_format](path))
+    finally:
+        await client.dispose()
+    print(
+        f"organizations={stats.organizations} phones={stats.phones} "
+        f"buildings_created={stats.buildings_created} "
+        f"buildings_reused={stats.buildings_reused} "
+        f"activities_created={stats.activities_created} "
+        f"elapsed={stats.elapsed:.2f}s rate={stats.organizations_per_second:.0f}/s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=sorted(READERS), default=None)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--max-pending-batches", type=int, default=2)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    file_format = args.format or args.path.suffix.lstrip(".").lower()
+    if file_format not in READERS:
+        parser.error(f"cannot infer format from {args.path}, pass --format")
+    asyncio.run(main(args.path, file_format, args.batch_size, args.max_pending_batches))
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator
+
+from asyncpg import Connection
+
+from src.domain.entities.buildings import BuildingEntity
+from src.domain.entities.composer import OrganizationComposerEntity
+from src.infra.db.db import AsyncPostgresClient
+
+logger = logging.getLogger(__name__)
+
+BuildingKey = tuple[str, float, float]
+ActivityKey = tuple[int | None, str]
+
+RESERVE_IDS_SQL = (
+    "SELECT nextval(pg_get_serial_sequence($1, 'id')) "
+    "FROM generate_series(1, $2)"
+)
+SELECT_ACTIVITIES_SQL = "SELECT id, parent_id, name FROM activities"
+INSERT_ACTIVITIES_SQL = """
+INSERT INTO activities (parent_id, name, created_at, updated_at)
+SELECT k.parent_id, k.name, $3, $3
+FROM unnest($1::integer[], $2::varchar[]) AS k(parent_id, name)
+RETURNING id, parent_id, name
+"""
+SELECT_BUILDINGS_SQL = """
+SELECT b.id, b.address, b.latitude, b.longitude
+FROM buildings b
+JOIN unnest($1::varchar[], $2::double precision[], $3::double precision[])
+    AS k(address, latitude, longitude)
+    ON b.latitude = k.latitude
+    AND b.longitude = k.longitude
+    AND b.address = k.address
+"""
+
+
+def get_building_key(building: BuildingEntity) -> BuildingKey:
+    return building.address, float(building.latitude), float(building.longitude)
+
+
+def iter_batches(
+    records: Iterable[OrganizationComposerEntity], batch_size: int
+) -> Iterator[list[OrganizationComposerEntity]]:
+    iterator = iter(records)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+@dataclass(eq=False)
+class IngestionStats:
+    organizations: int = 0
+    phones: int = 0
+    buildings_created: int = 0
+    buildings_reused: int = 0
+    activities_created: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def organizations_per_second(self) -> float:
+        return self.organizations / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass(eq=False)
+class BulkIngestionPipeline:
+    """Loads organizations with COPY, one transaction per batch.
+
+    Buildings are deduplicated by (address, latitude, longitude) and
+    activities by (parent, name). Parsing runs in a worker thread and feeds
+    the writer through a bounded queue, so a slow database pauses the reader
+    instead of buffering the whole input.
+    """
+
+    async_client: AsyncPostgresClient
+    batch_size: int = 5000
+    max_pending_batches: int = 2
+    stats: IngestionStats = field(default_factory=IngestionStats)
+    _activity_ids: dict[ActivityKey, int] = field(default_factory=dict)
+    _building_ids: dict[BuildingKey, int] = field(default_factory=dict)
+
+    async def ingest(self, records: Iterable[OrganizationComposerEntity]) -> IngestionStats:
+        started = time.perf_counter()
+        queue: asyncio.Queue[list[OrganizationComposerEntity] | Exception | None] = (
+            asyncio.Queue(maxsize=self.max_pending_batches)
+        )
+        reader = asyncio.create_task(self._read(records, queue))
+        try:
+            async with self.async_client.engine.connect() as conn:
+                raw_connection = await conn.get_raw_connection()
+                connection: Connection = raw_connection.driver_connection
+                await self._load_activities(connection)
+                while (batch := await queue.get()) is not None:
+                    if isinstance(batch, Exception):
+                        raise batch
+                    await self._write_batch_or_restore(connection, batch)
+                    self.stats.batches += 1
+                    self.stats.elapsed = time.perf_counter() - started
+                    logger.info(
+                        "Ingested %d organizations (%.0f/s)",
+                        self.stats.organizations,
+                        self.stats.organizations_per_second,
+                    )
+            await reader
+        finally:
+            reader.cancel()
+        self.stats.elapsed = time.perf_counter() - started
+        return self.stats
+
+    async def _read(
+        self,
+        records: Iterable[OrganizationComposerEntity],
+        queue: asyncio.Queue[list[OrganizationComposerEntity] | Exception | None],
+    ) -> None:
+        # A parse error is handed to the writer instead of ending the task
+        # silently, which would leave the writer waiting for the next batch.
+        batches = iter_batches(records, self.batch_size)
+        try:
+            while batch := await asyncio.to_thread(next, batches, None):
+                await queue.put(batch)
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(None)
+
+    async def _write_batch_or_restore(
+        self, connection: Connection, batch: list[OrganizationComposerEntity]
+    ) -> None:
+        """Writes a batch in its own transaction.
+
+        The id caches and stats are filled as the batch is written, so on
+        failure they are restored: otherwise a reused pipeline would refer
+        to rows that were rolled back. Keys are only ever added, so the
+        ones added by the batch are those past the previous lengths.
+        """
+        activity_count = len(self._activity_ids)
+        building_count = len(self._building_ids)
+        stats = replace(self.stats)
+        try:
+            async with connection.transaction():
+                await self._write_batch(connection, batch)
+        except BaseException:
+            for ids, count in (
+                (self._activity_ids, activity_count),
+                (self._building_ids, building_count),
+            ):
+                for key in list(islice(ids, count, None)):
+                    del ids[key]
+            self.stats = stats
+            raise
+
+    async def _load_activities(self, connection: Connection) -> None:
+        for row in await connection.fetch(SELECT_ACTIVITIES_SQL):
+            self._activity_ids[(row["parent_id"], row["name"])] = row["id"]
+
+    async def _reserve_ids(self, connection: Connection, table: str, count: int) -> list[int]:
+        if not count:
+            return []
+        rows = await connection.fetch(RESERVE_IDS_SQL, table, count)
+        return [row[0] for row in rows]
+
+    async def _resolve_activities(
+        self, connection: Connection, paths: set[tuple[str, ...]], now: datetime
+    ) -> None:
+        # Parents must exist before their children, so new activities are
+        # inserted one tree level at a time.
+        depth = max(map(len, paths), default=0)
+        for level in range(depth):
+            missing = set()
+            for path in paths:
+                if len(path) > level:
+                    parent_id = self._get_activity_id(path[:level])
+                    if (parent_id, path[level]) not in self._activity_ids:
+                        missing.add((parent_id, path[level]))
+            if not missing:
+                continue
+            parent_ids, names = zip(*missing)
+            for row in await connection.fetch(
+                INSERT_ACTIVITIES_SQL, parent_ids, names, now
+            ):
+                self._activity_ids[(row["parent_id"], row["name"])] = row["id"]
+            self.stats.activities_created += len(missing)
+
+    def _get_activity_id(self, path: tuple[str, ...]) -> int | None:
+        activity_id = None
+        for name in path:
+            activity_id = self._activity_ids[(activity_id, name)]
+        return activity_id
+
+    async def _resolve_buildings(
+        self, connection: Connection, keys: set[BuildingKey], now: datetime
+    ) -> None:
+        unknown = keys - self._building_ids.keys()
+        self.stats.buildings_reused += len(keys) - len(unknown)
+        if not unknown:
+            return
+        addresses, latitudes, longitudes = zip(*unknown)
+        rows = await connection.fetch(
+            SELECT_BUILDINGS_SQL, addresses, latitudes, longitudes
+        )
+        for row in rows:
+            key = (row["address"], row["latitude"], row["longitude"])
+            self._building_ids.setdefault(key, row["id"])
+            if key in unknown:
+                unknown.discard(key)
+                self.stats.buildings_reused += 1
+
+        ids = await self._reserve_ids(connection, "buildings", len(unknown))
+        records = []
+        for building_id, key in zip(ids, unknown):
+            self._building_ids[key] = building_id
+            records.append((building_id, *key, now, now))
+        if records:
+            await connection.copy_records_to_table(
+                "buildings",
+                records=records,
+                columns=["id", "address", "latitude", "longitude", "created_at", "updated_at"],
+            )
+            self.stats.buildings_created += len(records)
+
+    async def _write_batch(
+        self, connection: Connection, batch: list[OrganizationComposerEntity]
+    ) -> None:
+        now = await connection.fetchval("SELECT now()::timestamp")
+
+        await self._resolve_buildings(
+            connection,
+            {get_building_key(entity.building_entity) for entity in batch},
+            now,
+        )
+        await self._resolve_activities(
+            connection,
+            {
+                activity.get_path()
+                for entity in batch
+                for activity in entity.activity_entities_list
+            },
+            now,
+        )
+        organization_ids = await self._reserve_ids(
+            connection, "organizations", len(batch)
+        )
+        organizations, phones, links = [], [], set()
+        for organization_id, entity in zip(organization_ids, batch):
+            building_id = self._building_ids[get_building_key(entity.building_entity)]
+            organizations.append(
+                (organization_id, entity.organization_entity.name, building_id, now, now)
+            )
+            phones.extend(
+                (phone.number, organization_id, now, now)
+                for phone in entity.phones_entities_list
+            )
+            links.update(
+                (organization_id, self._get_activity_id(activity.get_path()))
+                for activity in entity.activity_entities_list
+            )
+
+        await connection.copy_records_to_table(
+            "organizations",
+            records=organizations,
+            columns=["id", "name", "building_id", "created_at", "updated_at"],
+        )
+        if phones:
+            await connection.copy_records_to_table(
+                "phones",
+                records=phones,
+                columns=["number", "organization_id", "created_at", "updated_at"],
+            )
+        if links:
+            await connection.copy_records_to_table(
+                "organization_activity",
+                records=list(links),
+                columns=["organization_id", "activity_id"],
+            )
+        self.stats.organizations += len(organizations)
+        self.stats.phones += len(phones)
@@ -0,0 +1,71 @@
+import csv
+import json
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Iterator
+
+from src.domain.entities.activities import ActivityEntity
+from src.domain.entities.buildings import BuildingEntity
+from src.domain.entities.composer import OrganizationComposerEntity
+from src.domain.entities.organizations import OrganizationEntity
+from src.domain.entities.phones import PhoneEntity
+
+LIST_SEPARATOR = ";"
+PATH_SEPARATOR = "/"
+
+
+def parse_activity_path(path: list[str] | str) -> ActivityEntity:
+    if isinstance(path, str):
+        path = path.split(PATH_SEPARATOR)
+    activity = None
+    for name in path:
+        activity = ActivityEntity(name=name.strip(), parent=activity)
+    return activity
+
+
+def parse_record(record: dict[str, Any]) -> OrganizationComposerEntity:
+    """Builds an organization from one CSV row or JSON object.
+
+    ``phones`` is a list or a ``;``-separated string; ``activities`` is a list
+    of paths, each path a list of names from the root or a ``/``-separated
+    string, e.g. ``"Food/Meat;Cars"``.
+    """
+    phones = record.get("phones") or []
+    if isinstance(phones, str):
+        phones = phones.split(LIST_SEPARATOR)
+    activities = record.get("activities") or []
+    if isinstance(activities, str):
+        activities = activities.split(LIST_SEPARATOR)
+    return OrganizationComposerEntity(
+        activity_entities_list=[
+            parse_activity_path(path) for path in activities if path
+        ],
+        organization_entity=OrganizationEntity(name=record["name"]),
+        building_entity=BuildingEntity(
+            address=record["address"],
+            latitude=Decimal(str(record["latitude"])),
+            longitude=Decimal(str(record["longitude"])),
+        ),
+        phones_entities_list=[
+            PhoneEntity(number=number.strip()) for number in phones if number.strip()
+        ],
+    )
+
+
+def read_jsonl(path: Path) -> Iterator[OrganizationComposerEntity]:
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield parse_record(json.loads(line))
+
+
+def read_csv(path: Path) -> Iterator[OrganizationComposerEntity]:
+    with path.open(encoding="utf-8", newline="") as file:
+        for row in csv.DictReader(file):
+            yield parse_record(row)
+
+
+READERS = {
+    "jsonl": read_jsonl,
+    "csv": read_csv,
+}
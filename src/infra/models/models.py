@@ -1,4 +1,18 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Table
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Integer,
+    String,
+    ForeignKey,
+    Float,
+    Table,
+    Index,
+    DDL,
+    event,
+    func,
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from src.infra.models.base import BaseSQLModel
 
@@ -17,6 +31,16 @@ organization_activity = Table(
         Integer,
         ForeignKey("activities.id", ondelete="CASCADE"),
         primary_key=True,
+        index=True,
+    ),
+    # Links are only inserted and deleted, so this is all the change feed
+    # needs to find new ones.
+    Column("created_at", DateTime, server_default=func.now(), nullable=False),
+    Index(
+        "ix_organization_activity_created_at",
+        "created_at",
+        "organization_id",
+        "activity_id",
     ),
 )
 
@@ -24,8 +48,8 @@ organization_activity = Table(
 class Organization(BaseSQLModel):
     __tablename__ = "organizations"
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
-    building_id = Column(Integer, ForeignKey("buildings.id"))
+    name = Column(String, nullable=False, index=True)
+    building_id = Column(Integer, ForeignKey("buildings.id"), index=True)
     building = relationship("Building", back_populates="organizations")
     activities = relationship(
         "Activity",
@@ -37,14 +61,18 @@ class Organization(BaseSQLModel):
         "Phone", back_populates="organization", cascade="all, delete-orphan"
     )
 
+    __table_args__ = (Index("ix_organizations_updated_at_id", "updated_at", "id"),)
+
 
 class Phone(BaseSQLModel):
     __tablename__ = "phones"
     id = Column(Integer, primary_key=True)
     number = Column(String, nullable=False)
-    organization_id = Column(Integer, ForeignKey("organizations.id"))
+    organization_id = Column(Integer, ForeignKey("organizations.id"), index=True)
     organization = relationship("Organization", back_populates="phones")
 
+    __table_args__ = (Index("ix_phones_updated_at_id", "updated_at", "id"),)
+
 
 class Building(BaseSQLModel):
     __tablename__ = "buildings"
@@ -54,20 +82,271 @@ class Building(BaseSQLModel):
     longitude = Column(Float, nullable=False)
     organizations = relationship("Organization", back_populates="building")
 
+    __table_args__ = (
+        Index("ix_buildings_latitude_longitude", "latitude", "longitude"),
+        Index("ix_buildings_updated_at_id", "updated_at", "id"),
+    )
+
 
 class Activity(BaseSQLModel):
     __tablename__ = "activities"
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     parent_id = Column(
-        Integer, ForeignKey("activities.id", ondelete="SET NULL"), nullable=True
-    )
-    children = relationship(
-        "Activity", backref="parent", remote_side=[id], lazy="selectin"
+        Integer,
+        ForeignKey("activities.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
     )
+    parent = relationship("Activity", remote_side=[id], back_populates="children")
+    children = relationship("Activity", back_populates="parent")
     organizations = relationship(
         "Organization",
         secondary=organization_activity,
         back_populates="activities",
-        lazy="selectin",
+    )
+
+    __table_args__ = (Index("ix_activities_updated_at_id", "updated_at", "id"),)
+
+
+activity_closure = Table(
+    "activity_closure",
+    BaseSQLModel.metadata,
+    Column(
+        "ancestor_id",
+        Integer,
+        ForeignKey("activities.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "descendant_id",
+        Integer,
+        ForeignKey("activities.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    ),
+    Column("depth", Integer, nullable=False),
+)
+
+ACTIVITY_CLOSURE_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION activity_closure_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, NEW.id, depth + 1
+        FROM activity_closure
+        WHERE descendant_id = NEW.parent_id
+        UNION ALL
+        SELECT NEW.id, NEW.id, 0;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION activity_closure_move() RETURNS trigger AS $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM activity_closure
+            WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+        ) THEN
+            RAISE EXCEPTION 'activity cannot be moved under its own descendant';
+        END IF;
+
+        DELETE FROM activity_closure AS link
+        USING activity_closure AS subtree
+        WHERE subtree.ancestor_id = NEW.id
+          AND link.descendant_id = subtree.descendant_id
+          AND link.ancestor_id NOT IN (
+              SELECT descendant_id FROM activity_closure WHERE ancestor_id = NEW.id
+          );
+
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        SELECT supertree.ancestor_id, subtree.descendant_id,
+               supertree.depth + subtree.depth + 1
+        FROM activity_closure AS supertree
+        CROSS JOIN activity_closure AS subtree
+        WHERE supertree.descendant_id = NEW.parent_id
+          AND subtree.ancestor_id = NEW.id;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER activity_closure_insert
+    AFTER INSERT ON activities
+    FOR EACH ROW EXECUTE FUNCTION activity_closure_insert()
+    """,
+    """
+    CREATE TRIGGER activity_closure_move
+    AFTER UPDATE OF parent_id ON activities
+    FOR EACH ROW
+    WHEN (OLD.parent_id IS DISTINCT FROM NEW.parent_id)
+    EXECUTE FUNCTION activity_closure_move()
+    """,
+    """
+    INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+    WITH RECURSIVE paths AS (
+        SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth
+        FROM activities
+        UNION ALL
+        SELECT paths.ancestor_id, activities.id, paths.depth + 1
+        FROM paths
+        INNER JOIN activities ON activities.parent_id = paths.descendant_id
+    )
+    SELECT ancestor_id, descendant_id, depth FROM paths
+    """,
+)
+
+for statement in ACTIVITY_CLOSURE_DDL:
+    event.listen(
+        activity_closure,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+
+DIRECTORY_CHANGES_CHANNEL = "directory_changes"
+DIRECTORY_TABLES = (
+    "organizations",
+    "buildings",
+    "phones",
+    "activities",
+    "organization_activity",
+)
+
+DIRECTORY_CHANGES_DDL = (
+    f"""
+    CREATE OR REPLACE FUNCTION notify_directory_changes() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{DIRECTORY_CHANGES_CHANNEL}', TG_TABLE_NAME);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    *(
+        f"""
+        CREATE OR REPLACE TRIGGER {table}_notify_directory_changes
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_directory_changes()
+        """
+        for table in DIRECTORY_TABLES
+    ),
+)
+
+for statement in DIRECTORY_CHANGES_DDL:
+    event.listen(
+        BaseSQLModel.metadata,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+
+# The id of the last transaction that wrote to each directory table. Read
+# together they make a version of the whole directory that is cheap to
+# check and changes with every committed write.
+directory_versions = Table(
+    "directory_versions",
+    BaseSQLModel.metadata,
+    Column("table_name", String, primary_key=True),
+    Column("version", BigInteger, nullable=False),
+)
+
+DIRECTORY_VERSIONS_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION bump_directory_version() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO directory_versions (table_name, version)
+        VALUES (TG_TABLE_NAME, txid_current())
+        ON CONFLICT (table_name) DO UPDATE SET version = EXCLUDED.version;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    *(
+        f"""
+        CREATE OR REPLACE TRIGGER {table}_bump_directory_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_directory_version()
+        """
+        for table in DIRECTORY_TABLES
+    ),
+)
+
+for statement in DIRECTORY_VERSIONS_DDL:
+    event.listen(
+        BaseSQLModel.metadata,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+
+# Deleted directory rows, kept for the change feed: the table and the
+# primary key of each, e.g. ``{"id": 1}``.
+directory_tombstones = Table(
+    "directory_tombstones",
+    BaseSQLModel.metadata,
+    Column("id", BigInteger, primary_key=True),
+    Column("table_name", String, nullable=False),
+    Column("row_key", JSONB, nullable=False),
+    Column("deleted_at", DateTime, server_default=func.now(), nullable=False),
+    Index("ix_directory_tombstones_deleted_at_id", "deleted_at", "id"),
+)
+
+# Primary key columns of the rows the change feed reports.
+CHANGE_FEED_KEYS = {
+    "organizations": ("id",),
+    "buildings": ("id",),
+    "phones": ("id",),
+    "activities": ("id",),
+    "organization_activity": ("organization_id", "activity_id"),
+}
+
+CHANGE_FEED_DDL = (
+    # The feed finds changes by ``updated_at``, so raw SQL updates have to
+    # move it as well as the ORM does.
+    """
+    CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := now();
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION record_tombstone() RETURNS trigger AS $$
+    DECLARE
+        old_row jsonb := to_jsonb(OLD);
+        row_key jsonb := '{}';
+        key_column text;
+    BEGIN
+        FOREACH key_column IN ARRAY TG_ARGV LOOP
+            row_key := row_key || jsonb_build_object(key_column, old_row -> key_column);
+        END LOOP;
+        INSERT INTO directory_tombstones (table_name, row_key)
+        VALUES (TG_TABLE_NAME, row_key);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    *(
+        f"""
+        CREATE OR REPLACE TRIGGER {table}_touch_updated_at
+        BEFORE UPDATE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION touch_updated_at()
+        """
+        for table in CHANGE_FEED_KEYS
+        if table != "organization_activity"
+    ),
+    *(
+        f"""
+        CREATE OR REPLACE TRIGGER {table}_record_tombstone
+        AFTER DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION record_tombstone({", ".join(f"'{column}'" for column in key)})
+        """
+        for table, key in CHANGE_FEED_KEYS.items()
+    ),
+)
+
+for statement in CHANGE_FEED_DDL:
+    event.listen(
+        BaseSQLModel.metadata,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
     )
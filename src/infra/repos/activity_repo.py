@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+from sqlalchemy import Row, Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.infra.models.models import Activity, activity_closure
+
+
+@dataclass(eq=False)
+class ActivityRepository:
+    model = Activity
+
+    def select_root_ids(self, data: dict[str, Any]) -> Select:
+        if data:
+            return select(self.model.id).filter_by(**data)
+        return select(self.model.id).where(self.model.parent_id.is_(None))
+
+    async def get_activity_tree(
+        self, session: AsyncSession, data: dict[str, Any], max_depth: int = 3
+    ) -> Sequence[Row]:
+        """Rows of ``(root_id, depth, id, name, parent_id)`` for every activity
+        less than ``max_depth`` levels below the matched roots (or below the
+        top-level activities when ``data`` is empty), parents first."""
+        query = (
+            select(
+                activity_closure.c.ancestor_id.label("root_id"),
+                activity_closure.c.depth,
+                self.model.id,
+                self.model.name,
+                self.model.parent_id,
+            )
+            .join(self.model, self.model.id == activity_closure.c.descendant_id)
+            .where(
+                activity_closure.c.ancestor_id.in_(self.select_root_ids(data)),
+                activity_closure.c.depth < max_depth,
+            )
+            .order_by(
+                activity_closure.c.ancestor_id,
+                activity_closure.c.depth,
+                self.model.id,
+            )
+        )
+        result = await session.execute(query)
+        return result.all()
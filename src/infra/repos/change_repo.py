@@ -0,0 +1,150 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import (
+    ColumnElement,
+    Row,
+    Select,
+    String,
+    Table,
+    Text,
+    cast,
+    false,
+    func,
+    literal,
+    select,
+    true,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.infra.db.horizon import HORIZON_QUERY
+from src.infra.models.models import (
+    Activity,
+    Building,
+    Organization,
+    Phone,
+    directory_tombstones,
+    organization_activity,
+)
+
+
+class ChangePosition(NamedTuple):
+    """Where a change sits in the feed: its time, then its table's rank, then
+    its key. Deletions come first among changes at the same time."""
+
+    changed_at: datetime
+    rank: int
+    key: int
+    subkey: int
+
+
+@dataclass(eq=False)
+class ChangeSource:
+    table: Table
+    rank: int
+    changed_at: ColumnElement
+    key: ColumnElement
+    subkey: ColumnElement | None = None
+    deleted: bool = False
+
+    def select_changes(
+        self, after: ChangePosition | None, horizon: datetime, limit: int
+    ) -> Select:
+        subkey = self.subkey if self.subkey is not None else literal(0)
+        if self.deleted:
+            table_name, row = directory_tombstones.c.table_name, directory_tombstones.c.row_key
+        else:
+            table_name = literal(self.table.name, String)
+            row = func.to_jsonb(self.table.table_valued())
+        payload = func.json_build_object(
+            "table", table_name,
+            "deleted", true() if self.deleted else false(),
+            "changed_at", self.changed_at,
+            "row", row,
+        )
+        query = select(
+            self.changed_at.label("changed_at"),
+            literal(self.rank).label("rank"),
+            self.key.label("key"),
+            subkey.label("subkey"),
+            cast(payload, Text).label("payload"),
+        ).where(self.changed_at < horizon)
+        if after is not None:
+            query = query.where(self.get_after_condition(after))
+        order = [self.changed_at, self.key]
+        if self.subkey is not None:
+            order.append(self.subkey)
+        return query.order_by(*order).limit(limit)
+
+    def get_after_condition(self, after: ChangePosition) -> ColumnElement[bool]:
+        # The rank is fixed per source, so the position comparison reduces
+        # to one each ``(changed_at, key...)`` index can serve.
+        if self.rank > after.rank:
+            return self.changed_at >= after.changed_at
+        if self.rank < after.rank:
+            return self.changed_at > after.changed_at
+        if self.subkey is None:
+            return tuple_(self.changed_at, self.key) > tuple_(after.changed_at, after.key)
+        return tuple_(self.changed_at, self.key, self.subkey) > tuple_(
+            after.changed_at, after.key, after.subkey
+        )
+
+
+CHANGE_SOURCES = (
+    ChangeSource(
+        directory_tombstones,
+        0,
+        directory_tombstones.c.deleted_at,
+        directory_tombstones.c.id,
+        deleted=True,
+    ),
+    ChangeSource(Activity.__table__, 1, Activity.updated_at, Activity.id),
+    ChangeSource(Building.__table__, 2, Building.updated_at, Building.id),
+    ChangeSource(Organization.__table__, 3, Organization.updated_at, Organization.id),
+    ChangeSource(Phone.__table__, 4, Phone.updated_at, Phone.id),
+    ChangeSource(
+        organization_activity,
+        5,
+        organization_activity.c.created_at,
+        organization_activity.c.organization_id,
+        organization_activity.c.activity_id,
+    ),
+)
+
+
+@dataclass(eq=False)
+class ChangeRepository:
+    @staticmethod
+    async def get_horizon(session: AsyncSession) -> datetime:
+        return await session.scalar(HORIZON_QUERY)
+
+    @staticmethod
+    def select_changes(
+        after: ChangePosition | None, horizon: datetime, limit: int
+    ) -> Select:
+        # Each source reads at most ``limit`` rows off its own index, and
+        # only those are merged.
+        changes = union_all(
+            *(
+                select(source.select_changes(after, horizon, limit).subquery())
+                for source in CHANGE_SOURCES
+            )
+        ).subquery()
+        return (
+            select(changes)
+            .order_by(changes.c.changed_at, changes.c.rank, changes.c.key, changes.c.subkey)
+            .limit(limit)
+        )
+
+    async def get_changes(
+        self,
+        session: AsyncSession,
+        after: ChangePosition | None,
+        horizon: datetime,
+        limit: int,
+    ) -> list[Row]:
+        result = await session.execute(self.select_changes(after, horizon, limit))
+        return result.all()
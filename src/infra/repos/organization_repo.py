@@ -1,17 +1,195 @@
+import math
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, AsyncIterator, Sequence
 
-from sqlalchemy import select, and_, text
+from sqlalchemy import (
+    select,
+    and_,
+    or_,
+    func,
+    bindparam,
+    case,
+    tuple_,
+    ColumnElement,
+    Float,
+    Integer,
+    Row,
+    Select,
+    Text,
+    cast,
+    literal_column,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload, aliased
+from sqlalchemy.orm import selectinload, contains_eager
 
+from src.common.distance import (
+    EARTH_RADIUS_KM,
+    WGS84_A_KM,
+    WGS84_F,
+    DistancePrecision,
+    get_bounding_box,
+)
 from src.infra.models.models import (
     Organization,
     organization_activity,
+    activity_closure,
     Activity,
     Building,
+    Phone,
+    directory_versions,
 )
-from geopy.distance import geodesic
+
+
+def get_bounding_box_condition(
+    latitude: float, longitude: float, radius_km: float
+) -> ColumnElement[bool]:
+    min_lat, max_lat, lon_ranges = get_bounding_box(latitude, longitude, radius_km)
+    latitude_condition = Building.latitude.between(min_lat, max_lat)
+    if lon_ranges is None:
+        return latitude_condition
+    return and_(
+        latitude_condition,
+        or_(
+            *(
+                Building.longitude.between(min_lon, max_lon)
+                for min_lon, max_lon in lon_ranges
+            )
+        ),
+    )
+
+
+def _get_central_angle_expression(
+    lat_rad: float, lon_rad: float, building_lat, building_lon
+) -> ColumnElement[float]:
+    haversine = func.power(func.sin((building_lat - lat_rad) / 2), 2) + math.cos(
+        lat_rad
+    ) * func.cos(building_lat) * func.power(func.sin((building_lon - lon_rad) / 2), 2)
+    return 2 * func.asin(func.sqrt(func.least(haversine, 1.0)))
+
+
+def get_distance_km_expression(
+    latitude: float,
+    longitude: float,
+    precision: DistancePrecision = DistancePrecision.HAVERSINE,
+) -> ColumnElement[float]:
+    """SQL twin of ``src.common.distance.distances_km`` for ``Building`` rows."""
+    lon_rad = math.radians(longitude)
+    building_lon = func.radians(Building.longitude)
+    if precision is DistancePrecision.HAVERSINE:
+        return EARTH_RADIUS_KM * _get_central_angle_expression(
+            math.radians(latitude),
+            lon_rad,
+            func.radians(Building.latitude),
+            building_lon,
+        )
+
+    reduced_lat = math.atan((1 - WGS84_F) * math.tan(math.radians(latitude)))
+    building_reduced_lat = func.atan(
+        (1 - WGS84_F) * func.tan(func.radians(Building.latitude))
+    )
+    sigma = _get_central_angle_expression(
+        reduced_lat, lon_rad, building_reduced_lat, building_lon
+    )
+    p = (building_reduced_lat + reduced_lat) / 2
+    q = (building_reduced_lat - reduced_lat) / 2
+    x = (sigma - func.sin(sigma)) * func.power(
+        func.sin(p) * func.cos(q) / func.cos(sigma / 2), 2
+    )
+    y = (sigma + func.sin(sigma)) * func.power(
+        func.cos(p) * func.sin(q) / func.nullif(func.sin(sigma / 2), 0), 2
+    )
+    return func.coalesce(WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y)), 0.0)
+
+
+def get_organization_json_expression(
+    **extra_fields: ColumnElement,
+) -> ColumnElement[str]:
+    """Builds the ``FullOutOrganizationSchema`` payload as JSON text in Postgres.
+
+    Expects ``Building`` to be joined to ``Organization``. ``json_build_object``
+    is used over ``jsonb`` because it keeps the key order of the schema;
+    ``extra_fields`` are appended after the schema fields.
+    """
+    empty_array = literal_column("'[]'::json")
+    phones = (
+        select(
+            func.coalesce(
+                func.json_agg(
+                    aggregate_order_by(
+                        func.json_build_object("number", Phone.number), Phone.id
+                    )
+                ),
+                empty_array,
+            )
+        )
+        .where(Phone.organization_id == Organization.id)
+        .scalar_subquery()
+    )
+    activities = (
+        select(
+            func.coalesce(
+                func.json_agg(
+                    aggregate_order_by(
+                        func.json_build_object("name", Activity.name), Activity.id
+                    )
+                ),
+                empty_array,
+            )
+        )
+        .join(organization_activity, organization_activity.c.activity_id == Activity.id)
+        .where(organization_activity.c.organization_id == Organization.id)
+        .scalar_subquery()
+    )
+    fields = [
+        "organization",
+        func.json_build_object("name", Organization.name),
+        "phones",
+        phones,
+        "building",
+        func.json_build_object(
+            "address",
+            Building.address,
+            "latitude",
+            Building.latitude,
+            "longitude",
+            Building.longitude,
+        ),
+        "activities",
+        activities,
+    ]
+    for name, value in extra_fields.items():
+        fields += [name, value]
+    return cast(func.json_build_object(*fields), Text)
+
+
+def paginate_by_id(
+    query: Select,
+    column: ColumnElement[int],
+    limit: int | None,
+    after_id: int | None = None,
+) -> Select:
+    if after_id is not None:
+        query = query.where(column > after_id)
+    query = query.order_by(column)
+    if limit is None:
+        return query
+    return query.limit(limit + 1)
+
+
+def paginate_by_distance(
+    query: Select,
+    distance: ColumnElement[float],
+    column: ColumnElement[int],
+    limit: int | None,
+    after: tuple[float, int] | None = None,
+) -> Select:
+    if after is not None:
+        query = query.where(tuple_(distance, column) > tuple_(*after))
+    query = query.order_by(distance, column)
+    if limit is None:
+        return query
+    return query.limit(limit + 1)
 
 
 @dataclass(eq=False)
@@ -19,8 +197,18 @@ class OrganizationRepository:
     model = Organization
 
     async def get_organization_by_entity(
-        self, session: AsyncSession, data: dict[str, Any]
-    ) -> Organization:
+        self, session: AsyncSession, data: dict[str, Any], as_json: bool = False
+    ) -> Organization | str | None:
+        if as_json:
+            query = (
+                select(self.model.id, get_organization_json_expression().label("payload"))
+                .filter_by(**data)
+                .outerjoin(Building, self.model.building_id == Building.id)
+                .limit(1)
+            )
+            result = await session.execute(query)
+            row = result.first()
+            return row.payload if row else None
         query = (
             select(self.model)
             .filter_by(**data)
@@ -34,176 +222,306 @@ class OrganizationRepository:
         organization = result.scalars().first()
         return organization
 
+    def select_organizations(self, as_json: bool = False) -> Select:
+        """Rows of ``Organization`` models, or ``(id, payload)`` rows when
+        ``as_json`` is set, see ``get_organization_json_expression``."""
+        if as_json:
+            return select(
+                self.model.id, get_organization_json_expression().label("payload")
+            ).outerjoin(Building, self.model.building_id == Building.id)
+        return select(self.model).options(
+            selectinload(self.model.phones), selectinload(self.model.building)
+        )
+
+    def select_organizations_by_ids_or_names(
+        self, ids: list[int], names: list[str], as_json: bool = False
+    ) -> Select:
+        conditions = []
+        if ids:
+            conditions.append(self.model.id.in_(ids))
+        if names:
+            conditions.append(self.model.name.in_(names))
+        query = self.select_organizations(as_json).where(or_(*conditions))
+        if as_json:
+            # Callers need the name to tell which of the requested names matched.
+            query = query.add_columns(self.model.name)
+        return query.order_by(self.model.id)
+
+    def select_organizations_from_building_id(
+        self, building_id: int, as_json: bool = False
+    ) -> Select:
+        return self.select_organizations(as_json).where(
+            self.model.building_id == building_id
+        )
+
+    def select_organizations_by_activity(
+        self, data: dict[str, Any], as_json: bool = False
+    ) -> Select:
+        organization_ids = (
+            select(organization_activity.c.organization_id)
+            .join(Activity, organization_activity.c.activity_id == Activity.id)
+            .filter_by(**data)
+        )
+        return self.select_organizations(as_json).where(
+            self.model.id.in_(organization_ids)
+        )
+
+    def select_organizations_by_activity_tree(
+        self, data: dict[str, Any], max_depth: int = 3, as_json: bool = False
+    ) -> Select:
+        root_activity_ids = select(Activity.id).filter_by(**data)
+        activity_ids = select(activity_closure.c.descendant_id).where(
+            activity_closure.c.ancestor_id.in_(root_activity_ids),
+            activity_closure.c.depth < max_depth,
+        )
+        organization_ids = select(organization_activity.c.organization_id).where(
+            organization_activity.c.activity_id.in_(activity_ids)
+        )
+        return self.select_organizations(as_json).where(
+            self.model.id.in_(organization_ids)
+        )
+
+    def select_organizations_in_radius(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        precision: DistancePrecision = DistancePrecision.HAVERSINE,
+        as_json: bool = False,
+    ) -> tuple[Select, ColumnElement[float]]:
+        distance = get_distance_km_expression(latitude, longitude, precision)
+        if as_json:
+            query = select(
+                self.model.id,
+                distance.label("distance_km"),
+                get_organization_json_expression(distance_km=distance).label("payload"),
+            )
+        else:
+            query = select(self.model, distance.label("distance_km")).options(
+                contains_eager(self.model.building),
+                selectinload(self.model.phones),
+            )
+        query = query.join(Building, self.model.building_id == Building.id).where(
+            get_bounding_box_condition(latitude, longitude, radius_km),
+            distance <= radius_km,
+        )
+        return query, distance
+
+    def select_organizations_by_building_distances(
+        self, building_ids: list[int], distances: list[float], as_json: bool = False
+    ) -> tuple[Select, ColumnElement[float]]:
+        candidates = select(
+            func.unnest(
+                bindparam("building_ids", building_ids, type_=ARRAY(Integer))
+            ).label("building_id"),
+            func.unnest(bindparam("distances", distances, type_=ARRAY(Float))).label(
+                "distance_km"
+            ),
+        ).subquery("candidates")
+        if as_json:
+            query = select(
+                self.model.id,
+                candidates.c.distance_km,
+                get_organization_json_expression(
+                    distance_km=candidates.c.distance_km
+                ).label("payload"),
+            ).join(Building, self.model.building_id == Building.id)
+        else:
+            query = select(self.model, candidates.c.distance_km).options(
+                selectinload(self.model.phones), selectinload(self.model.building)
+            )
+        query = query.join(
+            candidates, self.model.building_id == candidates.c.building_id
+        )
+        return query, candidates.c.distance_km
+
+    def select_organizations_by_ranks(
+        self, organization_ids: list[int], scores: list[float], as_json: bool = False
+    ) -> Select:
+        """Organizations in the order of ``organization_ids``, each with its score."""
+        candidates = select(
+            func.unnest(
+                bindparam("organization_ids", organization_ids, type_=ARRAY(Integer))
+            ).label("organization_id"),
+            func.unnest(bindparam("scores", scores, type_=ARRAY(Float))).label("score"),
+            func.generate_series(1, len(organization_ids)).label("position"),
+        ).subquery("candidates")
+        if as_json:
+            query = select(
+                self.model.id,
+                candidates.c.score,
+                get_organization_json_expression(score=candidates.c.score).label(
+                    "payload"
+                ),
+            ).outerjoin(Building, self.model.building_id == Building.id)
+        else:
+            query = select(self.model, candidates.c.score).options(
+                selectinload(self.model.phones), selectinload(self.model.building)
+            )
+        return query.join(
+            candidates, self.model.id == candidates.c.organization_id
+        ).order_by(candidates.c.position)
+
+    async def get_organizations_by_ids_or_names(
+        self,
+        session: AsyncSession,
+        ids: list[int],
+        names: list[str],
+        as_json: bool = False,
+    ) -> list[Organization] | list[Row]:
+        query = self.select_organizations_by_ids_or_names(ids, names, as_json=as_json)
+        result = await session.execute(query)
+        if as_json:
+            return result.all()
+        return result.scalars().all()
+
     async def get_organizations_from_building_id(
-        self, building_id: int, session: AsyncSession
+        self,
+        building_id: int,
+        session: AsyncSession,
+        limit: int,
+        after_id: int | None = None,
+        as_json: bool = False,
     ) -> [Organization | None]:
-        query = (
-            select(self.model)
-            .where(self.model.building_id == building_id)
-            .options(selectinload(self.model.phones), selectinload(self.model.building))
+        query = self.select_organizations_from_building_id(building_id, as_json=as_json)
+        result = await session.execute(
+            paginate_by_id(query, self.model.id, limit, after_id)
         )
-        result = await session.execute(query)
+        if as_json:
+            return result.all()
         organizations = result.scalars().all()
         return organizations
 
     async def get_organizations_by_activity(
-        self, session: AsyncSession, data: dict[str, Any]
+        self,
+        session: AsyncSession,
+        data: dict[str, Any],
+        limit: int,
+        after_id: int | None = None,
+        as_json: bool = False,
     ) -> [Organization | None]:
-        query = (
-            select(self.model)
-            .join(
-                organization_activity,
-                self.model.id == organization_activity.c.organization_id,
-            )
-            .join(Activity, organization_activity.c.activity_id == Activity.id)
-            .filter_by(**data)
-            .options(selectinload(self.model.phones), selectinload(self.model.building))
+        query = self.select_organizations_by_activity(data, as_json=as_json)
+        result = await session.execute(
+            paginate_by_id(query, self.model.id, limit, after_id)
         )
-        result = await session.execute(query)
+        if as_json:
+            return result.all()
         organizations = result.scalars().all()
 
         return organizations
 
     async def get_organizations_in_radius(
-        self, session: AsyncSession, latitude: float, longitude: float, radius_km: float
-    ) -> list[Organization | None]:
-        delta_lat = radius_km / 111.32
-        delta_lon = radius_km / (111.32 * abs(latitude))
-
-        min_lat = latitude - delta_lat
-        max_lat = latitude + delta_lat
-        min_lon = longitude - delta_lon
-        max_lon = longitude + delta_lon
-
-        buildings_query = select(Building).where(
-            and_(
-                Building.latitude.between(min_lat, max_lat),
-                Building.longitude.between(min_lon, max_lon),
-            )
+        self,
+        session: AsyncSession,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        limit: int,
+        after: tuple[float, int] | None = None,
+        precision: DistancePrecision = DistancePrecision.HAVERSINE,
+        as_json: bool = False,
+    ) -> list[tuple[Organization, float]]:
+        query, distance = self.select_organizations_in_radius(
+            latitude, longitude, radius_km, precision, as_json=as_json
         )
+        result = await session.execute(
+            paginate_by_distance(query, distance, self.model.id, limit, after)
+        )
+        return result.tuples().all()
 
-        result = await session.execute(buildings_query)
-        buildings_in_bbox = result.scalars().all()
-        target_point = (latitude, longitude)
-        buildings_in_radius = [
-            building
-            for building in buildings_in_bbox
-            if geodesic(target_point, (building.latitude, building.longitude)).km
-            <= radius_km
-        ]
-
-        organizations = []
-        for building in buildings_in_radius:
-            query = (
-                select(self.model)
-                .where(self.model.building_id == building.id)
-                .options(
-                    selectinload(self.model.phones), selectinload(self.model.building)
-                )
-            )
-            result = await session.execute(query)
-            organizations.extend(result.scalars().all())
-
-        return organizations
+    async def get_organizations_by_building_distances(
+        self,
+        session: AsyncSession,
+        building_ids: list[int],
+        distances: list[float],
+        limit: int,
+        after: tuple[float, int] | None = None,
+        as_json: bool = False,
+    ) -> list[tuple[Organization, float]]:
+        query, distance = self.select_organizations_by_building_distances(
+            building_ids, distances, as_json=as_json
+        )
+        result = await session.execute(
+            paginate_by_distance(query, distance, self.model.id, limit, after)
+        )
+        return result.tuples().all()
 
-    @staticmethod
     async def get_organizations_by_activity_tree(
+        self,
         session: AsyncSession,
         data: dict[str, Any],
+        limit: int,
+        after_id: int | None = None,
         max_depth: int = 3,
+        as_json: bool = False,
     ) -> [Organization | None]:
-        query = text(
-            """
-            WITH RECURSIVE activity_tree AS (
-                SELECT
-                    id,
-                    name,
-                    parent_id,
-                    1 AS depth
-                FROM
-                    activities
-                UNION ALL
-
-                SELECT
-                    a.id,
-                    a.name,
-                    a.parent_id,
-                    at.depth + 1 AS depth
-                FROM
-                    activities a
-                INNER JOIN
-                    activity_tree at ON a.parent_id = at.id
-                WHERE
-                    at.depth < :max_depth
-            )
-            SELECT DISTINCT
-                o.id AS organization_id,
-                o.name AS organization_name,
-                b.id AS building_id,
-                b.address AS building_address,
-                b.latitude AS building_latitude,
-                b.longitude AS building_longitude,
-                array_agg(p.number) AS phone_numbers,
-                at.id AS activity_id,
-                at.name AS activity_name
-            FROM
-                organizations o
-            INNER JOIN
-                buildings b ON o.building_id = b.id
-            LEFT JOIN
-                phones p ON o.id = p.organization_id
-            INNER JOIN
-                organization_activity oa ON o.id = oa.organization_id
-            INNER JOIN
-                activity_tree at ON oa.activity_id = at.id
-            GROUP BY
-                o.id, o.name, b.id, b.address, b.latitude, b.longitude, at.id, at.name;
-        """
-        )
-        # Параметры запроса
-        params = {
-            "activity_name": data.get("name", None),
-            "activity_id": data.get("id", None),
-            "max_depth": max_depth,
-        }
-
-        result = await session.execute(query, params)
-        return result.mappings().fetchall()
+        query = self.select_organizations_by_activity_tree(
+            data, max_depth, as_json=as_json
+        )
+        result = await session.execute(
+            paginate_by_id(query, self.model.id, limit, after_id)
+        )
+        if as_json:
+            return result.all()
+        organizations = result.scalars().all()
+        return organizations
 
-    @staticmethod
-    async def get_activities_with_depth_limit(
-        session: AsyncSession, max_depth: int = 3
-    ) -> [Organization | None]:
-        def get_activities_with_depth(activity, current_depth):
-            if current_depth > max_depth:
-                return []
-            activities = [activity]
-            for child in activity.children:
-                activities.extend(get_activities_with_depth(child, current_depth + 1))
-            return activities
-
-        query = select(Activity).where(Activity.parent_id == None)
+    async def search_organization_ids(
+        self, session: AsyncSession, normalized: str, limit: int
+    ) -> list[int]:
+        """Names starting with ``normalized`` first, then names where every
+        word of it starts a word, shorter names first. No typo tolerance."""
+        # Normalized like ``normalize_name``, so "Coca-Cola" is found as
+        # "coca cola" here just as in the in-memory index.
+        name = func.trim(
+            func.regexp_replace(func.lower(self.model.name), r"\W+", " ", "g")
+        )
+        is_prefix = name.startswith(normalized, autoescape=True)
+        words_match = and_(
+            *(
+                or_(
+                    name.startswith(word, autoescape=True),
+                    name.contains(" " + word, autoescape=True),
+                )
+                for word in normalized.split()
+            )
+        )
+        query = (
+            select(self.model.id)
+            .where(or_(is_prefix, words_match))
+            .order_by(
+                case((is_prefix, 0), else_=1),
+                func.length(self.model.name),
+                self.model.id,
+            )
+            .limit(limit)
+        )
         result = await session.execute(query)
-        root_activities = result.scalars().all()
-
-        all_activities = []
-        for root in root_activities:
-            all_activities.extend(get_activities_with_depth(root, 1))
+        return list(result.scalars().all())
 
-        return all_activities
+    async def get_organizations_by_ranks(
+        self,
+        session: AsyncSession,
+        organization_ids: list[int],
+        scores: list[float],
+        as_json: bool = False,
+    ) -> list[tuple[Organization, float]]:
+        query = self.select_organizations_by_ranks(
+            organization_ids, scores, as_json=as_json
+        )
+        result = await session.execute(query)
+        return result.tuples().all()
 
     @staticmethod
-    async def get_all_children(session: AsyncSession, parent_id: int):
-        cte = select(Activity).where(Activity.id == parent_id).cte(recursive=True)
+    async def get_directory_versions(session: AsyncSession) -> list[tuple[str, int]]:
+        query = select(directory_versions.c.table_name, directory_versions.c.version)
+        result = await session.execute(query.order_by(directory_versions.c.table_name))
+        return result.tuples().all()
 
-        child_alias = aliased(Activity, name="child")
-
-        cte = cte.union_all(
-            select(child_alias).where(child_alias.parent_id == cte.c.id)
-        )
-
-        result = await session.execute(
-            select(Activity).join(cte, Activity.id == cte.c.id)
-        )
-        children = result.scalars().all()
-        return children
+    @staticmethod
+    async def stream(
+        session: AsyncSession, query: Select, chunk_size: int
+    ) -> AsyncIterator[Sequence[Row]]:
+        result = await session.stream(query.execution_options(yield_per=chunk_size))
+        async for partition in result.partitions():
+            yield partition
@@ -0,0 +1,358 @@
+import asyncio
+import logging
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime
+from operator import itemgetter
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.common.text_search import SearchMatch, get_trigrams, normalize_name
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.db.horizon import select_changed_since
+from src.infra.models.models import Organization
+
+logger = logging.getLogger(__name__)
+
+PREFIX, WORD_PREFIX, FUZZY = range(3)
+# Token scores are integers in thousandths to keep the per-row arrays small;
+# uint16 holds their sum for up to 65 query words.
+SCORE_SCALE = 1000
+
+
+def build_postings(
+    keys: np.ndarray, rows: np.ndarray, size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Groups ``rows`` by ``keys``: rows of key ``k`` are
+    ``rows[offsets[k]:offsets[k + 1]]``, in ascending order."""
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=offsets[1:])
+    return offsets, rows[np.argsort(keys, kind="stable")]
+
+
+class NameSegment:
+    """Immutable part of the index built from normalized names.
+
+    Rows are ordered by organization id. Names are also kept in sorted order
+    for prefix lookups, and their words in a sorted vocabulary with the rows
+    using them and a trigram index for fuzzy matching.
+    """
+
+    def __init__(self, ids: np.ndarray, names: list[str]):
+        self.ids = ids
+        self.names = names
+        size = len(names)
+        self.lengths = np.fromiter(map(len, names), dtype=np.int64, count=size)
+        self.name_order = np.array(
+            sorted(range(size), key=names.__getitem__), dtype=np.int64
+        )
+
+        word_ids: dict[str, int] = {}
+        word_keys, word_rows = array("q"), array("q")
+        for row, name in enumerate(names):
+            for word in set(name.split()):
+                word_keys.append(word_ids.setdefault(word, len(word_ids)))
+                word_rows.append(row)
+
+        # Words sharing a prefix are adjacent in the sorted vocabulary, so
+        # their rows form one slice of ``word_rows``.
+        self.vocabulary = sorted(word_ids)
+        word_ranks = np.empty(len(word_ids), dtype=np.int64)
+        word_ranks[[word_ids[word] for word in self.vocabulary]] = np.arange(
+            len(word_ids)
+        )
+        self.word_offsets, self.word_rows = build_postings(
+            word_ranks[np.asarray(word_keys, dtype=np.int64)],
+            np.asarray(word_rows, dtype=np.int64),
+            len(word_ids),
+        )
+
+        trigram_ids: dict[str, int] = {}
+        trigram_keys, trigram_words = array("q"), array("q")
+        self.word_trigram_counts = np.zeros(len(self.vocabulary), dtype=np.int64)
+        for word_index, word in enumerate(self.vocabulary):
+            trigrams = get_trigrams(word)
+            self.word_trigram_counts[word_index] = len(trigrams)
+            for trigram in trigrams:
+                trigram_keys.append(trigram_ids.setdefault(trigram, len(trigram_ids)))
+                trigram_words.append(word_index)
+        self.trigram_ids = trigram_ids
+        self.trigram_offsets, self.trigram_words = build_postings(
+            np.asarray(trigram_keys, dtype=np.int64),
+            np.asarray(trigram_words, dtype=np.int64),
+            len(trigram_ids),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def find_row(self, organization_id: int) -> int | None:
+        row = int(np.searchsorted(self.ids, organization_id))
+        if row < len(self.ids) and self.ids[row] == organization_id:
+            return row
+        return None
+
+    def prefix_rows(self, normalized: str) -> np.ndarray:
+        start = bisect_left(self.name_order, normalized, key=self.names.__getitem__)
+        stop = bisect_right(
+            self.name_order,
+            normalized,
+            lo=start,
+            key=lambda row: self.names[row][: len(normalized)],
+        )
+        return self.name_order[start:stop]
+
+    def get_word_range(self, token: str) -> tuple[int, int]:
+        """Vocabulary slice of the words starting with ``token``."""
+        start = bisect_left(self.vocabulary, token)
+        stop = bisect_right(
+            self.vocabulary, token, lo=start, key=lambda word: word[: len(token)]
+        )
+        return start, stop
+
+    def get_similar_words(
+        self, token: str, threshold: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Vocabulary indices with a trigram similarity of at least
+        ``threshold`` to ``token``, and the similarities."""
+        trigrams = get_trigrams(token)
+        postings = [
+            self.trigram_words[
+                self.trigram_offsets[trigram_id] : self.trigram_offsets[trigram_id + 1]
+            ]
+            for trigram_id in map(self.trigram_ids.get, trigrams)
+            if trigram_id is not None
+        ]
+        if not postings:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.vocabulary))
+        # similarity <= shared / len(trigrams), so words sharing fewer
+        # trigrams cannot reach the threshold.
+        words = np.flatnonzero(shared >= max(math.ceil(threshold * len(trigrams)), 1))
+        shared = shared[words]
+        scores = shared / (len(trigrams) + self.word_trigram_counts[words] - shared)
+        keep = scores >= threshold
+        return words[keep], scores[keep]
+
+    def match_token(self, token: str, threshold: float) -> np.ndarray:
+        """Score of every row for ``token`` in ``SCORE_SCALE`` units: full when
+        a word starts with it, otherwise the best similarity of its words, 0
+        below ``threshold``."""
+        scores = np.zeros(len(self), dtype=np.uint16)
+        words, similarities = self.get_similar_words(token, threshold)
+        similarities = np.rint(similarities * SCORE_SCALE).astype(np.uint16)
+        # Ascending, so a row keeps the score of its most similar word.
+        for word, similarity in sorted(
+            zip(words.tolist(), similarities.tolist()), key=itemgetter(1)
+        ):
+            scores[self.word_rows[self.word_offsets[word] : self.word_offsets[word + 1]]] = (
+                similarity
+            )
+        start, stop = self.get_word_range(token)
+        scores[self.word_rows[self.word_offsets[start] : self.word_offsets[stop]]] = (
+            SCORE_SCALE
+        )
+        return scores
+
+
+def get_ranked(
+    segment: NameSegment, kind: int, rows: np.ndarray, scores: np.ndarray
+) -> list[tuple[int, float, int, int]]:
+    return [
+        (kind, -score, length, organization_id)
+        for organization_id, score, length in zip(
+            segment.ids[rows].tolist(), scores.tolist(), segment.lengths[rows].tolist()
+        )
+    ]
+
+
+def build_segment(ids: np.ndarray, names: list[str]) -> NameSegment:
+    ids = np.asarray(ids, dtype=np.int64)
+    order = np.argsort(ids, kind="stable")
+    return NameSegment(ids[order], [names[row] for row in order.tolist()])
+
+
+def get_smallest(rows: np.ndarray, keys: np.ndarray, limit: int) -> np.ndarray:
+    if len(rows) > limit:
+        part = np.argpartition(keys, limit - 1)[:limit]
+        rows, keys = rows[part], keys[part]
+    return rows[np.argsort(keys, kind="stable")]
+
+
+@dataclass(eq=False)
+class OrganizationNameIndex:
+    """In-memory index for ranked, typo-tolerant organization name search.
+
+    Matches are ranked by kind: names starting with the query, names where
+    every query word starts one of their words, then fuzzy matches. A name
+    scores the mean over query words of its best matching word, 1 for a word
+    starting with the query word and the trigram similarity otherwise; fuzzy
+    matches need at least ``similarity_threshold``. Ties go to shorter names.
+
+    Changes picked up by ``refresh`` go to a small delta segment searched the
+    same way; once it holds ``max_delta_size`` names everything is rebuilt
+    into one segment in a worker thread.
+    """
+
+    similarity_threshold: float = 0.3
+    max_delta_size: int = 1000
+    watermark: datetime | None = field(default=None, init=False)
+
+    def __post_init__(self):
+        self._replace(build_segment(np.empty(0, dtype=np.int64), []))
+        self._refresh_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return (
+            len(self._segment)
+            - int(np.count_nonzero(self._removed))
+            + len(self._delta_segment)
+        )
+
+    def _replace(self, segment: NameSegment) -> None:
+        self._segment = segment
+        self._removed = np.zeros(len(segment), dtype=bool)
+        self._delta_segment = build_segment(np.empty(0, dtype=np.int64), [])
+
+    def build(self, ids: np.ndarray, names: list[str]) -> None:
+        self._replace(build_segment(ids, [normalize_name(name) for name in names]))
+
+    def upsert(self, ids: list[int], names: list[str]) -> None:
+        delta = dict(zip(self._delta_segment.ids.tolist(), self._delta_segment.names))
+        for organization_id, name in zip(ids, names):
+            normalized = normalize_name(name)
+            row = self._segment.find_row(organization_id)
+            if row is not None and self._segment.names[row] == normalized:
+                self._removed[row] = False
+                delta.pop(organization_id, None)
+                continue
+            if row is not None:
+                self._removed[row] = True
+            delta[organization_id] = normalized
+        self._delta_segment = build_segment(
+            np.fromiter(delta, dtype=np.int64, count=len(delta)), list(delta.values())
+        )
+
+    async def compact(self) -> None:
+        live_rows = np.flatnonzero(~self._removed)
+        ids = np.concatenate([self._segment.ids[live_rows], self._delta_segment.ids])
+        names = [self._segment.names[row] for row in live_rows.tolist()]
+        names.extend(self._delta_segment.names)
+        self._replace(await asyncio.to_thread(build_segment, ids, names))
+
+    def search(self, query: str, limit: int) -> list[SearchMatch]:
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        delta_segment = self._delta_segment
+        ranked = self._search_segment(self._segment, self._removed, normalized, limit)
+        ranked += self._search_segment(
+            delta_segment, np.zeros(len(delta_segment), dtype=bool), normalized, limit
+        )
+        ranked.sort()
+        return [
+            SearchMatch(id=organization_id, score=-negative_score)
+            for _, negative_score, _, organization_id in ranked[:limit]
+        ]
+
+    def _search_segment(
+        self, segment: NameSegment, removed: np.ndarray, normalized: str, limit: int
+    ) -> list[tuple[int, float, int, int]]:
+        """Best ``limit`` matches of one segment as (kind, -score, length, id)."""
+        if not len(segment):
+            return []
+        tokens = normalized.split()
+        taken = segment.prefix_rows(normalized)
+        taken = taken[~removed[taken]]
+        rows = get_smallest(taken, segment.lengths[taken] << 32 | taken, limit)
+        ranked = get_ranked(segment, PREFIX, rows, np.ones(len(rows)))
+        if len(ranked) >= limit:
+            return ranked
+
+        # Scores are summed over tokens, so a name gets the full score exactly
+        # when every token starts one of its words.
+        scores = segment.match_token(tokens[0], self.similarity_threshold)
+        for token in tokens[1:]:
+            scores += segment.match_token(token, self.similarity_threshold)
+        scores[taken] = 0
+        if removed.any():
+            scores[removed] = 0
+        full_score = SCORE_SCALE * len(tokens)
+        rows = np.flatnonzero(
+            scores >= math.ceil(self.similarity_threshold * full_score)
+        )
+        scores = scores[rows].astype(np.int64)
+        word_prefix = scores == full_score
+        word_prefix_rows = rows[word_prefix]
+        word_prefix_rows = get_smallest(
+            word_prefix_rows,
+            segment.lengths[word_prefix_rows] << 32 | word_prefix_rows,
+            limit,
+        )
+        ranked += get_ranked(
+            segment, WORD_PREFIX, word_prefix_rows, np.ones(len(word_prefix_rows))
+        )
+        if len(ranked) >= limit:
+            return ranked
+
+        rows, scores = rows[~word_prefix], scores[~word_prefix]
+        # Best score first, then shorter names, then lower ids.
+        order = get_smallest(
+            np.arange(len(rows)),
+            (full_score - scores) << 40 | segment.lengths[rows] << 32 | rows,
+            limit,
+        )
+        rows, scores = rows[order], np.round(scores[order] / full_score, 3)
+        return ranked + get_ranked(segment, FUZZY, rows, scores)
+
+    async def load(self, session: AsyncSession) -> None:
+        rows, watermark = await select_changed_since(
+            session,
+            select(Organization.id, Organization.name),
+            Organization.updated_at,
+            None,
+        )
+        ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+        names = [normalize_name(row.name) for row in rows]
+        self._replace(await asyncio.to_thread(build_segment, ids, names))
+        self.watermark = watermark
+        logger.info("Organization name index loaded with %s organizations", len(self))
+
+    async def refresh(self, session: AsyncSession) -> None:
+        async with self._refresh_lock:
+            if self.watermark is None:
+                await self.load(session)
+                return
+
+            rows, watermark = await select_changed_since(
+                session,
+                select(Organization.id, Organization.name),
+                Organization.updated_at,
+                self.watermark,
+            )
+            if rows:
+                self.upsert([row.id for row in rows], [row.name for row in rows])
+            self.watermark = watermark
+
+            organizations_count = await session.scalar(
+                select(func.count(Organization.id))
+            )
+            if organizations_count != len(self):
+                await self.load(session)
+            elif len(self._delta_segment) >= self.max_delta_size:
+                await self.compact()
+
+    async def run_refresh_loop(
+        self, async_client: AsyncPostgresClient, interval_seconds: float
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                async with async_client.create_session() as session:
+                    await self.refresh(session)
+            except Exception:
+                logger.exception("Organization name index refresh failed")
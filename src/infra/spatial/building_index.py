@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.common.distance import DistancePrecision, distances_km, get_bounding_box
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.db.horizon import select_changed_since
+from src.infra.models.models import Building
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(eq=False)
+class BuildingSpatialIndex:
+    """Uniform lat/lon grid over building coordinates.
+
+    Rows are kept sorted by grid cell, so every latitude band of a query
+    resolves to one contiguous slice via ``np.searchsorted``.
+    """
+
+    cell_size_deg: float = 0.1
+    watermark: datetime | None = field(default=None, init=False)
+
+    def __post_init__(self):
+        self._lat_cells = math.ceil(180 / self.cell_size_deg)
+        self._lon_cells = math.ceil(360 / self.cell_size_deg)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._latitudes = np.empty(0, dtype=np.float64)
+        self._longitudes = np.empty(0, dtype=np.float64)
+        self._cells = np.empty(0, dtype=np.int64)
+        self._refresh_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _lat_cell(self, latitude):
+        return np.clip(
+            np.floor((np.asarray(latitude) + 90) / self.cell_size_deg).astype(np.int64),
+            0,
+            self._lat_cells - 1,
+        )
+
+    def _lon_cell(self, longitude):
+        return np.clip(
+            np.floor((np.asarray(longitude) + 180) / self.cell_size_deg).astype(
+                np.int64
+            ),
+            0,
+            self._lon_cells - 1,
+        )
+
+    def build(
+        self, ids: np.ndarray, latitudes: np.ndarray, longitudes: np.ndarray
+    ) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        cells = self._lat_cell(latitudes) * self._lon_cells + self._lon_cell(longitudes)
+        order = np.argsort(cells, kind="stable")
+        self._ids = ids[order]
+        self._latitudes = latitudes[order]
+        self._longitudes = longitudes[order]
+        self._cells = cells[order]
+
+    def upsert(
+        self, ids: np.ndarray, latitudes: np.ndarray, longitudes: np.ndarray
+    ) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        keep = ~np.isin(self._ids, ids)
+        self.build(
+            np.concatenate([self._ids[keep], ids]),
+            np.concatenate([self._latitudes[keep], latitudes]),
+            np.concatenate([self._longitudes[keep], longitudes]),
+        )
+
+    def _candidate_rows(
+        self, latitude: float, longitude: float, radius_km: float
+    ) -> np.ndarray:
+        min_lat, max_lat, lon_ranges = get_bounding_box(latitude, longitude, radius_km)
+        if lon_ranges is None:
+            lon_cell_ranges = [(0, self._lon_cells - 1)]
+        else:
+            lon_cell_ranges = [
+                (int(self._lon_cell(min_lon)), int(self._lon_cell(max_lon)))
+                for min_lon, max_lon in lon_ranges
+            ]
+
+        lat_rows = np.arange(
+            int(self._lat_cell(min_lat)), int(self._lat_cell(max_lat)) + 1, dtype=np.int64
+        )
+        slices = []
+        for first_lon, last_lon in lon_cell_ranges:
+            starts = np.searchsorted(
+                self._cells, lat_rows * self._lon_cells + first_lon, side="left"
+            )
+            stops = np.searchsorted(
+                self._cells, lat_rows * self._lon_cells + last_lon, side="right"
+            )
+            slices.extend(
+                np.arange(start, stop)
+                for start, stop in zip(starts.tolist(), stops.tolist())
+                if stop > start
+            )
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def query(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        precision: DistancePrecision = DistancePrecision.HAVERSINE,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        rows = self._candidate_rows(
+            latitude, longitude, radius_km * (1 + precision.relative_tolerance)
+        )
+        distances = distances_km(
+            latitude,
+            longitude,
+            self._latitudes[rows],
+            self._longitudes[rows],
+            precision=precision,
+        )
+        mask = distances <= radius_km
+        return self._ids[rows[mask]], distances[mask]
+
+    async def load(self, session: AsyncSession) -> None:
+        rows, watermark = await select_changed_since(
+            session,
+            select(Building.id, Building.latitude, Building.longitude),
+            Building.updated_at,
+            None,
+        )
+        self.build(
+            np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+            np.fromiter((row.latitude for row in rows), dtype=np.float64, count=len(rows)),
+            np.fromiter((row.longitude for row in rows), dtype=np.float64, count=len(rows)),
+        )
+        self.watermark = watermark
+        logger.info("Building spatial index loaded with %s buildings", len(self))
+
+    async def refresh(self, session: AsyncSession) -> None:
+        async with self._refresh_lock:
+            if self.watermark is None:
+                await self.load(session)
+                return
+
+            rows, watermark = await select_changed_since(
+                session,
+                select(Building.id, Building.latitude, Building.longitude),
+                Building.updated_at,
+                self.watermark,
+            )
+            if rows:
+                self.upsert(
+                    np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+                    np.fromiter(
+                        (row.latitude for row in rows), dtype=np.float64, count=len(rows)
+                    ),
+                    np.fromiter(
+                        (row.longitude for row in rows), dtype=np.float64, count=len(rows)
+                    ),
+                )
+            self.watermark = watermark
+
+            buildings_count = await session.scalar(select(func.count(Building.id)))
+            if buildings_count != len(self):
+                await self.load(session)
+
+    async def run_refresh_loop(
+        self, async_client: AsyncPostgresClient, interval_seconds: float
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                async with async_client.create_session() as session:
+                    await self.refresh(session)
+            except Exception:
+                logger.exception("Building spatial index refresh failed")
@@ -0,0 +1,47 @@
+import hashlib
+from dataclasses import dataclass
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.common.converters.model_converters import convert_to_activity_trees
+from src.common.metrics import SERIALIZATION_SECONDS
+from src.domain.schemas.activity import (
+    ActivityTreeQuerySchema,
+    ActivityTreeSchema,
+    ActivityTreeVersionSchema,
+)
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.repos.activity_repo import ActivityRepository
+from src.logic.repo_services.cache import ResponseCache, cached, ACTIVITIES_NAMESPACE
+from src.logic.repo_services.single_flight import SingleFlight
+
+
+@dataclass(eq=False)
+class ActivityService:
+    repository: ActivityRepository
+    async_client: AsyncPostgresClient
+    cache: ResponseCache | None = None
+    single_flight: SingleFlight | None = None
+
+    @cached(ACTIVITIES_NAMESPACE)
+    async def get_activity_tree(
+        self, tree_schema: ActivityTreeQuerySchema
+    ) -> ActivityTreeVersionSchema:
+        async with self.async_client.create_session(read_only=True) as session:
+            try:
+                rows = await self.repository.get_activity_tree(
+                    session=session,
+                    data=tree_schema.to_dict_without_none_values(),
+                    max_depth=tree_schema.max_depth,
+                )
+            except SQLAlchemyError as e:
+                await session.rollback()
+                raise e
+        with SERIALIZATION_SECONDS.time("activity_tree"):
+            trees = convert_to_activity_trees(rows)
+            return ActivityTreeVersionSchema(version=get_trees_version(trees), items=trees)
+
+
+def get_trees_version(trees: list[ActivityTreeSchema]) -> str:
+    payload = b"[" + b",".join(tree.model_dump_json().encode() for tree in trees) + b"]"
+    return hashlib.sha1(payload).hexdigest()
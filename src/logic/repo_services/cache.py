@@ -0,0 +1,119 @@
+import inspect
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import partial, wraps
+from typing import Any, Awaitable, Callable
+
+from pydantic import BaseModel
+
+from src.common.metrics import REGISTRY
+from src.infra.cache.backends import CacheBackend, MISSING
+
+ORGANIZATIONS_NAMESPACE = "organizations"
+ACTIVITIES_NAMESPACE = "activities"
+BUILDINGS_NAMESPACE = "buildings"
+
+CACHE_SECONDS = REGISTRY.histogram(
+    "cache_operation_duration_seconds",
+    "Time spent in the response cache backend",
+    ("namespace", "operation"),
+)
+
+
+@dataclass(eq=False)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+
+def make_cache_key(namespace: str, name: str, params: dict[str, Any]) -> str:
+    normalized = {
+        key: value.model_dump() if isinstance(value, BaseModel) else value
+        for key, value in params.items()
+    }
+    return "{}:{}:{}".format(
+        namespace, name, json.dumps(normalized, sort_keys=True, default=str)
+    )
+
+
+@dataclass(eq=False)
+class ResponseCache:
+    backend: CacheBackend
+    ttls: dict[str, float] = field(default_factory=dict)
+    default_ttl: float = 60
+    stats: dict[str, CacheStats] = field(
+        default_factory=lambda: defaultdict(CacheStats), init=False
+    )
+
+    async def get(self, namespace: str, key: str) -> Any:
+        with CACHE_SECONDS.time(namespace, "get"):
+            value = await self.backend.get(key)
+        if value is not MISSING:
+            self.stats[namespace].hits += 1
+        return value
+
+    async def load(
+        self, namespace: str, key: str, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        self.stats[namespace].misses += 1
+        value = await loader()
+        with CACHE_SECONDS.time(namespace, "set"):
+            await self.backend.set(key, value, self.ttls.get(namespace, self.default_ttl))
+        return value
+
+    async def get_or_load(
+        self, namespace: str, key: str, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        value = await self.get(namespace, key)
+        if value is not MISSING:
+            return value
+        return await self.load(namespace, key, loader)
+
+    async def invalidate(self, *namespaces: str) -> None:
+        if not namespaces:
+            await self.backend.clear()
+            return
+        for namespace in namespaces:
+            await self.backend.delete_prefix(f"{namespace}:")
+
+
+def cached(namespace: str):
+    """Caches a service method by its bound arguments when ``self.cache`` is
+    set, and shares concurrent misses through ``self.single_flight`` when that
+    is set.
+
+    When the service has a ``directory_version``, it is part of the key, so a
+    response tagged with that version never comes from older cached data.
+    """
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            cache, single_flight = self.cache, self.single_flight
+            if cache is None and single_flight is None:
+                return await method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            params.pop("self")
+            key = make_cache_key(namespace, method.__name__, params)
+            version = getattr(self, "directory_version", None)
+            if version is not None:
+                key = f"{key}:{version}"
+
+            loader = partial(method, self, *args, **kwargs)
+            if cache is not None:
+                value = await cache.get(namespace, key)
+                if value is not MISSING:
+                    return value
+                loader = partial(cache.load, namespace, key, loader)
+            if single_flight is not None:
+                return await single_flight.do(namespace, key, loader)
+            return await loader()
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from sqlalchemy import Row
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.common.metrics import SERIALIZATION_SECONDS
+from src.domain.schemas.change import ChangeFeedQuerySchema
+from src.domain.schemas.pagination import InvalidCursorError, encode_cursor, decode_cursor
+from src.infra.db.db import AsyncPostgresClient
+from src.infra.repos.change_repo import ChangePosition, ChangeRepository
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+@dataclass(eq=False)
+class ChangeService:
+    """Pages through changes to the directory tables in commit-safe order.
+
+    Reads go to the primary: the horizon comes from its open transactions,
+    which a replica can't see.
+    """
+
+    repository: ChangeRepository
+    async_client: AsyncPostgresClient
+
+    async def get_changes(self, change_schema: ChangeFeedQuerySchema) -> bytes:
+        after = get_start_position(change_schema)
+        async with self.async_client.create_session() as session:
+            try:
+                # The horizon has to be read before the changes: a transaction
+                # that commits in between is then either visible to the
+                # second statement or still holding the horizon back.
+                horizon = await self.repository.get_horizon(session=session)
+                rows = await self.repository.get_changes(
+                    session=session,
+                    after=after,
+                    horizon=horizon,
+                    limit=change_schema.limit + 1,
+                )
+            except SQLAlchemyError as e:
+                await session.rollback()
+                raise e
+        with SERIALIZATION_SECONDS.time("changes"):
+            return build_change_feed(rows, change_schema.limit, after)
+
+
+def encode_position(position: ChangePosition) -> str:
+    return encode_cursor(
+        (position.changed_at - EPOCH) // MICROSECOND,
+        position.rank,
+        position.key,
+        position.subkey,
+    )
+
+
+def decode_position(cursor: str) -> ChangePosition:
+    values = decode_cursor(cursor, 4)
+    if not all(isinstance(value, int) for value in values):
+        raise InvalidCursorError("Invalid cursor")
+    microseconds, rank, key, subkey = values
+    try:
+        changed_at = EPOCH + microseconds * MICROSECOND
+    except OverflowError as e:
+        raise InvalidCursorError("Invalid cursor") from e
+    return ChangePosition(changed_at, rank, key, subkey)
+
+
+def get_start_position(change_schema: ChangeFeedQuerySchema) -> ChangePosition | None:
+    if change_schema.cursor is not None:
+        return decode_position(change_schema.cursor)
+    if change_schema.since is None:
+        return None
+    since = change_schema.since
+    if since.tzinfo is not None:
+        # Timestamps are stored without a zone, in the database's UTC.
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    # A rank below every table's puts the position before all changes at
+    # ``since``.
+    return ChangePosition(since, -1, 0, 0)
+
+
+def build_change_feed(rows: list[Row], limit: int, after: ChangePosition | None) -> bytes:
+    """Joins payloads built by Postgres into a page body without decoding them.
+
+    ``next_cursor`` is set even on the last page, so a sync client polls with
+    it for changes made later.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        last = rows[-1]
+        after = ChangePosition(last.changed_at, last.rank, last.key, last.subkey)
+    next_cursor = encode_position(after) if after is not None else None
+    items = ",".join(row.payload for row in rows).encode()
+    return (
+        b'{"items":[' + items
+        + b'],"next_cursor":' + orjson.dumps(next_cursor)
+        + b',"has_more":' + orjson.dumps(has_more) + b"}"
+    )
@@ -1,102 +1,554 @@
+from __future__ import annotations
+
+import hashlib
 from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, Callable
 
+import orjson
+from sqlalchemy import Row, Select
 from sqlalchemy.exc import SQLAlchemyError
 
 from src.common.converters.model_converters import (
     convert_to_organization_entity,
-    convert_to_organization_entity_from_dict,
+    convert_to_organization_distance_entity,
+    convert_to_organization_dict,
+    convert_to_organization_distance_dict,
+    convert_to_organization_search_entity,
+    convert_to_organization_search_dict,
 )
+from src.common.distance import DistancePrecision
+from src.common.metrics import SERIALIZATION_SECONDS
+from src.common.text_search import SearchMatch, normalize_name
 from src.domain.schemas.activity import ActivityQuerySchema
 from src.domain.schemas.organization import (
     OrganizationQuerySchema,
+    OrganizationBatchQuerySchema,
+    OrganizationBatchSchema,
     FullOutOrganizationSchema,
+    OrganizationDistanceSchema,
+    OrganizationSearchQuerySchema,
+    OrganizationSearchResultSchema,
+)
+from src.domain.schemas.pagination import (
+    PaginationQuerySchema,
+    PageSchema,
+    encode_cursor,
+    decode_cursor,
 )
 from src.infra.db.db import AsyncPostgresClient
-from src.infra.repos.organization_repo import OrganizationRepository
+from src.infra.models.models import Organization
+from src.infra.repos.organization_repo import (
+    OrganizationRepository,
+    paginate_by_id,
+    paginate_by_distance,
+)
+from src.logic.repo_services.cache import (
+    ResponseCache,
+    cached,
+    ORGANIZATIONS_NAMESPACE,
+    ACTIVITIES_NAMESPACE,
+    BUILDINGS_NAMESPACE,
+)
+from src.logic.repo_services.single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    # Both indexes need numpy, which is only imported once one is enabled.
+    from src.infra.search.name_index import OrganizationNameIndex
+    from src.infra.spatial.building_index import BuildingSpatialIndex
 
 
 @dataclass(eq=False)
 class OrganizationService:
     repository: OrganizationRepository
     async_client: AsyncPostgresClient
+    building_index: BuildingSpatialIndex | None = None
+    # Without it search falls back to prefix matching in SQL, with no typo
+    # tolerance.
+    name_index: OrganizationNameIndex | None = None
+    distance_precision: DistancePrecision = DistancePrecision.HAVERSINE
+    cache: ResponseCache | None = None
+    single_flight: SingleFlight | None = None
+    stream_chunk_size: int = 500
+    # Build plain dicts instead of schemas for list responses, see
+    # ``convert_to_organization_dict``.
+    fast_serialization: bool = False
+    # Let Postgres build the JSON payloads and forward them as bytes, see
+    # ``get_organization_json_expression``. Takes precedence over
+    # ``fast_serialization``.
+    json_projection: bool = False
+    # Set by ``get_directory_version``; cached responses are keyed by it.
+    directory_version: str | None = None
+
+    async def invalidate_cache(self, *namespaces: str) -> None:
+        if self.cache is not None:
+            await self.cache.invalidate(*namespaces)
 
+    async def get_directory_version(self) -> str:
+        """A version of every directory table, changed by each committed write.
+
+        One primary key scan over a few rows, so it is cheap enough to check
+        on every request before loading anything.
+        """
+        async with self.async_client.create_session(read_only=True) as session:
+            try:
+                versions = await self.repository.get_directory_versions(session=session)
+            except SQLAlchemyError as e:
+                await session.rollback()
+                raise e
+        payload = ",".join(f"{table}:{version}" for table, version in versions)
+        self.directory_version = hashlib.sha1(payload.encode()).hexdigest()
+        return self.directory_version
+
+    @cached(ORGANIZATIONS_NAMESPACE)
     async def get_organization_by_entity(
         self, organization_entity: OrganizationQuerySchema
-    ) -> FullOutOrganizationSchema | None:
-        async with self.async_client.create_session() as session:
+    ) -> FullOutOrganizationSchema | bytes | None:
+        async with self.async_client.create_session(read_only=True) as session:
             try:
                 result = await self.repository.get_organization_by_entity(
                     session=session,
                     data=organization_entity.to_dict_without_none_values(),
+                    as_json=self.json_projection,
                 )
+                if result and self.json_projection:
+                    return result.encode()
                 if result:
                     return convert_to_organization_entity(result)
             except SQLAlchemyError as e:
                 await session.rollback()
                 raise e
 
-    async def get_organizations_from_building_id(self, building_id: int):
-        async with self.async_client.create_session() as session:
+    @cached(ORGANIZATIONS_NAMESPACE)
+    async def get_organizations_batch(
+        self, batch_schema: OrganizationBatchQuerySchema
+    ) -> OrganizationBatchSchema | dict | bytes:
+        ids = batch_schema.get_unique_ids()
+        names = batch_schema.get_unique_names()
+        async with self.async_client.create_session(read_only=True) as session:
             try:
-                results = await self.repository.get_organizations_from_building_id(
-                    session=session, building_id=building_id
+                results = await self.repository.get_organizations_by_ids_or_names(
+                    session=session, ids=ids, names=names, as_json=self.json_projection
                 )
-                if results:
-                    return [
-                        convert_to_organization_entity(result) for result in results
+                with SERIALIZATION_SECONDS.time("batch"):
+                    if self.json_projection:
+                        return build_json_batch(results, ids, names)
+                    return build_batch(
+                        results, ids, names, as_dict=self.fast_serialization
+                    )
+            except SQLAlchemyError as e:
+                await session.rollback()
+                raise e
+
+    async def search_organizations(
+        self, search_schema: OrganizationSearchQuerySchema
+    ) -> OrganizationSearchResultSchema | dict | bytes:
+        normalized = normalize_name(search_schema.q)
+        matches = []
+        if self.name_index is not None:
+            matches = self.name_index.search(normalized, search_schema.limit)
+        if not normalized or (self.name_index is not None and not matches):
+            return self._build_search_results([])
+
+        async with self.async_client.create_session(read_only=True) as session:
+            try:
+                if self.name_index is None:
+                    organization_ids = await self.repository.search_organization_ids(
+                        session=session, normalized=normalized, limit=search_schema.limit
+                    )
+                    matches = [
+                        SearchMatch(id=organization_id, score=1.0)
+                        for organization_id in organization_ids
                     ]
+                results = await self.repository.get_organizations_by_ranks(
+                    session=session,
+                    organization_ids=[match.id for match in matches],
+                    scores=[match.score for match in matches],
+                    as_json=self.json_projection,
+                )
+                return self._build_search_results(results)
             except SQLAlchemyError as e:
                 await session.rollback()
                 raise e
 
+    @cached(BUILDINGS_NAMESPACE)
+    async def get_organizations_from_building_id(
+        self, building_id: int, pagination: PaginationQuerySchema
+    ) -> PageSchema[FullOutOrganizationSchema] | dict | bytes:
+        after_id = get_after_id(pagination)
+        async with self.async_client.create_session(read_only=True) as session:
+            try:
+                results = await self.repository.get_organizations_from_building_id(
+                    session=session,
+                    building_id=building_id,
+                    limit=pagination.limit,
+                    after_id=after_id,
+                    as_json=self.json_projection,
+                )
+                return self._build_page_by_id(results, pagination.limit)
+            except SQLAlchemyError as e:
+                await session.rollback()
+                raise e
+
+    @cached(ACTIVITIES_NAMESPACE)
     async def get_organizations_by_activity(
-        self, activity_schema: ActivityQuerySchema
-    ) -> list[FullOutOrganizationSchema] | None:
-        async with self.async_client.create_session() as session:
+        self, activity_schema: ActivityQuerySchema, pagination: PaginationQuerySchema
+    ) -> PageSchema[FullOutOrganizationSchema] | dict | bytes:
+        after_id = get_after_id(pagination)
+        async with self.async_client.create_session(read_only=True) as session:
             try:
                 results = await self.repository.get_organizations_by_activity(
-                    session=session, data=activity_schema.to_dict_without_parent()
+                    session=session,
+                    data=activity_schema.to_dict_without_parent(),
+                    limit=pagination.limit,
+                    after_id=after_id,
+                    as_json=self.json_projection,
                 )
-                if results:
-                    return [
-                        convert_to_organization_entity(result) for result in results
-                    ]
+                return self._build_page_by_id(results, pagination.limit)
             except SQLAlchemyError as e:
                 await session.rollback()
                 raise e
 
+    @cached(BUILDINGS_NAMESPACE)
     async def get_organizations_in_radius(
-        self, latitude: float, longitude: float, radius_km: float
-    ) -> list[FullOutOrganizationSchema] | None:
-        async with self.async_client.create_session() as session:
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        pagination: PaginationQuerySchema,
+    ) -> PageSchema[OrganizationDistanceSchema] | dict | bytes:
+        after = get_after_distance(pagination)
+        if self.building_index is not None:
+            building_ids, distances = self.building_index.query(
+                latitude=latitude,
+                longitude=longitude,
+                radius_km=radius_km,
+                precision=self.distance_precision,
+            )
+            if not len(building_ids):
+                return self._build_page_by_distance([], pagination.limit)
+
+        async with self.async_client.create_session(read_only=True) as session:
             try:
-                results = await self.repository.get_organizations_in_radius(
-                    session=session,
-                    latitude=latitude,
-                    longitude=longitude,
-                    radius_km=radius_km,
-                )
-                if results:
-                    return [
-                        convert_to_organization_entity(result) for result in results
-                    ]
+                if self.building_index is not None:
+                    results = await self.repository.get_organizations_by_building_distances(
+                        session=session,
+                        building_ids=building_ids.tolist(),
+                        distances=distances.tolist(),
+                        limit=pagination.limit,
+                        after=after,
+                        as_json=self.json_projection,
+                    )
+                else:
+                    results = await self.repository.get_organizations_in_radius(
+                        session=session,
+                        latitude=latitude,
+                        longitude=longitude,
+                        radius_km=radius_km,
+                        limit=pagination.limit,
+                        after=after,
+                        precision=self.distance_precision,
+                        as_json=self.json_projection,
+                    )
+                return self._build_page_by_distance(results, pagination.limit)
             except SQLAlchemyError as e:
                 await session.rollback()
                 raise e
 
+    @cached(ACTIVITIES_NAMESPACE)
     async def get_organizations_by_activity_tree(
-        self, activity_schema: ActivityQuerySchema
-    ) -> list[FullOutOrganizationSchema] | None:
-        async with self.async_client.create_session() as session:
+        self, activity_schema: ActivityQuerySchema, pagination: PaginationQuerySchema
+    ) -> PageSchema[FullOutOrganizationSchema] | dict | bytes:
+        after_id = get_after_id(pagination)
+        async with self.async_client.create_session(read_only=True) as session:
             try:
                 results = await self.repository.get_organizations_by_activity_tree(
-                    session=session, data=activity_schema.to_dict_without_parent()
+                    session=session,
+                    data=activity_schema.to_dict_without_parent(),
+                    limit=pagination.limit,
+                    after_id=after_id,
+                    as_json=self.json_projection,
                 )
-                if results:
-                    return [
-                        convert_to_organization_entity_from_dict(result)
-                        for result in results
-                    ]
+                return self._build_page_by_id(results, pagination.limit)
             except SQLAlchemyError as e:
                 await session.rollback()
                 raise e
+
+    async def stream_organizations_from_building_id(
+        self, building_id: int
+    ) -> AsyncIterator[bytes]:
+        query = paginate_by_id(
+            self.repository.select_organizations_from_building_id(
+                building_id, as_json=self.json_projection
+            ),
+            Organization.id,
+            limit=None,
+        )
+        async for chunk in self._stream_ndjson(query):
+            yield chunk
+
+    async def stream_organizations_by_activity(
+        self, activity_schema: ActivityQuerySchema
+    ) -> AsyncIterator[bytes]:
+        query = paginate_by_id(
+            self.repository.select_organizations_by_activity(
+                activity_schema.to_dict_without_parent(), as_json=self.json_projection
+            ),
+            Organization.id,
+            limit=None,
+        )
+        async for chunk in self._stream_ndjson(query):
+            yield chunk
+
+    async def stream_organizations_by_activity_tree(
+        self, activity_schema: ActivityQuerySchema
+    ) -> AsyncIterator[bytes]:
+        query = paginate_by_id(
+            self.repository.select_organizations_by_activity_tree(
+                activity_schema.to_dict_without_parent(), as_json=self.json_projection
+            ),
+            Organization.id,
+            limit=None,
+        )
+        async for chunk in self._stream_ndjson(query):
+            yield chunk
+
+    async def stream_organizations_in_radius(
+        self, latitude: float, longitude: float, radius_km: float
+    ) -> AsyncIterator[bytes]:
+        if self.building_index is not None:
+            building_ids, distances = self.building_index.query(
+                latitude=latitude,
+                longitude=longitude,
+                radius_km=radius_km,
+                precision=self.distance_precision,
+            )
+            if not len(building_ids):
+                return
+            query, distance = self.repository.select_organizations_by_building_distances(
+                building_ids.tolist(), distances.tolist(), as_json=self.json_projection
+            )
+        else:
+            query, distance = self.repository.select_organizations_in_radius(
+                latitude,
+                longitude,
+                radius_km,
+                self.distance_precision,
+                as_json=self.json_projection,
+            )
+        query = paginate_by_distance(query, distance, Organization.id, limit=None)
+        async for chunk in self._stream_ndjson(query, with_distance=True):
+            yield chunk
+
+    async def _stream_ndjson(
+        self, query: Select, with_distance: bool = False
+    ) -> AsyncIterator[bytes]:
+        serialize = get_ndjson_serializer(
+            with_distance, self.fast_serialization, self.json_projection
+        )
+        async with self.async_client.create_session(read_only=True) as session:
+            try:
+                async for rows in self.repository.stream(
+                    session=session, query=query, chunk_size=self.stream_chunk_size
+                ):
+                    yield b"".join(serialize(row) for row in rows)
+            except SQLAlchemyError as e:
+                await session.rollback()
+                raise e
+
+    @SERIALIZATION_SECONDS.time("page_by_id")
+    def _build_page_by_id(
+        self, results: list, limit: int
+    ) -> PageSchema[FullOutOrganizationSchema] | dict | bytes:
+        if self.json_projection:
+            return build_json_page(results, limit)
+        return build_page_by_id(results, limit, as_dict=self.fast_serialization)
+
+    @SERIALIZATION_SECONDS.time("page_by_distance")
+    def _build_page_by_distance(
+        self, results: list, limit: int
+    ) -> PageSchema[OrganizationDistanceSchema] | dict | bytes:
+        if self.json_projection:
+            return build_json_page(results, limit, with_distance=True)
+        return build_page_by_distance(results, limit, as_dict=self.fast_serialization)
+
+    @SERIALIZATION_SECONDS.time("search_results")
+    def _build_search_results(
+        self, results: list
+    ) -> OrganizationSearchResultSchema | dict | bytes:
+        if self.json_projection:
+            items = ",".join(row.payload for row in results).encode()
+            return b'{"items":[' + items + b"]}"
+        return build_search_results(results, as_dict=self.fast_serialization)
+
+
+def convert_organization_row(row: Row) -> FullOutOrganizationSchema:
+    return convert_to_organization_entity(row[0])
+
+
+def convert_organization_distance_row(row: Row) -> OrganizationDistanceSchema:
+    organization, distance_km = row
+    return convert_to_organization_distance_entity(organization, distance_km)
+
+
+def get_ndjson_serializer(
+    with_distance: bool, as_dict: bool, as_json: bool = False
+) -> Callable[[Row], bytes]:
+    if as_json:
+        return lambda row: row.payload.encode() + b"\n"
+    if as_dict:
+        if with_distance:
+            convert_to_dict = convert_organization_distance_row_to_dict
+        else:
+            convert_to_dict = convert_organization_row_to_dict
+        return lambda row: orjson.dumps(
+            convert_to_dict(row), option=orjson.OPT_APPEND_NEWLINE
+        )
+    if with_distance:
+        convert = convert_organization_distance_row
+    else:
+        convert = convert_organization_row
+    return lambda row: convert(row).model_dump_json().encode() + b"\n"
+
+
+def convert_organization_row_to_dict(row: Row) -> dict:
+    return convert_to_organization_dict(row[0])
+
+
+def convert_organization_distance_row_to_dict(row: Row) -> dict:
+    organization, distance_km = row
+    return convert_to_organization_distance_dict(organization, distance_km)
+
+
+def get_after_id(pagination: PaginationQuerySchema) -> int | None:
+    if pagination.cursor is None:
+        return None
+    (after_id,) = decode_cursor(pagination.cursor, size=1)
+    return int(after_id)
+
+
+def get_after_distance(pagination: PaginationQuerySchema) -> tuple[float, int] | None:
+    if pagination.cursor is None:
+        return None
+    distance_km, after_id = decode_cursor(pagination.cursor, size=2)
+    return float(distance_km), int(after_id)
+
+
+def build_page_by_id(
+    results: list[Organization], limit: int, as_dict: bool = False
+) -> PageSchema[FullOutOrganizationSchema] | dict | bytes:
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1].id)
+    if as_dict:
+        return {
+            "items": [convert_to_organization_dict(result) for result in results],
+            "next_cursor": next_cursor,
+        }
+    return PageSchema[FullOutOrganizationSchema](
+        items=[convert_to_organization_entity(result) for result in results],
+        next_cursor=next_cursor,
+    )
+
+
+def build_page_by_distance(
+    results: list[tuple[Organization, float]], limit: int, as_dict: bool = False
+) -> PageSchema[OrganizationDistanceSchema] | dict:
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        organization, distance_km = results[-1]
+        next_cursor = encode_cursor(distance_km, organization.id)
+    if as_dict:
+        return {
+            "items": [
+                convert_to_organization_distance_dict(organization, distance_km)
+                for organization, distance_km in results
+            ],
+            "next_cursor": next_cursor,
+        }
+    return PageSchema[OrganizationDistanceSchema](
+        items=[
+            convert_to_organization_distance_entity(organization, distance_km)
+            for organization, distance_km in results
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+def build_json_page(rows: list[Row], limit: int, with_distance: bool = False) -> bytes:
+    """Joins payloads built by Postgres into a page body without decoding them."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if with_distance:
+            next_cursor = encode_cursor(rows[-1].distance_km, rows[-1].id)
+        else:
+            next_cursor = encode_cursor(rows[-1].id)
+    items = ",".join(row.payload for row in rows).encode()
+    return b'{"items":[' + items + b'],"next_cursor":' + orjson.dumps(next_cursor) + b"}"
+
+
+def get_missing(
+    found_ids: set[int], found_names: set[str], ids: list[int], names: list[str]
+) -> tuple[list[int], list[str]]:
+    return (
+        [organization_id for organization_id in ids if organization_id not in found_ids],
+        [name for name in names if name not in found_names],
+    )
+
+
+def build_batch(
+    results: list[Organization], ids: list[int], names: list[str], as_dict: bool = False
+) -> OrganizationBatchSchema | dict:
+    missing_ids, missing_names = get_missing(
+        {result.id for result in results}, {result.name for result in results}, ids, names
+    )
+    if as_dict:
+        # JSON object keys are strings; the schema path converts them the same way.
+        return {
+            "items": {
+                str(result.id): convert_to_organization_dict(result) for result in results
+            },
+            "missing_ids": missing_ids,
+            "missing_names": missing_names,
+        }
+    return OrganizationBatchSchema(
+        items={result.id: convert_to_organization_entity(result) for result in results},
+        missing_ids=missing_ids,
+        missing_names=missing_names,
+    )
+
+
+def build_json_batch(rows: list[Row], ids: list[int], names: list[str]) -> bytes:
+    missing_ids, missing_names = get_missing(
+        {row.id for row in rows}, {row.name for row in rows}, ids, names
+    )
+    items = ",".join(f'"{row.id}":{row.payload}' for row in rows).encode()
+    return (
+        b'{"items":{'
+        + items
+        + b'},"missing_ids":'
+        + orjson.dumps(missing_ids)
+        + b',"missing_names":'
+        + orjson.dumps(missing_names)
+        + b"}"
+    )
+
+
+def build_search_results(
+    results: list[tuple[Organization, float]], as_dict: bool = False
+) -> OrganizationSearchResultSchema | dict:
+    if as_dict:
+        return {
+            "items": [
+                convert_to_organization_search_dict(organization, score)
+                for organization, score in results
+            ]
+        }
+    return OrganizationSearchResultSchema(
+        items=[
+            convert_to_organization_search_entity(organization, score)
+            for organization, score in results
+        ]
+    )
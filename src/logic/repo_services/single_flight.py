@@ -0,0 +1,83 @@
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlightTimeoutError(TimeoutError):
+    pass
+
+
+@dataclass(eq=False)
+class SingleFlightStats:
+    calls: int = 0
+    coalesced: int = 0
+    timeouts: int = 0
+    cancellations: int = 0
+
+
+@dataclass(eq=False)
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+@dataclass(eq=False)
+class SingleFlight:
+    """Shares one in-flight load among concurrent callers with the same key.
+
+    The load runs in its own task, so a caller that times out or is cancelled
+    leaves it running for the others; it is cancelled only once every caller
+    has gone. Errors are raised to all callers and nothing is remembered once
+    the load finishes, caching is left to ``ResponseCache``.
+    """
+
+    timeout: float | None = None
+    stats: dict[str, SingleFlightStats] = field(
+        default_factory=lambda: defaultdict(SingleFlightStats), init=False
+    )
+
+    def __post_init__(self):
+        self._flights: dict[str, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(
+        self, namespace: str, key: str, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        stats = self.stats[namespace]
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(task=asyncio.ensure_future(loader()))
+            flight.task.add_done_callback(partial(self._forget, key, flight))
+            self._flights[key] = flight
+            stats.calls += 1
+        else:
+            stats.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), self.timeout)
+        except TimeoutError:
+            stats.timeouts += 1
+            raise SingleFlightTimeoutError(
+                f"{namespace} load did not finish in {self.timeout}s"
+            ) from None
+        except asyncio.CancelledError:
+            stats.cancellations += 1
+            raise
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Nobody is waiting any more; later callers start afresh.
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight, task: asyncio.Task | None = None) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if task is not None and not task.cancelled():
+            # Marks the exception as retrieved when every caller has gone.
+            task.exception()